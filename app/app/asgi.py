@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# Native async views for the hot paths, see app.urls
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -37,12 +37,13 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'core',
+    'core.apps.CoreConfig',
     'user',
-    'recipe',
+    'recipe.apps.RecipeConfig',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +73,15 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Serve the hot read paths as coroutines, set by app.asgi
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
+# Thread pools of the async views, see core.async_views
+ASYNC_EXECUTORS = {
+    'DATABASE': int(os.environ.get('ASYNC_DATABASE_THREADS', 8)),
+    'PASSWORD': int(os.environ.get('ASYNC_PASSWORD_THREADS', 2)),
+}
+
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
@@ -79,12 +89,52 @@ DATABASES = {
     'default': {
         'ENGINE': os.environ.get('ENGINE'),
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds a connection is reused across requests, 0 to close it
+        # after each one. Every worker thread holds its own connection.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Probe reused connections idle for CONN_HEALTH_CHECK_IDLE seconds
+        # before a request, see core.db
+        'CONN_HEALTH_CHECKS':
+            os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'CONN_HEALTH_CHECK_IDLE':
+            int(os.environ.get('DB_CONN_HEALTH_CHECK_IDLE', 10)),
+        # Required behind a transaction pooler such as PgBouncer, which
+        # DB_HOST and DB_PORT then point at
+        'DISABLE_SERVER_SIDE_CURSORS':
+            os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', '0') == '1',
+        'TEST': {
+            # A file instead of memory for SQLite, so connections really
+            # close, see benchmarks.bench_connections
+            'NAME': os.environ.get('DB_TEST_NAME') or None,
+        },
+    }
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Use a shared backend (memcached, redis) when running several workers or
+# the job worker, so they agree on the per user data versions of
+# recipe.cache. The local memory default only suits a single process.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+RECIPE_RESPONSE_CACHE_TIMEOUT = 3600
+
+# Serialize list pages from values() rows, see recipe.rows
+RECIPE_ROW_SERIALIZATION = True
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -125,5 +175,87 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Media files are served by core.views.serve_media. Set the backend to
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd) to let
+# the front proxy send the files.
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Seconds clients cache media files not named by their content
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Largest accepted upload in bytes, see core.uploads
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 10 * 2 ** 20))
+
+# Largest accepted recipe image in pixels, checked from its header
+RECIPE_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+
+# Resized variants generated for each recipe image, see recipe.renditions
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': {'size': (150, 150), 'format': 'JPEG', 'quality': 80},
+    'medium': {'size': (800, 800), 'format': 'JPEG', 'quality': 85},
+    'webp': {'size': (1600, 1600), 'format': 'WEBP', 'quality': 80},
+}
+
+# Background job runner, see core.jobs
+JOBS = {
+    'RETRY_DELAY': int(os.environ.get('JOBS_RETRY_DELAY', 10)),
+    'MAX_RETRY_DELAY': int(os.environ.get('JOBS_MAX_RETRY_DELAY', 3600)),
+    'STALE_TIMEOUT': int(os.environ.get('JOBS_STALE_TIMEOUT', 600)),
+    'FINISHED_RETENTION': int(
+        os.environ.get('JOBS_FINISHED_RETENTION', 7 * 24 * 3600)
+    ),
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'core.User'
+
+# Token authentication cache, see core.authentication
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    'TIMEOUT': int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 300)),
+    'LOCAL_TIMEOUT':
+        int(os.environ.get('TOKEN_AUTH_CACHE_LOCAL_TIMEOUT', 5)),
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS') or None,
+}
+
+# Per user recipe x ingredient bitsets, see recipe.pantry
+PANTRY_INDEX = {
+    'MAX_USERS': int(os.environ.get('PANTRY_INDEX_MAX_USERS', 100)),
+    'TIMEOUT': int(os.environ.get('PANTRY_INDEX_TIMEOUT', 60)),
+}
+
+# Per request timings, see core.middleware.ProfilingMiddleware
+PROFILING = {
+    'SERVER_TIMING': os.environ.get('PROFILING_SERVER_TIMING', '0') == '1',
+    'SLOW_REQUEST_MS': int(os.environ.get('PROFILING_SLOW_REQUEST_MS', 500)),
+    'TOKEN': os.environ.get('PROFILING_TOKEN') or None,
+    'DIRECTORY': os.environ.get('PROFILING_DIRECTORY', '/tmp/profiles'),
+}
+
+# Request logs of core.middleware are info, slow requests warnings
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': os.environ.get('PROFILING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Django REST framework
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # Picked by the Accept header, see core.renderers
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
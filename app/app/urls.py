@@ -14,13 +14,33 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 from django.conf import settings
 
+from core.async_views import async_patterns
+from core.views import serve_media
+
+# Hot paths served as coroutines under ASGI, by the executor running them
+ASYNC_VIEWS = {
+    'recipe:recipe-list': 'DATABASE',
+    'recipe:recipe-detail': 'DATABASE',
+    'recipe:tag-list': 'DATABASE',
+    'recipe:ingredient-list': 'DATABASE',
+    'user:me': 'DATABASE',
+    'user:token': 'PASSWORD',
+}
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) # Make the media root available
+    re_path(
+        r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'),
+        serve_media,
+        name='media'
+    ),
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_patterns(urlpatterns, ASYNC_VIEWS)
@@ -0,0 +1,187 @@
+"""Load benchmark of the hot read paths under WSGI and ASGI
+
+Many concurrent clients each send a series of authenticated GETs to the
+recipe list, tag list and user endpoints of three in-process
+deployments, and the throughput and latency percentiles of each are
+printed:
+
+- wsgi: the WSGI handler behind a pool of threads, like a threaded
+  server with as many threads as the async database pool
+- asgi sync: the ASGI handler with the regular sync views, which Django
+  runs one at a time in a single thread
+- asgi async: the ASGI handler with the views of `app.urls.ASYNC_VIEWS`
+  served by `core.async_views`
+
+Every query is delayed by BENCH_ASGI_DB_LATENCY_MS to stand in for the
+round trip to a database server, and responses are not cached, so each
+request waits on the database like it would in production.
+"""
+import asyncio
+import statistics
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from app import urls
+from core.async_views import async_patterns
+
+from benchmarks.utils import env_int, env_float, seed_catalog, wsgi_get
+
+CLIENTS = env_int('BENCH_ASGI_CLIENTS', 64)
+REQUESTS = env_int('BENCH_ASGI_REQUESTS', 10)
+DB_LATENCY = env_float('BENCH_ASGI_DB_LATENCY_MS', 2) / 1000
+
+ASYNC_URLCONF = types.ModuleType('async_urls')
+ASYNC_URLCONF.urlpatterns = async_patterns(urls.urlpatterns, urls.ASYNC_VIEWS)
+
+
+def delay(execute, sql, params, many, context):
+    time.sleep(DB_LATENCY)
+    return execute(sql, params, many, context)
+
+
+def add_latency(sender, connection, **kwargs):
+    connection.execute_wrappers.append(delay)
+
+
+def percentile(latencies, rank):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * rank / 100))]
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class ConcurrencyBenchmark(TransactionTestCase):
+    """Compare the WSGI and ASGI handlers under concurrent load"""
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user('bench@jmits.com', 'pw')
+        seed_catalog(user, recipes=200, tags=20, ingredients=40)
+        self.token = Token.objects.create(user=user).key
+        self.paths = [
+            reverse('recipe:recipe-list'),
+            reverse('recipe:tag-list'),
+            reverse('user:me'),
+        ]
+        connection_created.connect(add_latency)
+        for conn in connections.all():
+            conn.execute_wrappers.append(delay)
+
+    def tearDown(self):
+        connection_created.disconnect(add_latency)
+        for conn in connections.all():
+            conn.execute_wrappers.remove(delay)
+
+    def wsgi_request(self, handler, path):
+        status = wsgi_get(
+            handler, path, HTTP_AUTHORIZATION=f'Token {self.token}'
+        )
+        self.assertTrue(status.startswith('200'), status)
+
+    def run_wsgi(self):
+        handler = WSGIHandler()
+        pool = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_EXECUTORS['DATABASE']
+        )
+
+        async def request(path):
+            # Timed from the submission, so waiting for a free thread
+            # counts like waiting in the accept queue of a server
+            start = time.perf_counter()
+            await asyncio.get_event_loop().run_in_executor(
+                pool, self.wsgi_request, handler, path
+            )
+            return time.perf_counter() - start
+
+        try:
+            return self.run_clients(request)
+        finally:
+            pool.shutdown()
+
+    async def asgi_request(self, handler, path):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token}'.encode()),
+            ],
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        start = time.perf_counter()
+        await handler(scope, receive, send)
+        self.assertEqual(messages[0]['status'], 200)
+        return time.perf_counter() - start
+
+    def run_asgi(self):
+        handler = ASGIHandler()
+        return self.run_clients(
+            lambda path: self.asgi_request(handler, path)
+        )
+
+    def run_clients(self, request):
+        """Return the latencies of every request sent by the clients"""
+        async def client(index):
+            return [
+                await request(self.paths[(index + i) % len(self.paths)])
+                for i in range(REQUESTS)
+            ]
+
+        async def main():
+            return await asyncio.gather(*(
+                client(index) for index in range(CLIENTS)
+            ))
+
+        return [
+            latency for latencies in asyncio.run(main())
+            for latency in latencies
+        ]
+
+    def measure(self, name, func):
+        start = time.perf_counter()
+        latencies = func()
+        seconds = time.perf_counter() - start
+        throughput = len(latencies) / seconds
+        print(f'\n{name}: {throughput:.0f} req/s, '
+              f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+              f'p99 {percentile(latencies, 99) * 1000:.1f} ms')
+        return throughput
+
+    def test_concurrency(self):
+        """Test the async views serve more requests than the sync ones"""
+        print(f'\n{CLIENTS} clients x {REQUESTS} requests, '
+              f'{DB_LATENCY * 1000:.1f} ms per query')
+        self.measure('wsgi', self.run_wsgi)
+        sync = self.measure('asgi sync', self.run_asgi)
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            native = self.measure('asgi async', self.run_asgi)
+
+        self.assertGreater(native, sync)
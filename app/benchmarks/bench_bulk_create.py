@@ -0,0 +1,66 @@
+"""Bulk recipe creation benchmark
+
+Posts a large list of recipes with tags and ingredients to the bulk
+endpoint and checks it completes in seconds.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+from benchmarks.utils import env_int, env_float, measure
+
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+ITEMS = env_int('BENCH_BULK_ITEMS', 10000)
+MAX_SECONDS = env_float('BENCH_BULK_MAX_SECONDS', 5.0)
+
+
+class BulkCreateBenchmark(TransactionTestCase):
+    """Measure creating many recipes in one request"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'bulk@jmits.com',
+            'password123'
+        )
+        self.client.force_authenticate(self.user)
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'tag {i}') for i in range(50)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(user=self.user, name=f'ingredient {i}')
+            for i in range(200)
+        )
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+
+    def test_bulk_create(self):
+        """Test creating many recipes completes in seconds"""
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 5 + i % 60,
+                'price': '9.99',
+                'tags': self.tag_ids[i % 50:i % 50 + 3],
+                'ingredients': self.ingredient_ids[i % 200:i % 200 + 6],
+            }
+            for i in range(ITEMS)
+        ]
+
+        with measure() as result:
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        print(f'\nbulk create: {ITEMS} recipes in {result["seconds"]:.2f} s '
+              f'({ITEMS / result["seconds"]:.0f} recipes/s, '
+              f'{result["queries"]} queries)')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.count(), ITEMS)
+        self.assertLess(result['seconds'], MAX_SECONDS)
@@ -0,0 +1,85 @@
+"""Request latency with and without database connection reuse
+
+Sends the same authenticated requests through the WSGI handler with
+CONN_MAX_AGE at 0, opening a connection per request, and at 60, reusing
+one, and prints the connections opened and the latency of each.
+Connecting is delayed by BENCH_DB_CONNECT_MS to stand in for the TCP,
+TLS and authentication round trips to a database server.
+
+In-memory SQLite connections are never closed, so run this against
+PostgreSQL or with a file test database:
+
+    DB_TEST_NAME=/tmp/test.sqlite3 python manage.py test \\
+        benchmarks.bench_connections --pattern="bench_*.py"
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from benchmarks.utils import env_int, env_float, seed_catalog, wsgi_get
+
+REQUESTS = env_int('BENCH_CONNECTION_REQUESTS', 200)
+CONNECT_LATENCY = env_float('BENCH_DB_CONNECT_MS', 5) / 1000
+
+
+@override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+class ConnectionReuseBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('in-memory SQLite connections are never closed')
+        cache.clear()
+        user = get_user_model().objects.create_user('bench@jmits.com', 'pw')
+        seed_catalog(user, recipes=50, tags=10, ingredients=20)
+        self.headers = {
+            'HTTP_AUTHORIZATION':
+                f'Token {Token.objects.create(user=user).key}'
+        }
+        self.max_age = connection.settings_dict['CONN_MAX_AGE']
+        self.opened = 0
+        connection_created.connect(self.connected)
+
+    def tearDown(self):
+        connection_created.disconnect(self.connected)
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = self.max_age
+
+    def connected(self, sender, connection, **kwargs):
+        self.opened += 1
+        time.sleep(CONNECT_LATENCY)
+
+    def run_requests(self, max_age):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        self.opened = 0
+        handler = WSGIHandler()
+        path = reverse('recipe:recipe-list')
+        latencies = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            status = wsgi_get(handler, path, **self.headers)
+            latencies.append(time.perf_counter() - start)
+            self.assertTrue(status.startswith('200'), status)
+
+        latencies.sort()
+        print(f'\nCONN_MAX_AGE={max_age}: {self.opened} connections, '
+              f'mean {statistics.mean(latencies) * 1000:.2f} ms, '
+              f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms')
+        return self.opened, statistics.mean(latencies)
+
+    def test_connection_reuse(self):
+        opened, closing = self.run_requests(0)
+        reused, persistent = self.run_requests(60)
+
+        self.assertEqual(opened, REQUESTS)
+        self.assertLessEqual(reused, 1)
+        self.assertLess(persistent, closing)
@@ -0,0 +1,76 @@
+"""Streaming export benchmark
+
+Streams the whole catalog of a small and a large account and records the
+throughput, the peak Python memory of the stream and the process peak
+RSS. Peak memory must stay flat as the catalog grows.
+"""
+import resource
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from benchmarks.utils import env_int, env_float, seed_catalog
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+SMALL = env_int('BENCH_EXPORT_SMALL', 1000)
+LARGE = env_int('BENCH_EXPORT_LARGE', 20000)
+MAX_GROWTH = env_float('BENCH_EXPORT_MAX_MEMORY_GROWTH', 2.0)
+
+
+class ExportBenchmark(TransactionTestCase):
+    """Measure streaming exports of growing catalogs"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def stream(self, recipes, export_format):
+        """Seed a catalog and stream its export, returning the stats"""
+        user = get_user_model().objects.create_user(
+            f'export{recipes}{export_format}@jmits.com',
+            'password123'
+        )
+        seed_catalog(user, recipes=recipes, tags=50, ingredients=200)
+        self.client.force_authenticate(user)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        res = self.client.get(EXPORT_URL, {'format': export_format})
+        size = rows = 0
+        for chunk in res.streaming_content:
+            size += len(chunk)
+            rows += 1
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        # The header line of CSV is not a recipe
+        rows -= 1 if export_format == 'csv' else 0
+        print(f'\n{export_format} export of {rows} recipes: '
+              f'{rows / seconds:.0f} rows/s, {size / seconds / 1e6:.1f} MB/s, '
+              f'peak {peak / 1e6:.1f} MB traced, '
+              f'{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3:.0f}'
+              f' MB max RSS')
+        self.assertEqual(rows, recipes)
+
+        return peak
+
+    def assert_flat_memory(self, export_format):
+        """Check peak memory does not grow with the catalog size"""
+        small = self.stream(SMALL, export_format)
+        large = self.stream(LARGE, export_format)
+
+        self.assertLess(large, small * MAX_GROWTH)
+
+    def test_ndjson_export(self):
+        """Test NDJSON export memory stays flat"""
+        self.assert_flat_memory('ndjson')
+
+    def test_csv_export(self):
+        """Test CSV export memory stays flat"""
+        self.assert_flat_memory('csv')
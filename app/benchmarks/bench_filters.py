@@ -0,0 +1,91 @@
+"""EXPLAIN benchmark for the recipe relation filters
+
+Seeds a growing catalog and prints the plan and timing of the `tags`,
+`ingredients` and `assigned_only` filters at each size. The through
+tables must only ever be read through an index (index-only on both
+backends), so the cost of a probe does not grow with the catalog.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.test import TransactionTestCase
+
+from core.models import Tag, Recipe
+
+from benchmarks.utils import env_int, seed_catalog, measure
+
+SIZES = (env_int('BENCH_FILTER_ROWS', 2000),
+         env_int('BENCH_FILTER_ROWS', 2000) * 5)
+
+
+def through_reads(plan):
+    """Return the plan lines reading a recipe through table"""
+    return [
+        line for line in plan.splitlines()
+        if 'core_recipe_tags' in line or 'core_recipe_ingredients' in line
+    ]
+
+
+def index_only(line):
+    """Return True if a plan line reads a table from an index alone"""
+    if connection.vendor == 'sqlite':
+        return 'COVERING INDEX' in line
+    return 'Index Only Scan' in line
+
+
+class RelationFilterBenchmark(TransactionTestCase):
+
+    def queries(self, user, tag_ids, ingredient_ids):
+        """Return the filter querysets built like the views do"""
+        recipes = Recipe.objects.filter(user=user).order_by('-id')
+        tag_links = Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        )
+        ingredient_links = Recipe.ingredients.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        )
+        return {
+            'any tag': recipes.filter(
+                Exists(tag_links.filter(tag_id__in=tag_ids[:3]))
+            )[:51],
+            'all ingredients': recipes.filter(
+                Exists(ingredient_links.filter(
+                    ingredient_id=ingredient_ids[0]
+                ))
+            ).filter(
+                Exists(ingredient_links.filter(
+                    ingredient_id=ingredient_ids[1]
+                ))
+            )[:51],
+            'assigned tags': Tag.objects.filter(user=user).filter(
+                Exists(Recipe.tags.through.objects.filter(
+                    tag_id=OuterRef('pk')
+                ))
+            ).order_by('-name', 'id')[:51],
+        }
+
+    def test_filter_plans(self):
+        for index, size in enumerate(SIZES):
+            user = get_user_model().objects.create_user(
+                f'user{index}@jmits.com', 'pw'
+            )
+            tag_ids, ingredient_ids, _ = seed_catalog(
+                user, recipes=size, tags=size // 10,
+                ingredients=size // 10, tags_per_recipe=2,
+                ingredients_per_recipe=4,
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for name, queryset in self.queries(
+                user, tag_ids, ingredient_ids
+            ).items():
+                with measure() as result:
+                    list(queryset.all())
+                plan = queryset.explain()
+                print(f'\n{name} on {size} recipes '
+                      f'({result["seconds"] * 1000:.2f} ms):\n{plan}')
+                reads = through_reads(plan)
+                self.assertTrue(reads, plan)
+                for line in reads:
+                    self.assertTrue(index_only(line), line)
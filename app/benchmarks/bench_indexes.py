@@ -0,0 +1,91 @@
+"""EXPLAIN benchmark for the per user listing indexes
+
+Seeds several users, then prints the plan of each list query before and
+after its composite index exists. With the index the database must read
+the rows already ordered instead of sorting them.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+
+from core.models import Tag, Ingredient, Recipe
+
+from benchmarks.utils import env_int, seed_catalog, measure
+
+USERS = env_int('BENCH_INDEX_USERS', 5)
+ROWS = env_int('BENCH_INDEX_ROWS', 2000)
+PAGE_SIZE = 51
+
+
+def has_sort(plan):
+    """Return True if a query plan sorts rows outside of an index"""
+    if connection.vendor == 'sqlite':
+        return 'TEMP B-TREE' in plan
+    return 'Sort' in plan
+
+
+class ListIndexBenchmark(TransactionTestCase):
+    """Compare list query plans without and with the composite indexes"""
+
+    def setUp(self):
+        users = [
+            get_user_model().objects.create_user(f'user{i}@jmits.com', 'pw')
+            for i in range(USERS)
+        ]
+        for user in users:
+            seed_catalog(user, recipes=ROWS, tags=ROWS, ingredients=ROWS,
+                         tags_per_recipe=1, ingredients_per_recipe=1)
+        self.user = users[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def explain(self, queryset):
+        """Return the plan and timing of a list query"""
+        with measure() as result:
+            list(queryset.all())
+        return queryset.explain(), result['seconds']
+
+    def compare(self, model, index_name, queryset):
+        """Print the plan before and after the index and check it is used"""
+        index = next(
+            index for index in model._meta.indexes
+            if index.name == index_name
+        )
+        with connection.schema_editor() as editor:
+            editor.remove_index(model, index)
+        before, before_seconds = self.explain(queryset)
+
+        with connection.schema_editor() as editor:
+            editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        after, after_seconds = self.explain(queryset)
+
+        print(f'\n{index_name}\n'
+              f'before ({before_seconds * 1000:.2f} ms):\n{before}\n'
+              f'after ({after_seconds * 1000:.2f} ms):\n{after}')
+        self.assertFalse(has_sort(after), after)
+
+    def test_tag_list_index(self):
+        """Test the tag list reads rows in index order"""
+        self.compare(
+            Tag, 'core_tag_user_name_idx',
+            Tag.objects.filter(user=self.user)
+            .order_by('-name', 'id')[:PAGE_SIZE]
+        )
+
+    def test_ingredient_list_index(self):
+        """Test the ingredient list reads rows in index order"""
+        self.compare(
+            Ingredient, 'core_ingredient_user_name_idx',
+            Ingredient.objects.filter(user=self.user)
+            .order_by('-name', 'id')[:PAGE_SIZE]
+        )
+
+    def test_recipe_list_index(self):
+        """Test the recipe list reads rows in index order"""
+        self.compare(
+            Recipe, 'core_recipe_user_id_idx',
+            Recipe.objects.filter(user=self.user).order_by('-id')[:PAGE_SIZE]
+        )
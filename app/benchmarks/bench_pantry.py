@@ -0,0 +1,59 @@
+"""Latency benchmark for pantry matching
+
+Compares ranking recipes by ingredient coverage with the in-memory
+bitsets against the same ranking computed by the database with joins
+and aggregates on every call.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+from django.test import TransactionTestCase
+
+from core.models import Recipe
+
+from recipe.pantry import get_pantry_index
+
+from benchmarks.utils import env_int, seed_catalog, measure
+
+RECIPES = env_int('BENCH_PANTRY_RECIPES', 20000)
+LIMIT = 50
+
+
+class PantryBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        get_pantry_index().clear()
+        self.user = get_user_model().objects.create_user(
+            'bench@jmits.com', 'pw'
+        )
+        _, self.ingredient_ids, _ = seed_catalog(
+            self.user, recipes=RECIPES, tags=10, ingredients=300,
+            tags_per_recipe=1, ingredients_per_recipe=6,
+        )
+        self.pantry = self.ingredient_ids[:40]
+
+    def orm_match(self):
+        matched = Count(
+            'ingredients', filter=Q(ingredients__in=self.pantry)
+        )
+        return list(Recipe.objects.filter(user=self.user).annotate(
+            matched=matched,
+            missing=Count('ingredients') - matched,
+        ).filter(matched__gt=0).order_by(
+            'missing', '-matched', '-id',
+        ).values_list('id', flat=True)[:LIMIT])
+
+    def test_pantry_latency(self):
+        index = get_pantry_index()
+        with measure() as build:
+            index.get(self.user.pk)
+        with measure() as bitsets:
+            ids = [pk for pk, _ in
+                   index.get(self.user.pk).match(self.pantry, LIMIT)]
+        with measure() as orm:
+            orm_ids = self.orm_match()
+
+        print(f'\nbuild {build["seconds"] * 1000:.1f} ms, '
+              f'bitsets {bitsets["seconds"] * 1000:.1f} ms, '
+              f'orm {orm["seconds"] * 1000:.1f} ms')
+        self.assertEqual(ids, orm_ids)
+        self.assertLess(bitsets['seconds'], orm['seconds'])
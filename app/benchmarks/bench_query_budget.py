@@ -0,0 +1,122 @@
+"""Query budget benchmark for the recipe API viewsets
+
+Every action must run in a fixed number of queries whatever the size of
+the user's catalog, and within a time limit per call.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from benchmarks.utils import env_int, env_float, seed_catalog, measure
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+SMALL = env_int('BENCH_SMALL_CATALOG', 10)
+LARGE = env_int('BENCH_LARGE_CATALOG', 1000)
+MAX_SECONDS = env_float('BENCH_MAX_SECONDS', 2.0)
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class QueryBudgetBenchmark(TestCase):
+    """Assert the query count per action does not grow with the catalog"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.small_user = get_user_model().objects.create_user(
+            'small@jmits.com',
+            'password123'
+        )
+        self.large_user = get_user_model().objects.create_user(
+            'large@jmits.com',
+            'password123'
+        )
+        self.small = seed_catalog(self.small_user, recipes=SMALL,
+                                  tags=SMALL, ingredients=SMALL)
+        self.large = seed_catalog(self.large_user, recipes=LARGE,
+                                  tags=LARGE, ingredients=LARGE)
+
+    def run_action(self, user, method, url, payload=None):
+        """Run a single API call for a user and return its measurements"""
+        self.client.force_authenticate(user)
+        with measure() as result:
+            res = getattr(self.client, method)(url, payload, format='json')
+        self.assertIn(res.status_code, (status.HTTP_200_OK,
+                                        status.HTTP_201_CREATED))
+        return result
+
+    def assert_budget(self, name, method, url_for, payload_for=None):
+        """Compare an action on the small and the large catalog"""
+        results = []
+        for user, catalog in ((self.small_user, self.small),
+                              (self.large_user, self.large)):
+            payload = payload_for(catalog) if payload_for else None
+            results.append(
+                self.run_action(user, method, url_for(catalog), payload)
+            )
+        small, large = results
+        print(f'\n{name}: {large["queries"]} queries, '
+              f'{large["seconds"] * 1000:.1f} ms for {LARGE} rows')
+
+        self.assertEqual(small['queries'], large['queries'], name)
+        self.assertLess(large['seconds'], MAX_SECONDS, name)
+
+    def test_tag_list(self):
+        """Test listing tags runs in constant queries"""
+        self.assert_budget('tag list', 'get', lambda c: TAGS_URL)
+
+    def test_tag_create(self):
+        """Test creating a tag runs in constant queries"""
+        self.assert_budget('tag create', 'post', lambda c: TAGS_URL,
+                           lambda c: {'name': 'Benchmark'})
+
+    def test_ingredient_list(self):
+        """Test listing ingredients runs in constant queries"""
+        self.assert_budget('ingredient list', 'get',
+                           lambda c: INGREDIENTS_URL)
+
+    def test_ingredient_create(self):
+        """Test creating an ingredient runs in constant queries"""
+        self.assert_budget('ingredient create', 'post',
+                           lambda c: INGREDIENTS_URL,
+                           lambda c: {'name': 'Benchmark'})
+
+    def test_recipe_list(self):
+        """Test listing recipes runs in constant queries"""
+        self.assert_budget('recipe list', 'get', lambda c: RECIPES_URL)
+
+    def test_recipe_retrieve(self):
+        """Test retrieving a recipe runs in constant queries"""
+        self.assert_budget('recipe retrieve', 'get',
+                           lambda c: detail_url(c[2][0]))
+
+    def test_recipe_create(self):
+        """Test creating a recipe runs in constant queries"""
+        self.assert_budget('recipe create', 'post', lambda c: RECIPES_URL,
+                           lambda c: {
+                               'title': 'Benchmark',
+                               'time_minutes': 10,
+                               'price': '5.00',
+                               'tags': c[0][:10],
+                               'ingredients': c[1][:10],
+                           })
+
+    def test_recipe_update(self):
+        """Test updating a recipe runs in constant queries"""
+        self.assert_budget('recipe update', 'put',
+                           lambda c: detail_url(c[2][0]),
+                           lambda c: {
+                               'title': 'Benchmark',
+                               'time_minutes': 10,
+                               'price': '5.00',
+                               'tags': c[0][-5:],
+                               'ingredients': c[1][-5:],
+                           })
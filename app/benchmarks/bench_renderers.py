@@ -0,0 +1,76 @@
+"""Encode time and payload size of the API renderers
+
+Renders a large serialized recipe list with the stock JSON renderer,
+the orjson backed one and MessagePack, and prints the time and the raw
+and gzipped sizes of each. The fast JSON renderer must produce the same
+bytes as the stock one in less time.
+"""
+import gzip
+import time
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from django.test.client import RequestFactory
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from core.renderers import FastJSONRenderer, MessagePackRenderer, \
+    msgpack, orjson
+
+from recipe.rows import RowSerializer
+from recipe.serializers import RecipeSerializer
+
+from benchmarks.utils import env_int, seed_catalog
+
+RECIPES = env_int('BENCH_RENDERER_RECIPES', 10000)
+ROUNDS = env_int('BENCH_RENDERER_ROUNDS', 5)
+
+
+@skipIf(orjson is None, 'orjson is not installed')
+class RendererBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('bench@jmits.com', 'pw')
+        seed_catalog(
+            user, recipes=RECIPES, tags=100, ingredients=200,
+            tags_per_recipe=3, ingredients_per_recipe=6,
+        )
+        Recipe.objects.update(
+            renditions={'thumbnail': 'uploads/recipe/renditions/a.jpg'}
+        )
+        rows = RowSerializer(RecipeSerializer(
+            context={'request': RequestFactory().get('/')}
+        ))
+        self.data = rows.to_representation(
+            Recipe.objects.order_by('id').values(*rows.columns)
+        )
+
+    def encode(self, renderer):
+        """Return the best encode time over the rounds and the output"""
+        best = None
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            content = renderer.render(self.data, renderer.media_type)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        return best, content
+
+    def test_encode(self):
+        renderers = [JSONRenderer(), FastJSONRenderer()]
+        if msgpack is not None:
+            renderers.append(MessagePackRenderer())
+
+        results = {}
+        for renderer in renderers:
+            seconds, content = self.encode(renderer)
+            results[type(renderer).__name__] = seconds, content
+            print(f'\n{type(renderer).__name__}: {seconds * 1000:.1f} ms, '
+                  f'{len(content) / 1024:.0f} KiB, '
+                  f'{len(gzip.compress(content)) / 1024:.0f} KiB gzipped')
+
+        stock_seconds, stock = results['JSONRenderer']
+        fast_seconds, fast = results['FastJSONRenderer']
+        self.assertEqual(fast, stock)
+        self.assertLess(fast_seconds, stock_seconds)
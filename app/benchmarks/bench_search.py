@@ -0,0 +1,46 @@
+"""Latency benchmark for recipe search
+
+Seeds a catalog, builds its search documents, then times a few queries
+from selective to matching every recipe. Only the newest
+`MAX_CANDIDATES` matches are ranked, so broad queries stay bounded.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+
+from recipe.search import index_recipes, search_recipes
+
+from benchmarks.utils import env_int, env_float, seed_catalog, measure
+
+RECIPES = env_int('BENCH_SEARCH_RECIPES', 20000)
+LIMIT = 50
+MAX_SECONDS = env_float('BENCH_SEARCH_MAX_SECONDS', 0.1)
+
+QUERIES = ('recipe 1234', 'ingredient 7', 'tag 3 ingredient 1', 'recipe')
+
+
+class SearchBenchmark(TransactionTestCase):
+    """Measure the latency of searches of a large catalog"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'bench@jmits.com', 'pw'
+        )
+        other = get_user_model().objects.create_user('other@jmits.com', 'pw')
+        ids = []
+        for user in (self.user, other):
+            ids += seed_catalog(user, recipes=RECIPES, tags=50,
+                                ingredients=200)[2]
+        with measure() as result:
+            index_recipes(ids)
+        print(f'\nIndexed {len(ids)} recipes in {result["seconds"]:.2f}s')
+
+    def test_search_latency(self):
+        """Test every query returns its top results under MAX_SECONDS"""
+        for query in QUERIES:
+            search_recipes(self.user.pk, query, LIMIT)
+            with measure() as result:
+                ids = search_recipes(self.user.pk, query, LIMIT)
+            print(f'{query!r}: {len(ids)} results in '
+                  f'{result["seconds"] * 1000:.2f} ms')
+            self.assertTrue(ids)
+            self.assertLess(result['seconds'], MAX_SECONDS)
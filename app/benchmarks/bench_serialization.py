@@ -0,0 +1,78 @@
+"""Throughput benchmark for list serialization
+
+Serializes pages of recipes and tags with the model serializers, from
+prefetched instances like the regular list, and with `recipe.rows`
+from values() rows, and prints objects per second of each. Both outputs
+must be equal, and rows must be faster.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.test import TransactionTestCase
+from django.test.client import RequestFactory
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.rows import RowSerializer
+from recipe.serializers import RecipeSerializer, TagSerializer
+
+from benchmarks.utils import env_int, seed_catalog, measure
+
+OBJECTS = env_int('BENCH_SERIALIZATION_OBJECTS', 5000)
+PAGE_SIZE = 100
+
+
+class SerializationBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'bench@jmits.com', 'pw'
+        )
+        seed_catalog(
+            self.user, recipes=OBJECTS, tags=OBJECTS // 10,
+            ingredients=50, tags_per_recipe=3, ingredients_per_recipe=5,
+        )
+        self.context = {'request': RequestFactory().get('/')}
+
+    def pages(self, queryset):
+        """Yield the pages of a queryset in primary key order"""
+        ids = list(queryset.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(ids), PAGE_SIZE):
+            yield queryset.filter(pk__in=ids[start:start + PAGE_SIZE]) \
+                .order_by('id')
+
+    def compare(self, name, serializer_class, queryset, prefetch=()):
+        serializer = serializer_class(context=self.context)
+        rows = RowSerializer(serializer)
+        with measure() as objects:
+            expected = []
+            for page in self.pages(queryset.prefetch_related(*prefetch)):
+                expected.extend(serializer_class(
+                    page, many=True, context=self.context
+                ).data)
+        with measure() as values:
+            data = []
+            for page in self.pages(queryset.values(*rows.columns)):
+                data.extend(rows.to_representation(page))
+
+        print(f'\n{name}: serializer '
+              f'{len(expected) / objects["seconds"]:.0f} objects/s '
+              f'({objects["queries"]} queries), rows '
+              f'{len(data) / values["seconds"]:.0f} objects/s '
+              f'({values["queries"]} queries)')
+        self.assertEqual(data, expected)
+        self.assertLess(values['seconds'], objects['seconds'])
+
+    def test_recipe_serialization(self):
+        self.compare(
+            'recipes', RecipeSerializer, Recipe.objects.filter(user=self.user),
+            prefetch=[
+                Prefetch(name, queryset=model.objects.only('id')
+                         .order_by('id'))
+                for name, model in (('tags', Tag), ('ingredients', Ingredient))
+            ],
+        )
+
+    def test_tag_serialization(self):
+        self.compare(
+            'tags', TagSerializer, Tag.objects.filter(user=self.user)
+        )
@@ -0,0 +1,39 @@
+"""Startup time benchmark of a new worker process
+
+A new interpreter imports Django, runs `django.setup()` and loads the
+URL conf, like a worker does before serving its first request. The best
+of BENCH_STARTUP_RUNS must stay under BENCH_STARTUP_MAX_SECONDS, and
+modules only some requests need, such as Pillow, must not be imported.
+The per package breakdown is printed, see also `manage.py
+profile_startup`.
+"""
+from django.test import SimpleTestCase
+
+from core.startup import profile_startup
+
+from benchmarks.utils import env_int, env_float
+
+RUNS = env_int('BENCH_STARTUP_RUNS', 3)
+MAX_SECONDS = env_float('BENCH_STARTUP_MAX_SECONDS', 1.0)
+
+# Imported on first use only
+LAZY_PACKAGES = ('PIL',)
+
+
+class StartupBenchmark(SimpleTestCase):
+
+    def test_startup_time(self):
+        profiles = [profile_startup() for _ in range(RUNS)]
+        best = min(profiles, key=lambda p: p['setup'] + p['urls'])
+        seconds = best['setup'] + best['urls']
+
+        print(f'\nstartup: {seconds * 1000:.0f} ms, django.setup() '
+              f'{best["setup"] * 1000:.0f} ms, URL conf '
+              f'{best["urls"] * 1000:.0f} ms')
+        for package, spent in best['packages'].items():
+            if spent is not None:
+                print(f'  {package}: {spent * 1000:.0f} ms')
+
+        self.assertLess(seconds, MAX_SECONDS)
+        for package in LAZY_PACKAGES:
+            self.assertIsNone(best['packages'].get(package), package)
@@ -0,0 +1,121 @@
+"""Helpers shared by the benchmark suite
+
+Benchmarks are regular Django test cases kept out of the default test run.
+Run them with:
+
+    python manage.py test benchmarks --pattern="bench_*.py"
+
+Dataset sizes and time limits can be tuned with BENCH_* environment
+variables so the same suite works on a laptop and in CI.
+"""
+import io
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Tag, Ingredient, Recipe
+
+
+def env_int(name, default):
+    """Return an integer benchmark setting from the environment"""
+    return int(os.environ.get(name, default))
+
+
+def env_float(name, default):
+    """Return a float benchmark setting from the environment"""
+    return float(os.environ.get(name, default))
+
+
+def seed_catalog(user, recipes=100, tags=20, ingredients=50,
+                 tags_per_recipe=3, ingredients_per_recipe=5):
+    """Create a catalog of recipes with tags and ingredients for a user"""
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'tag {i}') for i in range(tags)
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'ingredient {i}')
+        for i in range(ingredients)
+    )
+    # Not every backend returns primary keys from bulk_create
+    tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+    ingredient_ids = list(
+        Ingredient.objects.filter(user=user).values_list('id', flat=True)
+    )
+    Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'Recipe {i}',
+            time_minutes=5 + i % 120,
+            price=f'{1 + i % 50}.50',
+        )
+        for i in range(recipes)
+    )
+    recipe_ids = list(
+        Recipe.objects.filter(user=user).values_list('id', flat=True)
+    )
+
+    RecipeTag = Recipe.tags.through
+    RecipeIngredient = Recipe.ingredients.through
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe_id=recipe_id, tag_id=tag_ids[(i + j) % len(tag_ids)])
+        for i, recipe_id in enumerate(recipe_ids)
+        for j in range(min(tags_per_recipe, len(tag_ids)))
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe_id=recipe_id,
+            ingredient_id=ingredient_ids[(i + j) % len(ingredient_ids)]
+        )
+        for i, recipe_id in enumerate(recipe_ids)
+        for j in range(min(ingredients_per_recipe, len(ingredient_ids)))
+    )
+
+    return tag_ids, ingredient_ids, recipe_ids
+
+
+@contextmanager
+def measure():
+    """Record the queries and wall time of the enclosed block"""
+    result = {}
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        yield result
+        result['seconds'] = time.perf_counter() - start
+    result['queries'] = len(queries)
+
+
+def wsgi_get(handler, path, **headers):
+    """Send a GET through a WSGI handler and return the response status
+
+    Unlike the test client this goes through the request signals as a
+    server would, so connections are closed or reused per CONN_MAX_AGE.
+    """
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    environ.update(headers)
+    statuses = []
+    response = handler(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    b''.join(response)
+    response.close()
+    return statuses[0]
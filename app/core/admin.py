@@ -27,7 +27,16 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class JobAdmin(admin.ModelAdmin):
+    ordering = ['-id']
+    list_display = ['id', 'name', 'status', 'priority', 'attempts',
+                    'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['locked_by', 'locked_at', 'created_at', 'finished_at']
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
 admin.site.register(models.Recipe)
+admin.site.register(models.Job, JobAdmin)
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        """Connect the signal receivers and register background jobs"""
+        from core import signals  # noqa: F401
+        autodiscover_modules('tasks')
@@ -0,0 +1,127 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+
+from core.db import check_connections, mark_connections_used
+from core.profiling import timer
+
+
+DEFAULT_ASYNC_EXECUTORS = {
+    # Threads running the database work of async views, which also
+    # bounds the database connections they hold
+    'DATABASE': 8,
+    # Threads checking passwords, kept apart so a burst of logins cannot
+    # hold every database thread while hashing
+    'PASSWORD': 2,
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name):
+    """Return the process wide thread pool of an executor name"""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            options = dict(
+                DEFAULT_ASYNC_EXECUTORS,
+                **getattr(settings, 'ASYNC_EXECUTORS', {})
+            )
+            executor = _executors[name] = ThreadPoolExecutor(
+                max_workers=options[name],
+                thread_name_prefix=f'async-{name.lower()}',
+            )
+    return executor
+
+
+def _call(func, *args, **kwargs):
+    # Each pool thread has its own connections, which the request
+    # signals of the event loop thread never see
+    close_old_connections()
+    check_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        mark_connections_used()
+        close_old_connections()
+
+
+async def run_in_executor(name, func, *args, **kwargs):
+    """Await a blocking call run by one of the bounded thread pools
+
+    The call sees the context variables of the caller, such as the
+    request profile of `core.profiling`.
+    """
+    loop = asyncio.get_event_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(name),
+        functools.partial(context.run, _call, func, *args, **kwargs)
+    )
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if callable(getattr(response, 'render', None)):
+        with timer('render'):
+            response.render()
+    return response
+
+
+def async_view(view, executor='DATABASE'):
+    """Serve a sync view as a coroutine running it in a bounded pool
+
+    Django runs the sync views of an ASGI application one at a time in a
+    single thread, so a slow query stalls every other request. Here the
+    view, database work and rendering included, runs in the named pool
+    and only the event loop waits on it.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_executor(
+            executor, _render, view, request, *args, **kwargs
+        )
+
+    return wrapper
+
+
+def async_patterns(patterns, views, namespace=None):
+    """Return URL patterns with the named views served by `async_view`
+
+    `views` maps namespaced URL names, such as `recipe:recipe-list`, to
+    the executor serving them. Included URL confs are copied as needed.
+    """
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}:{pattern.namespace}' if namespace \
+                    else pattern.namespace
+            pattern = URLResolver(
+                pattern.pattern,
+                async_patterns(pattern.url_patterns, views, prefix),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            )
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            name = f'{namespace}:{pattern.name}' if namespace \
+                else pattern.name
+            if name in views:
+                pattern = URLPattern(
+                    pattern.pattern,
+                    async_view(pattern.callback, views[name]),
+                    pattern.default_args,
+                    pattern.name,
+                )
+        result.append(pattern)
+
+    return result
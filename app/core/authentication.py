@@ -0,0 +1,190 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+
+
+DEFAULT_TOKEN_CACHE = {
+    # Maximum number of tokens kept in the process
+    'MAX_SIZE': 10000,
+    # Seconds a token cached in the shared cache is trusted without going
+    # to the database
+    'TIMEOUT': 300,
+    # Seconds a token cached in the process is trusted. Other processes
+    # cannot invalidate it, so a deleted token or a deactivated user is
+    # accepted by them for that long.
+    'LOCAL_TIMEOUT': 5,
+    # Optional Django cache alias shared between processes
+    'CACHE_ALIAS': None,
+}
+
+
+class TokenCache:
+    """Bounded LRU/TTL cache of token key to user
+
+    Entries live in the process, or when a cache alias is configured only
+    in that shared Django cache. A copy kept by each worker could not be
+    invalidated by the others, which would accept a deleted token or a
+    deactivated user until the entry expires, so process entries are
+    given the short LOCAL_TIMEOUT by `get_token_cache`.
+    """
+    key_prefix = 'auth:token:'
+
+    def __init__(self, max_size, timeout, cache_alias=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._user_keys = defaultdict(set)
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        """Return the shared Django cache, if one is configured"""
+        if self.cache_alias is None:
+            return None
+        return caches[self.cache_alias]
+
+    def shared_key(self, key):
+        """Return the shared cache key, never the raw token"""
+        return self.key_prefix + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Return a copy of the cached user of a token, or None"""
+        if self.shared is not None:
+            user = self.shared.get(self.shared_key(key))
+            with self._lock:
+                if user is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+            return user
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, user = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.copy(user)
+                self._discard(key)
+            self.misses += 1
+        return None
+
+    def set(self, key, user):
+        """Cache the user of a token"""
+        if self.shared is not None:
+            self.shared.set(self.shared_key(key), user, self.timeout)
+            return
+        user = copy.copy(user)
+        with self._lock:
+            self._store(key, user)
+
+    def invalidate(self, key):
+        """Forget a token"""
+        with self._lock:
+            self._discard(key)
+        if self.shared is not None:
+            self.shared.delete(self.shared_key(key))
+
+    def invalidate_user(self, user_id, keys=()):
+        """Forget every token of a user
+
+        Keys cached by other processes are only known to the caller, who
+        should pass them so they are removed from the shared cache too.
+        """
+        with self._lock:
+            keys = set(keys) | self._user_keys.get(user_id, set())
+            for key in keys:
+                self._discard(key)
+        if self.shared is not None and keys:
+            self.shared.delete_many([self.shared_key(key) for key in keys])
+
+    def clear(self):
+        """Forget the tokens cached by this process and reset counters
+
+        Entries of a shared cache are left to expire.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+            }
+
+    def _store(self, key, user):
+        """Insert an entry, evicting the least recently used ones"""
+        self._discard(key)
+        self._entries[key] = (time.monotonic() + self.timeout, user)
+        self._user_keys[user.pk].add(key)
+        while len(self._entries) > self.max_size:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        """Remove an entry and its reverse user mapping"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1].pk
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Return the process wide token cache built from settings"""
+    global _token_cache
+    if _token_cache is None:
+        options = dict(
+            DEFAULT_TOKEN_CACHE,
+            **getattr(settings, 'TOKEN_AUTH_CACHE', {})
+        )
+        _token_cache = TokenCache(
+            max_size=options['MAX_SIZE'],
+            timeout=options['TIMEOUT'] if options['CACHE_ALIAS']
+            else options['LOCAL_TIMEOUT'],
+            cache_alias=options['CACHE_ALIAS'],
+        )
+    return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that skips the database for known tokens
+
+    Drop-in replacement for `TokenAuthentication`. Tokens and users are
+    invalidated by the signal receivers in `core.signals`.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        user = cache.get(key)
+        if user is not None:
+            # Only active users are ever cached, see `core.signals`
+            return (user, self.get_model()(key=key, user=user))
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(key, user)
+
+        return (user, token)
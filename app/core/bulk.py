@@ -0,0 +1,157 @@
+import io
+import itertools
+
+from django.db import connections, router, transaction
+
+from core.models import Recipe
+from core.signals import bulk_created
+
+
+def bulk_create_recipes(items, batch_size=1000):
+    """Create recipes and link their tags and ingredients in bulk
+
+    `items` is a list of `(recipe, tags, ingredients)` where the recipe is
+    unsaved and tags and ingredients are objects or primary keys. Recipes
+    are inserted with `bulk_create`, their keys read back on SQLite which
+    cannot return them, and one by one on other backends that cannot.
+    The through rows always use set based inserts. Receivers learn about
+    the recipes from one `bulk_created` signal per user.
+    """
+    db = router.db_for_write(Recipe)
+    recipes = [recipe for recipe, _, _ in items]
+
+    with transaction.atomic(using=db):
+        connection = connections[db]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.using(db).bulk_create(
+                recipes, batch_size=batch_size
+            )
+        elif connection.vendor == 'sqlite':
+            _bulk_create_sequential(Recipe, recipes, db, batch_size)
+        else:
+            for recipe in recipes:
+                recipe.save(force_insert=True, using=db)
+
+        insert_rows(Recipe.tags.through, ('recipe_id', 'tag_id'), (
+            (recipe.pk, tag_id)
+            for recipe, tags, _ in items
+            for tag_id in _unique_pks(tags)
+        ), db, batch_size)
+        insert_rows(Recipe.ingredients.through, (
+            'recipe_id', 'ingredient_id'
+        ), (
+            (recipe.pk, ingredient_id)
+            for recipe, _, ingredients in items
+            for ingredient_id in _unique_pks(ingredients)
+        ), db, batch_size)
+
+        for user_id in {recipe.user_id for recipe in recipes}:
+            bulk_created.send(
+                sender=Recipe,
+                user_id=user_id,
+                objs=[recipe for recipe in recipes
+                      if recipe.user_id == user_id],
+            )
+
+    return recipes
+
+
+def get_or_create_by_names(model, user, names):
+    """Return the `model` objects of a user named `names`, creating missing
+
+    Runs at most three queries whatever the number of names. Concurrent
+    callers are safe thanks to the (user, name) unique constraint: rows a
+    competing transaction inserted first are skipped and read back.
+    """
+    names = list(dict.fromkeys(names))
+    objects = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    missing = [name for name in names if name not in objects]
+
+    if missing:
+        model.objects.bulk_create(
+            (model(user=user, name=name) for name in missing),
+            ignore_conflicts=True,
+        )
+        created = model.objects.filter(user=user, name__in=missing)
+        objects.update((obj.name, obj) for obj in created)
+        bulk_created.send(
+            sender=model,
+            user_id=user.pk,
+            objs=[objects[name] for name in missing],
+        )
+
+    return [objects[name] for name in names]
+
+
+def insert_rows(model, fields, rows, db, batch_size=1000):
+    """Insert rows of values for `fields` of `model` as fast as possible
+
+    PostgreSQL loads them with COPY, other backends with an INSERT run
+    by `executemany` per batch, without building model instances. Only
+    suitable for models without signals or custom `save()`, such as many
+    to many through tables, and for values needing no conversion.
+    """
+    connection = connections[db]
+    opts = model._meta
+    table = connection.ops.quote_name(opts.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(opts.get_field(name).column)
+        for name in fields
+    )
+    if connection.vendor != 'postgresql':
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            table, columns, ', '.join(['%s'] * len(fields))
+        )
+        rows = iter(rows)
+        with connection.cursor() as cursor:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                cursor.executemany(sql, batch)
+        return
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {table} ({columns}) FROM STDIN',
+            buffer,
+        )
+
+
+def _copy_value(value):
+    """Format a value for the COPY text format"""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace(
+        '\t', '\\t'
+    ).replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _bulk_create_sequential(model, objs, db, batch_size):
+    """Insert objects with `bulk_create` and read back their keys
+
+    SQLite has a single writer, held by the current transaction from its
+    first write, and numbers rows in insertion order. So the new rows are
+    the ones with the highest keys. Must run inside a transaction.
+    """
+    model.objects.using(db).bulk_create(objs, batch_size=batch_size)
+    pks = model.objects.using(db).order_by('-pk') \
+        .values_list('pk', flat=True)[:len(objs)]
+    for obj, pk in zip(objs, reversed(list(pks))):
+        obj.pk = pk
+        obj._state.adding = False
+        obj._state.db = db
+
+
+def _unique_pks(objs):
+    """Return the distinct primary keys of objects or keys, in order"""
+    return dict.fromkeys(getattr(obj, 'pk', obj) for obj in objs)
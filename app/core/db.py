@@ -0,0 +1,46 @@
+import time
+
+from django.db import connections
+
+
+def check_connections():
+    """Close reused connections that stopped working
+
+    With CONN_MAX_AGE a connection outlives its request, so one dropped
+    while idle (database restart, firewall or server timeout) would fail
+    the next request using it. Databases with CONN_HEALTH_CHECKS, named
+    like the Django 4.1 setting, have theirs probed first and reopened on
+    demand when broken. Only connections idle for CONN_HEALTH_CHECK_IDLE
+    seconds are probed, so busy workers do not pay a query per request.
+    """
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is None or conn.in_atomic_block or \
+                not conn.settings_dict.get('CONN_HEALTH_CHECKS'):
+            continue
+        used_at = getattr(conn, 'health_check_used_at', None)
+        if used_at is not None and now - used_at < \
+                conn.settings_dict.get('CONN_HEALTH_CHECK_IDLE', 0):
+            continue
+        if not conn.is_usable():
+            conn.close()
+
+
+def mark_connections_used():
+    """Record the open connections as working, at the end of a request"""
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is not None:
+            conn.health_check_used_at = now
+
+
+def probe_database(alias='default'):
+    """Run a cheap query, raising OperationalError if the database is down"""
+    conn = connections[alias]
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception:
+        conn.close()
+        raise
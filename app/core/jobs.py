@@ -0,0 +1,293 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F
+from django.utils import timezone
+
+from core.db import check_connections, mark_connections_used
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS = {
+    # Seconds before the first retry, doubled after every failed attempt
+    'RETRY_DELAY': 10,
+    # Upper bound of the retry delay
+    'MAX_RETRY_DELAY': 3600,
+    # Seconds without a heartbeat after which a running job is considered
+    # abandoned, workers renew the lock of their jobs ten times as often
+    'STALE_TIMEOUT': 600,
+    # Seconds succeeded and failed jobs are kept, None to keep them all
+    'FINISHED_RETENTION': 7 * 24 * 3600,
+}
+
+_registry = {}
+
+
+def get_jobs_setting(name):
+    """Return a job runner setting, falling back to its default"""
+    return getattr(settings, 'JOBS', {}).get(name, DEFAULT_JOBS[name])
+
+
+def task(name=None, priority=0, max_attempts=3):
+    """Register a function as a background job
+
+    The function is called with the keyword arguments given to `enqueue`,
+    which must be JSON serializable. Jobs may run more than once (after a
+    crash or a retry) so they should be idempotent.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        func.job_name = task_name
+        func.job_priority = priority
+        func.job_max_attempts = max_attempts
+        _registry[task_name] = func
+        return func
+
+    return decorator
+
+
+def get_task(name):
+    """Return the function registered under a name"""
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f'No job registered as {name!r}')
+
+
+def enqueue(func, priority=None, delay=0, max_attempts=None, **kwargs):
+    """Queue a call of a registered job and return its `Job` row
+
+    The row is written in the current transaction, so the job only becomes
+    visible to workers once the caller commits.
+    """
+    func = get_task(getattr(func, 'job_name', func))
+    return Job.objects.create(
+        name=func.job_name,
+        payload=kwargs,
+        priority=func.job_priority if priority is None else priority,
+        max_attempts=func.job_max_attempts if max_attempts is None
+        else max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def retry_delay(attempts):
+    """Return the seconds to wait before retrying after N failed attempts"""
+    delay = get_jobs_setting('RETRY_DELAY') * 2 ** (attempts - 1)
+    return min(delay, get_jobs_setting('MAX_RETRY_DELAY'))
+
+
+def claim_jobs(worker_id, limit=1):
+    """Lock up to `limit` runnable jobs for a worker and return them
+
+    Candidates are locked with a conditional UPDATE that only succeeds
+    while the job is still queued, so concurrent workers never run the
+    same job twice and no row locks are held between queries. The same
+    UPDATE counts the attempt, so a job crashing its worker every time
+    still runs out of attempts.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now,
+    ).order_by('-priority', 'run_at', 'id').values_list('id', flat=True)
+
+    claimed = []
+    for job_id in candidates[:limit * 2]:
+        updated = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+
+    return list(Job.objects.filter(id__in=claimed)
+                .order_by('-priority', 'run_at', 'id'))
+
+
+def heartbeat(worker_id, job_ids):
+    """Renew the lock of the jobs a worker is still running"""
+    if not job_ids:
+        return 0
+    return Job.objects.filter(
+        id__in=job_ids, status=Job.RUNNING, locked_by=worker_id,
+    ).update(locked_at=timezone.now())
+
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died while running them
+
+    Jobs that used up their attempts are marked failed instead.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(
+            seconds=get_jobs_setting('STALE_TIMEOUT')
+        ),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', locked_at=None, finished_at=now,
+        last_error='Worker lost while running the job',
+    )
+    return failed + stale.update(
+        status=Job.QUEUED, locked_by='', locked_at=None,
+    )
+
+
+def prune_jobs():
+    """Delete the finished jobs older than the FINISHED_RETENTION setting"""
+    retention = get_jobs_setting('FINISHED_RETENTION')
+    if retention is None:
+        return 0
+    deleted, _ = Job.objects.filter(
+        status__in=(Job.SUCCEEDED, Job.FAILED),
+        finished_at__lt=timezone.now() - timedelta(seconds=retention),
+    ).delete()
+    return deleted
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome"""
+    try:
+        get_task(job.name)(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)
+            )
+            logger.warning('Job %s #%s failed, retrying at %s',
+                           job.name, job.pk, job.run_at)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error('Job %s #%s failed after %d attempts',
+                         job.name, job.pk, job.attempts)
+    else:
+        job.status = Job.SUCCEEDED
+        job.last_error = ''
+        job.finished_at = timezone.now()
+
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=[
+        'status', 'run_at', 'last_error', 'locked_by', 'locked_at',
+        'finished_at',
+    ])
+    return job
+
+
+def job_status():
+    """Return the number of jobs by name and status"""
+    counts = {}
+    rows = Job.objects.values('name', 'status').annotate(count=Count('id'))
+    for row in rows.order_by('name', 'status'):
+        counts.setdefault(row['name'], {})[row['status']] = row['count']
+    return counts
+
+
+class Worker:
+    """Poll the job table and run jobs on a pool of threads"""
+
+    def __init__(self, concurrency=4, poll_interval=1.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+
+    def run(self, once=False):
+        """Run jobs until stopped, or until none are left when `once`"""
+        processed = 0
+        running = {}
+        # Locks are renewed and abandoned jobs looked for a few times per
+        # timeout, not on every poll, to keep writes off the job table
+        maintenance_interval = get_jobs_setting('STALE_TIMEOUT') / 10
+        next_maintenance = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self.stopping.is_set():
+                if time.monotonic() >= next_maintenance:
+                    self.maintain(running.values())
+                    next_maintenance = \
+                        time.monotonic() + maintenance_interval
+                free = self.concurrency - len(running)
+                jobs = claim_jobs(self.worker_id, free) if free else []
+                for job in jobs:
+                    running[executor.submit(self.execute, job)] = job.pk
+
+                if running:
+                    done, _ = wait(
+                        running, timeout=self.poll_interval,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    for future in done:
+                        del running[future]
+                    processed += len(done)
+                    self.report(done)
+                elif once:
+                    break
+                else:
+                    self.stopping.wait(self.poll_interval)
+
+            # Jobs still running when stopped keep their locks renewed
+            while running:
+                done, _ = wait(running, timeout=maintenance_interval)
+                for future in done:
+                    del running[future]
+                processed += len(done)
+                self.report(done)
+                heartbeat(self.worker_id, list(running.values()))
+
+        return processed
+
+    def maintain(self, job_ids):
+        """Renew the locks of running jobs and clean up the job table"""
+        heartbeat(self.worker_id, list(job_ids))
+        requeue_stale_jobs()
+        prune_jobs()
+
+    def report(self, futures):
+        """Log the jobs whose outcome could not be recorded"""
+        for future in futures:
+            exc = future.exception()
+            if exc is not None:
+                logger.error('Job outcome not recorded: %s', exc,
+                             exc_info=exc)
+
+    def stop(self):
+        """Finish the running jobs and exit the loop"""
+        self.stopping.set()
+
+    def execute(self, job):
+        """Run a job on a pool thread with its own connection"""
+        close_old_connections()
+        check_connections()
+        try:
+            return run_job(job)
+        finally:
+            mark_connections_used()
+            close_old_connections()
+
+
+def run_pending():
+    """Run every runnable job in the current thread, mainly for tests"""
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    processed = 0
+    while True:
+        jobs = claim_jobs(worker_id)
+        if not jobs:
+            return processed
+        run_job(jobs[0])
+        processed += 1
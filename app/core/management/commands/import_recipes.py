@@ -0,0 +1,214 @@
+import csv
+import json
+import os
+import time
+from decimal import InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bulk import bulk_create_recipes, get_or_create_by_names
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.export import split_names
+
+
+class Command(BaseCommand):
+    """Django command to load a NDJSON or CSV recipe dump for a user
+
+    The file is read in chunks which are committed one at a time. After
+    each commit the byte offset reached is written to a checkpoint file,
+    so an interrupted import continues where it stopped when run again
+    (a crash between a commit and its checkpoint imports that chunk twice).
+    The format matches the recipe export: `title`, `time_minutes`,
+    `price`, `link`, and `tags` / `ingredients` as lists of names (joined
+    with `|` in CSV, `|` and `\\` escaped with a backslash, where quoted
+    values may not span several lines).
+    """
+    help = 'Import recipes from a NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True,
+                            help='Email of the user owning the recipes')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Recipes committed per transaction')
+        parser.add_argument('--checkpoint',
+                            help='Defaults to PATH.checkpoint')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore an existing checkpoint')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+        try:
+            self.user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Unknown user: {options["user"]}')
+
+        self.format = options['format'] or \
+            ('csv' if path.endswith('.csv') else 'ndjson')
+        self.chunk_size = options['chunk_size']
+        self.checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        self.names = {Tag: {}, Ingredient: {}}
+
+        state = self.load_checkpoint(path, options['restart'])
+        start = time.monotonic()
+        imported = state['rows']
+        skipped = state['skipped']
+
+        with open(path, 'rb') as source:
+            header = self.read_header(source)
+            source.seek(max(state['offset'], source.tell()))
+            chunk = []
+            line_number = state['lines']
+
+            for line in source:
+                line_number += 1
+                if line.strip():
+                    item = self.parse(line, header, line_number)
+                    if item is None:
+                        skipped += 1
+                    else:
+                        chunk.append(item)
+
+                if len(chunk) >= self.chunk_size:
+                    imported += self.commit(chunk)
+                    chunk = []
+                    self.save_checkpoint(path, {
+                        'offset': source.tell(),
+                        'lines': line_number,
+                        'rows': imported,
+                        'skipped': skipped,
+                    })
+                    self.report(imported, start, state['rows'])
+
+            imported += self.commit(chunk)
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.report(imported, start, state['rows'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipes, skipped {skipped} invalid rows'
+        ))
+
+    def read_header(self, source):
+        """Return the CSV column names, consuming the header line"""
+        if self.format != 'csv':
+            return None
+        return next(csv.reader([source.readline().decode('utf-8')]))
+
+    def parse(self, line, header, line_number):
+        """Return a (recipe, tag names, ingredient names) item or None"""
+        try:
+            text = line.decode('utf-8')
+            if header is None:
+                row = json.loads(text)
+                if not isinstance(row, dict):
+                    raise ValueError('expected an object')
+            else:
+                row = dict(zip(header, next(csv.reader([text]))))
+                for field in ('tags', 'ingredients'):
+                    row[field] = split_names(row.get(field, ''))
+
+            title = str(row['title']).strip()
+            if not title:
+                raise ValueError('title is empty')
+            time_minutes = self.clean('time_minutes', row['time_minutes'])
+            if time_minutes < 0:
+                raise ValueError('time_minutes is negative')
+            recipe = Recipe(
+                user=self.user,
+                title=title[:255],
+                time_minutes=time_minutes,
+                price=self.clean('price', str(row['price'])),
+                link=str(row.get('link') or '')[:255],
+            )
+            tags = [str(name).strip()[:255] for name in row.get('tags', [])]
+            ingredients = [
+                str(name).strip()[:255] for name in row.get('ingredients', [])
+            ]
+        except (ValueError, KeyError, TypeError, InvalidOperation,
+                ValidationError) as exc:
+            self.stderr.write(f'Line {line_number} skipped: {exc!r}')
+            return None
+
+        return recipe, tags, ingredients
+
+    def clean(self, name, value):
+        """Return a value converted and validated by its recipe field
+
+        Rejects what the database would, such as prices with more digits
+        than the column holds, NaN or integers out of range.
+        """
+        return Recipe._meta.get_field(name).clean(value, None)
+
+    def commit(self, chunk):
+        """Insert a chunk of recipes and their relations in one transaction"""
+        if not chunk:
+            return 0
+
+        tags = self.resolve(Tag, (name for _, names, _ in chunk
+                                  for name in names))
+        ingredients = self.resolve(Ingredient, (name for _, _, names in chunk
+                                                for name in names))
+        bulk_create_recipes([
+            (
+                recipe,
+                [tags[name] for name in tag_names if name],
+                [ingredients[name] for name in ingredient_names if name],
+            )
+            for recipe, tag_names, ingredient_names in chunk
+        ], batch_size=self.chunk_size)
+
+        return len(chunk)
+
+    def resolve(self, model, names):
+        """Return the ids of names, looking up only those not seen yet"""
+        known = self.names[model]
+        missing = {name for name in names if name and name not in known}
+        if missing:
+            for obj in get_or_create_by_names(model, self.user, missing):
+                known[obj.name] = obj.pk
+        return known
+
+    def load_checkpoint(self, path, restart):
+        """Return the progress saved by a previous run of this import"""
+        state = {'offset': 0, 'lines': 0, 'rows': 0, 'skipped': 0}
+        if restart or not os.path.exists(self.checkpoint_path):
+            return state
+
+        with open(self.checkpoint_path) as checkpoint:
+            saved = json.load(checkpoint)
+        if saved.get('size') != os.path.getsize(path) or \
+                saved.get('user') != self.user.pk:
+            raise CommandError(
+                f'Checkpoint {self.checkpoint_path} belongs to another file '
+                f'or user, use --restart to ignore it'
+            )
+
+        state.update((key, saved[key]) for key in state)
+        self.stdout.write(
+            f'Resuming after {state["rows"]} recipes (line {state["lines"]})'
+        )
+        return state
+
+    def save_checkpoint(self, path, state):
+        """Atomically record the progress of the import"""
+        state = dict(state, size=os.path.getsize(path), user=self.user.pk)
+        temporary = f'{self.checkpoint_path}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(temporary, self.checkpoint_path)
+
+    def report(self, imported, start, resumed):
+        """Write the progress and throughput of this run"""
+        seconds = max(time.monotonic() - start, 1e-6)
+        self.stdout.write(
+            f'{imported} recipes imported, '
+            f'{(imported - resumed) / seconds:.0f} rows/s'
+        )
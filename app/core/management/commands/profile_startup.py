@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core.startup import DEFAULT_PACKAGES, profile_startup
+
+
+class Command(BaseCommand):
+    """Django command to report where the startup time of a worker goes
+
+    A new interpreter is started with `-X importtime`, so the modules
+    imported by this command itself do not hide the cost of importing
+    them in a cold worker.
+    """
+    help = 'Report the import and setup time of a new process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--package', action='append', dest='packages',
+                            help='Top level package to report, repeat for '
+                                 'several (default: the app, Django, DRF '
+                                 'and Pillow)')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Number of slowest modules to list')
+
+    def handle(self, *args, **options):
+        profile = profile_startup(options['packages'] or DEFAULT_PACKAGES)
+
+        self.stdout.write(f'django.setup(): {profile["setup"] * 1000:.1f} ms')
+        self.stdout.write(f'URL conf: {profile["urls"] * 1000:.1f} ms')
+        self.stdout.write('Import time by package:')
+        for package, seconds in profile['packages'].items():
+            spent = 'not imported' if seconds is None \
+                else f'{seconds * 1000:.1f} ms'
+            self.stdout.write(f'  {package:<20} {spent}')
+
+        if options['top']:
+            self.stdout.write('Slowest modules:')
+            modules = sorted(
+                profile['modules'], key=lambda module: module[1],
+                reverse=True,
+            )
+            for name, seconds in modules[:options['top']]:
+                self.stdout.write(f'  {name:<40} {seconds * 1000:.1f} ms')
@@ -0,0 +1,45 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker, job_status
+
+
+class Command(BaseCommand):
+    """Django command to run queued background jobs
+
+    Jobs are read from the `Job` table, so no broker is needed and any
+    number of workers may run side by side. SIGINT and SIGTERM let the
+    running jobs finish before exiting.
+    """
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Jobs run in parallel threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between polls of an empty queue')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is runnable')
+        parser.add_argument('--status', action='store_true',
+                            help='Print the number of jobs by status')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            for name, counts in job_status().items():
+                summary = ', '.join(
+                    f'{status}={count}' for status, count in counts.items()
+                )
+                self.stdout.write(f'{name}: {summary}')
+            return
+
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+        )
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: worker.stop())
+
+        self.stdout.write(f'Worker {worker.worker_id} started')
+        processed = worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs'))
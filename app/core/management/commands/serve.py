@@ -0,0 +1,90 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.server import DEFAULT_WARMUP_PATHS, DjangoApplication
+
+
+# Workers when WEB_CONCURRENCY is not set. Not derived from the CPUs, as
+# every worker thread holds a database connection, see the command
+DEFAULT_WORKERS = 4
+
+
+def default_workers():
+    """Return the workers set by WEB_CONCURRENCY, or DEFAULT_WORKERS"""
+    return int(os.environ.get('WEB_CONCURRENCY', DEFAULT_WORKERS))
+
+
+class Command(BaseCommand):
+    """Django command to serve the app with pre-forked gunicorn workers
+
+    SIGHUP reloads the configuration and replaces the workers gracefully,
+    SIGTERM stops after the running requests, see the gunicorn docs on
+    signals. `--preload` shares the imported app between the workers,
+    but then code changes are only picked up on a full restart.
+
+    With CONN_MAX_AGE every request thread keeps its own connection, so
+    an instance holds up to workers x threads connections per database.
+    Those of every instance, plus the job workers, must fit in the
+    max_connections of the server (100 by default on PostgreSQL), so the
+    worker count is set with WEB_CONCURRENCY or --workers per deployment.
+    """
+    help = 'Serve the app with a pre-fork server'
+    # Deployments run the checks with migrate, and the ImageField check
+    # alone imports Pillow, which no request path needs at startup
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='0.0.0.0:8000',
+                            help='Address to listen on')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: '
+                                 'WEB_CONCURRENCY, or '
+                                 f'{DEFAULT_WORKERS})')
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Request threads in each worker')
+        parser.add_argument('--worker-class', default=None,
+                            help='Gunicorn worker class, gthread when '
+                                 'running threads and sync otherwise')
+        parser.add_argument('--preload', action='store_true',
+                            help='Load the app before forking the workers')
+        parser.add_argument('--max-requests', type=int, default=0,
+                            help='Requests after which a worker is '
+                                 'replaced, 0 to never recycle')
+        parser.add_argument('--max-requests-jitter', type=int, default=0,
+                            help='Random requests added to --max-requests '
+                                 'so workers are not recycled together')
+        parser.add_argument('--timeout', type=int, default=30,
+                            help='Seconds before a silent worker is killed')
+        parser.add_argument('--graceful-timeout', type=int, default=30,
+                            help='Seconds workers get to finish their '
+                                 'requests on reload or stop')
+        parser.add_argument('--pid', default=None,
+                            help='File the master writes its pid to, for '
+                                 'sending it signals')
+        parser.add_argument('--warmup', action='append', default=None,
+                            help='Path requested by each worker before it '
+                                 'accepts traffic, may be repeated')
+
+    def handle(self, *args, **options):
+        worker_class = options['worker_class'] or (
+            'gthread' if options['threads'] > 1 else 'sync'
+        )
+        warmup_paths = options['warmup'] or getattr(
+            settings, 'SERVE_WARMUP_PATHS', DEFAULT_WARMUP_PATHS
+        )
+
+        DjangoApplication({
+            'bind': options['bind'],
+            'workers': options['workers'] or default_workers(),
+            'threads': options['threads'],
+            'worker_class': worker_class,
+            'preload_app': options['preload'],
+            'max_requests': options['max_requests'],
+            'max_requests_jitter': options['max_requests_jitter'],
+            'timeout': options['timeout'],
+            'graceful_timeout': options['graceful_timeout'],
+            'pidfile': options['pid'],
+            'accesslog': '-',
+        }, warmup_paths=warmup_paths).run()
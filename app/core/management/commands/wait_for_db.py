@@ -1,19 +1,44 @@
 import time
-from django.db import connections
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+from core.db import probe_database
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until db is available"""
+    """Django command to pause execution until db is available
+
+    The database is probed with a real query, retried with exponential
+    backoff until it answers or the timeout runs out.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default',
+                            help='Alias of the database to wait for')
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Seconds to wait before giving up')
+        parser.add_argument('--delay', type=float, default=0.1,
+                            help='Seconds before the first retry')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='Upper bound of the delay between retries')
 
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + options['timeout']
+        delay = options['delay']
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-        self.stdout.write(self.style.SUCCESS('Database available!'))
\ No newline at end of file
+                probe_database(options['database'])
+                break
+            except OperationalError as exc:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(f'Database unavailable: {exc}')
+                delay = min(delay, options['max_delay'], remaining)
+                self.stdout.write(
+                    f'Database unavailable, waiting {delay:.1f} seconds...'
+                )
+                time.sleep(delay)
+                delay *= 2
+        self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,171 @@
+import asyncio
+import cProfile
+import hmac
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from core.profiling import RequestProfile, get_profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILING = {
+    # Send the timings of each response in a Server-Timing header, which
+    # tells any client how the time is spent. Requests sending the TOKEN
+    # get it either way.
+    'SERVER_TIMING': False,
+    # Requests slower than this are logged as warnings instead of info
+    'SLOW_REQUEST_MS': 500,
+    # Requests sending this token in X-Profile-Token run under cProfile
+    'TOKEN': None,
+    # Where the cProfile stats of those requests are written
+    'DIRECTORY': 'profiles',
+}
+
+# Only one request is profiled at a time, the others run as usual
+_profiler_lock = threading.Lock()
+
+
+def get_profiling_options():
+    return dict(DEFAULT_PROFILING, **getattr(settings, 'PROFILING', {}))
+
+
+class ProfilingMiddleware:
+    """Time each request and report it in Server-Timing and the logs
+
+    The time spent in queries, serializers and rendering is recorded by
+    `core.profiling` and logged with the view name, so a slow action can
+    be told apart from the others. Requests with the `X-Profile-Token`
+    set to the PROFILING TOKEN setting get the Server-Timing header and
+    also have their calls recorded by cProfile in the PROFILING
+    DIRECTORY, the file name returned in `X-Profile-File`. Streaming
+    responses get no Server-Timing, as their body is only produced once
+    the header has been sent.
+
+    Like Django's `MiddlewareMixin` it runs in the mode of the handler
+    after it, so under ASGI requests are not all funneled through the
+    single thread of the sync middleware. cProfile then only sees the
+    event loop thread, so views served by `core.async_views` are missed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Lets the handler await the instance, see MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        options, authorized, profiler = self.start(request)
+        try:
+            with RequestProfile() as profile:
+                response = self.get_response(request)
+        finally:
+            self.stop_profiler(profiler)
+        return self.finish(
+            request, response, profile, profiler, options, authorized
+        )
+
+    async def __acall__(self, request):
+        options, authorized, profiler = self.start(request)
+        try:
+            with RequestProfile() as profile:
+                response = await self.get_response(request)
+        finally:
+            self.stop_profiler(profiler)
+        return self.finish(
+            request, response, profile, profiler, options, authorized
+        )
+
+    def start(self, request):
+        """Return the options, whether the token was sent, and a profiler"""
+        options = get_profiling_options()
+        authorized = self.has_token(request, options)
+        profiler = self.start_profiler(request) if authorized else None
+        return options, authorized, profiler
+
+    def stop_profiler(self, profiler):
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+
+    def finish(self, request, response, profile, profiler, options,
+               authorized):
+        """Add the profiling headers to a response and log the request"""
+        if profiler is not None:
+            response['X-Profile-File'] = self.dump(
+                request, profiler, options['DIRECTORY']
+            )
+        if (options['SERVER_TIMING'] or authorized) \
+                and not response.streaming:
+            response['Server-Timing'] = profile.server_timing()
+        self.log(request, response, profile, options)
+        return response
+
+    def process_template_response(self, request, response):
+        profile = get_profile()
+        if profile is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda response: profile.add(
+                    'render', time.perf_counter() - start
+                )
+            )
+        return response
+
+    def has_token(self, request, options):
+        """Return True if the request sends the profiling token"""
+        token = request.META.get('HTTP_X_PROFILE_TOKEN')
+        return bool(token and options['TOKEN'] and hmac.compare_digest(
+            token.encode(), options['TOKEN'].encode()
+        ))
+
+    def start_profiler(self, request):
+        """Return a running profiler, unless one is already recording"""
+        if not _profiler_lock.acquire(blocking=False):
+            logger.warning('Not profiling %s, a profile is being recorded',
+                           request.path)
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def dump(self, request, profiler, directory):
+        """Write the stats of a profiler, return the file name"""
+        view = getattr(request.resolver_match, 'view_name', None)
+        name = '{}-{}-{}.prof'.format(
+            time.strftime('%Y%m%d%H%M%S'),
+            (view or 'unresolved').replace(':', '-'),
+            uuid.uuid4().hex[:8],
+        )
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, name))
+        return name
+
+    def log(self, request, response, profile, options):
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(profile.total * 1000, 1),
+            'db_queries': profile.queries,
+        }
+        for name, seconds in profile.durations.items():
+            fields[f'{name}_ms'] = round(seconds * 1000, 1)
+
+        level = logging.WARNING \
+            if fields['total_ms'] > options['SLOW_REQUEST_MS'] \
+            else logging.INFO
+        logger.log(
+            level, '%(method)s %(path)s %(status)s in %(total_ms)s ms, '
+                   '%(db_queries)s queries in %(db_ms)s ms', fields,
+            extra={'profile': fields},
+        )
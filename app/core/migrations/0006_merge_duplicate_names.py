@@ -0,0 +1,56 @@
+# Generated by Django 3.1.14 on 2026-10-18 02:36
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a name for the same user
+
+    Recipes linked to a duplicate are relinked to the oldest row so the
+    unique constraints of the next migration can be created.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, relation in (('Tag', 'tags'),
+                                 ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+        column = f'{model_name.lower()}_id'
+
+        duplicates = model.objects.values('user_id', 'name').annotate(
+            keep=Min('id'),
+            total=Count('id'),
+        ).filter(total__gt=1)
+
+        for group in duplicates:
+            extra_ids = list(model.objects.filter(
+                user_id=group['user_id'],
+                name=group['name'],
+            ).exclude(id=group['keep']).values_list('id', flat=True))
+            linked = set(through.objects.filter(
+                **{column: group['keep']}
+            ).values_list('recipe_id', flat=True))
+
+            for row in through.objects.filter(**{f'{column}__in': extra_ids}):
+                if row.recipe_id in linked:
+                    row.delete()
+                else:
+                    setattr(row, column, group['keep'])
+                    row.save()
+                    linked.add(row.recipe_id)
+
+            model.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.14 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_merge_duplicate_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-name', 'id'], name='core_ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='core_recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name', 'id'], name='core_tag_user_name_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_ingredient_name_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+    ]
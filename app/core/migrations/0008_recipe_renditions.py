@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_user_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.14 on 2026-10-18 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveIntegerField()),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE recipe_search USING fts5("
+    "owner, title, names, tokenize='porter unicode61 remove_diacritics 2')",
+    "INSERT INTO recipe_search (rowid, owner, title, names) "
+    "SELECT r.id, 'u' || r.user_id, r.title, "
+    "coalesce((SELECT group_concat(t.name, ' ') FROM core_tag t "
+    "JOIN core_recipe_tags rt ON rt.tag_id = t.id "
+    "WHERE rt.recipe_id = r.id), '') || ' ' || "
+    "coalesce((SELECT group_concat(i.name, ' ') FROM core_ingredient i "
+    "JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id "
+    "WHERE ri.recipe_id = r.id), '') "
+    "FROM core_recipe r",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE recipe_search ("
+    "recipe_id integer PRIMARY KEY, "
+    "user_id integer NOT NULL, "
+    "document tsvector NOT NULL)",
+    "INSERT INTO recipe_search (recipe_id, user_id, document) "
+    "SELECT r.id, r.user_id, "
+    "setweight(to_tsvector('english', r.title), 'A') || "
+    "setweight(to_tsvector('english', "
+    "coalesce((SELECT string_agg(t.name, ' ') FROM core_tag t "
+    "JOIN core_recipe_tags rt ON rt.tag_id = t.id "
+    "WHERE rt.recipe_id = r.id), '') || ' ' || "
+    "coalesce((SELECT string_agg(i.name, ' ') FROM core_ingredient i "
+    "JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id "
+    "WHERE ri.recipe_id = r.id), '')), 'B') "
+    "FROM core_recipe r",
+    "CREATE INDEX recipe_search_document_idx ON recipe_search "
+    "USING GIN (document)",
+    "CREATE INDEX recipe_search_user_idx ON recipe_search (user_id)",
+]
+
+
+def create_search_table(apps, schema_editor):
+    """Create and fill the recipe search table of the database backend
+
+    Other databases have no table and fall back to unindexed queries,
+    see `recipe.search`.
+    """
+    statements = {
+        'sqlite': SQLITE_CREATE,
+        'postgresql': POSTGRES_CREATE,
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE recipe_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_storedimage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
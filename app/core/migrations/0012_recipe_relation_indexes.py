@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index the recipe through tables by related object first
+
+    The (recipe_id, x_id) unique constraints serve lookups from a recipe.
+    These cover the opposite direction, used by the recipe filters and
+    by `assigned_only`, without reading the through table rows.
+    """
+
+    dependencies = [
+        ('core', '0011_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_tags_tag_recipe_idx '
+            'ON core_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX core_recipe_tags_tag_recipe_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_ingredients_ingredient_recipe_idx '
+            'ON core_recipe_ingredients (ingredient_id, recipe_id)',
+            'DROP INDEX core_recipe_ingredients_ingredient_recipe_idx',
+        ),
+    ]
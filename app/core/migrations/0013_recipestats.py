@@ -0,0 +1,25 @@
+# Generated by Django 3.1.14 on 2026-10-18 03:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_relation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('tag_count', models.PositiveIntegerField(default=0)),
+                ('ingredient_count', models.PositiveIntegerField(default=0)),
+                ('time_histogram', models.JSONField(default=dict)),
+                ('price_histogram', models.JSONField(default=dict)),
+            ],
+        ),
+    ]
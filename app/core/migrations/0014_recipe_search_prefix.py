@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def rebuild_statements(options):
+    return [
+        "CREATE VIRTUAL TABLE recipe_search_new USING fts5("
+        f"owner, title, names, {options})",
+        "INSERT INTO recipe_search_new (rowid, owner, title, names) "
+        "SELECT rowid, owner, title, names FROM recipe_search",
+        "DROP TABLE recipe_search",
+        "ALTER TABLE recipe_search_new RENAME TO recipe_search",
+    ]
+
+
+TOKENIZE = "tokenize='porter unicode61 remove_diacritics 2'"
+
+
+def add_prefix_index(apps, schema_editor):
+    """Index the short prefixes of the SQLite search words
+
+    Search terms are matched as prefixes, and one or two letter terms
+    otherwise read every word of the index that starts with them.
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in rebuild_statements(f"{TOKENIZE}, prefix='1 2 3'"):
+            schema_editor.execute(statement)
+
+
+def remove_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in rebuild_statements(TOKENIZE):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipestats'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_prefix_index, remove_prefix_index),
+    ]
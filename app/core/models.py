@@ -8,13 +8,22 @@ from django.conf import settings
 
 
 def recipe_image_file_path(instance, file_name):
-    """Generate file path for the image"""
+    """Generate file path for an image saved through the model field
+
+    Images uploaded through the API are stored by content instead, see
+    `recipe_image_digest_path`.
+    """
     ext = file_name.split('.')[-1]
     file_name = f'{uuid.uuid4()}.{ext}'
 
     return os.path.join('uploads/recipe/', file_name)
 
 
+def recipe_image_digest_path(digest, ext):
+    """Generate the content addressed file path of an image"""
+    return os.path.join('uploads/recipe/', f'{digest}.{ext}')
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -58,6 +67,21 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user'
+            ),
+        ]
+        indexes = [
+            # Matches the per user listing ordered by -name, id
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='core_tag_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -70,6 +94,21 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user'
+            ),
+        ]
+        indexes = [
+            # Matches the per user listing ordered by -name, id
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='core_ingredient_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -87,8 +126,92 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)  # passe a reference to the function
+    # Storage paths of the resized variants of the image, by name
+    renditions = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Matches the per user listing ordered by -id
+            models.Index(
+                fields=['user', '-id'],
+                name='core_recipe_user_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class RecipeStats(models.Model):
+    """Summary of the recipes of a user, maintained by recipe.stats"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    tag_count = models.PositiveIntegerField(default=0)
+    ingredient_count = models.PositiveIntegerField(default=0)
+    # Number of recipes by time_minutes, keyed by the minutes as text
+    time_histogram = models.JSONField(default=dict)
+    # Number of recipes by price bucket, keyed by the bucket index
+    price_histogram = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f'Stats of user {self.user_id}'
+
+
+class StoredImage(models.Model):
+    """Image file stored once by content and shared between recipes"""
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveIntegerField()
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    # Number of recipes using the file, which is deleted when it drops to 0
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class Job(models.Model):
+    """Unit of background work run by the `run_worker` command"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=QUEUED
+    )
+    # Higher priorities run first
+    priority = models.IntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Matches the worker polling for the next runnable job
+            models.Index(
+                fields=['status', '-priority', 'run_at', 'id'],
+                name='core_job_next_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
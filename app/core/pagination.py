@@ -0,0 +1,193 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def _reverse_ordering(ordering):
+    """Flip the direction of every field in an ordering"""
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on the ordering key of the view
+
+    The cursor holds the ordering values of the last (or first) row of a
+    page, so the next page is a plain indexed range scan. No OFFSET and no
+    COUNT(*) are ever issued, which makes page N as cheap as page 1.
+
+    The ordering is read from the `ordering` attribute of the view and
+    must end with a unique field (usually `id`) to be a total order.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-id',)
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(view)
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.clean_position(queryset.model, position)
+
+        ordering = _reverse_ordering(self.ordering) if reverse \
+            else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        # Fetch one extra row to know if there is another page
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+
+        return self.page_size
+
+    def get_ordering(self, view):
+        """Return the ordering of the view, or the paginator default"""
+        return tuple(getattr(view, 'ordering', None) or self.ordering)
+
+    def get_position(self, item):
+        """Return the ordering values of a result object or values() row"""
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(item, dict):
+            return [item[name] for name in names]
+        return [getattr(item, name) for name in names]
+
+    def seek_filter(self, ordering, position):
+        """Build the filter selecting rows strictly after a position
+
+        For an ordering (a, b) this is `a > x OR (a = x AND b > y)`, with
+        the comparison flipped for descending fields.
+        """
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            clause = Q(**{f'{name}__{lookup}': position[index]})
+            for previous, value in zip(ordering[:index], position[:index]):
+                clause &= Q(**{previous.lstrip('-'): value})
+            condition |= clause
+
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), True)
+
+    def decode_cursor(self, request):
+        """Return the (position, reverse) pair held by the request cursor"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(
+                base64.urlsafe_b64decode(encoded.encode('ascii'))
+            )
+            position = cursor['p']
+            reverse = bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def clean_position(self, model, position):
+        """Return cursor values converted to the types of their fields
+
+        Cursors come from the client, so values the ordering fields cannot
+        hold are rejected here rather than failing the query.
+        """
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            if value is None or isinstance(value, (dict, list)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                cleaned.append(
+                    model._meta.get_field(field.lstrip('-')).to_python(value)
+                )
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        return cleaned
+
+    def encode_cursor(self, position, reverse):
+        """Return the url of the page starting after a position"""
+        cursor = {'p': position}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
+
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
@@ -0,0 +1,94 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Time spent by a request on queries, serializing and rendering
+
+    Entering the profile makes it the current one, so the queries run and
+    the `timer` blocks entered until it exits are added to it. It is kept
+    in a context variable, which `core.async_views` copies to the threads
+    running async views.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.durations = {'db': 0, 'serialize': 0, 'render': 0}
+        self.total = None
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._token = _profile.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _profile.reset(self._token)
+        self.total = time.perf_counter() - self._start
+
+    def server_timing(self):
+        """Return the value of a Server-Timing header, durations in ms"""
+        metrics = [
+            f'{name};dur={seconds * 1000:.1f}'
+            + (f';desc="{self.queries} queries"' if name == 'db' else '')
+            for name, seconds in self.durations.items()
+        ]
+        if self.total is not None:
+            metrics.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+def get_profile():
+    """Return the profile of the current request, or None"""
+    return _profile.get()
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the current request profile"""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting queries of profiled requests"""
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.add('db', time.perf_counter() - start)
+
+
+class SerializerTimingMixin:
+    """View mixin adding the time its serializers spend to the profile
+
+    Only the top level serializer is timed, which covers its nested
+    serializers and the queries they trigger, such as prefetches.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        to_representation = serializer.to_representation
+
+        def timed(*args, **kwargs):
+            with timer('serialize'):
+                return to_representation(*args, **kwargs)
+
+        serializer.to_representation = timed
+        return serializer
@@ -0,0 +1,99 @@
+import decimal
+import math
+
+from rest_framework import renderers
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _has_non_finite_float(data):
+    """Return True if NaN or an infinity is nested in lists and dicts"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSON renderer encoding with orjson when it is installed
+
+    Produces the same bytes as the stock renderer, compact and UTF-8,
+    with values orjson does not know, such as `Decimal` and lazy strings,
+    converted by the stock encoder. Indented output for the browsable API
+    or an `indent` media type parameter is left to the stock renderer, as
+    is STRICT_JSON off, which writes NaN and infinities as literals.
+
+    orjson writes those floats as null, so like the strict stock renderer
+    they are rejected with ValueError. The data is only searched for them
+    when the output has a null.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or \
+                self.ensure_ascii or not self.compact or not self.strict:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        if data is None:
+            return b''
+
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        if b'null' in ret and _has_non_finite_float(data):
+            raise ValueError(
+                'Out of range float values are not JSON compliant'
+            )
+        # Escaped like the stock renderer, these are not valid in
+        # JavaScript string literals
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+            .replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Renderer for MessagePack, a compact binary form of the JSON data
+
+    Decimals are sent as strings like serializers send them, so prices
+    keep their exact value. Other values JSON cannot hold either are
+    converted by the JSON encoder.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder_class = renderers.JSONRenderer.encoder_class
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        assert msgpack is not None, \
+            'MessagePackRenderer requires msgpack to be installed'
+        if data is None:
+            return b''
+
+        encoder = self.encoder_class()
+
+        def default(obj):
+            if isinstance(obj, decimal.Decimal) and \
+                    api_settings.COERCE_DECIMAL_TO_STRING:
+                return str(obj)
+            return encoder.default(obj)
+
+        return msgpack.packb(data, default=default, use_bin_type=True)
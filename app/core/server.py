@@ -0,0 +1,121 @@
+import gc
+import io
+import logging
+import sys
+import time
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.urls import get_resolver
+
+from gunicorn.app.base import BaseApplication
+
+# Unauthenticated requests are enough to import and build the views,
+# serializers and renderers that the first real request would pay for
+DEFAULT_WARMUP_PATHS = (
+    '/api/recipe/recipes/',
+    '/api/recipe/tags/',
+    '/api/recipe/ingredients/',
+    '/api/user/me/',
+)
+
+
+def warmup_host():
+    """Return a host name ALLOWED_HOSTS accepts for warmup requests"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def warmup(application, paths):
+    """Send GET requests through a WSGI application, return their statuses"""
+    host = warmup_host()
+    statuses = []
+    # The expected 401s are not worth a warning each
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    request_logger.setLevel(logging.ERROR)
+    try:
+        for path in paths:
+            statuses.append(_get(application, host, path))
+    finally:
+        request_logger.setLevel(level)
+    return statuses
+
+
+def _get(application, host, path):
+    """Send a GET request through a WSGI application, return its status"""
+    statuses = []
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    response = application(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return statuses[0]
+
+
+class DjangoApplication(BaseApplication):
+    """Gunicorn application serving the Django WSGI handler
+
+    With `preload_app` Django, the URL conf and the views are imported
+    once in the master and shared copy-on-write by the forked workers.
+    Each worker then sends the `warmup_paths` requests to itself before
+    it starts accepting connections.
+    """
+
+    def __init__(self, options, warmup_paths=DEFAULT_WARMUP_PATHS):
+        self.options = options
+        self.warmup_paths = warmup_paths
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None:
+                self.cfg.set(key, value)
+        self.cfg.set('pre_fork', self.pre_fork)
+        self.cfg.set('post_worker_init', self.post_worker_init)
+
+    def load(self):
+        application = get_wsgi_application()
+        # Resolving imports every view module, not only the URL confs
+        get_resolver().url_patterns
+        if self.cfg.preload_app:
+            # Objects loaded so far live as long as the master, keeping
+            # the collector from touching, and so copying, their pages
+            gc.freeze()
+        return application
+
+    def pre_fork(self, server, worker):
+        # Connections opened by the master must not be shared by workers
+        connections.close_all()
+
+    def post_worker_init(self, worker):
+        start = time.monotonic()
+        statuses = warmup(worker.wsgi, self.warmup_paths)
+        worker.log.info(
+            'Worker %s warmed up in %.0f ms (%s)', worker.pid,
+            (time.monotonic() - start) * 1000, ', '.join(statuses)
+        )
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.signals import request_started, request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from rest_framework.authtoken.models import Token
+
+from core.authentication import get_token_cache
+from core.db import check_connections, mark_connections_used
+from core.profiling import record_query
+
+
+# Sent after objects were written in bulk, which skips post_save and
+# m2m_changed. Arguments: `user_id` and `objs`, the created objects
+# (primary keys may be unset on some backends). Receivers must be
+# idempotent as some backends also send post_save for each object.
+bulk_created = Signal()
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Drop a token from the auth cache when it changes or is deleted"""
+    get_token_cache().invalidate(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Drop the cached tokens of a user that was edited or deactivated"""
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    get_token_cache().invalidate_user(instance.pk, keys)
+
+
+@receiver(request_started)
+def check_database_connections(sender, **kwargs):
+    """Reopen persistent connections that broke since the last request"""
+    check_connections()
+
+
+@receiver(request_finished)
+def mark_database_connections(sender, **kwargs):
+    """Spare the connections of this request the next health check"""
+    mark_connections_used()
+
+
+@receiver(connection_created)
+def profile_queries(sender, connection, **kwargs):
+    """Count the queries of profiled requests, see core.profiling"""
+    if record_query not in connection.execute_wrappers:
+        # First, as execute_wrapper() blocks pop the last wrapper on exit
+        connection.execute_wrappers.insert(0, record_query)
@@ -0,0 +1,59 @@
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Packages whose import time is reported, besides the slowest modules
+DEFAULT_PACKAGES = ('django', 'rest_framework', 'core', 'recipe', 'user',
+                    'PIL')
+
+# Run in a fresh interpreter, as the current one has imported everything
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'setup': setup - start,
+    'urls': time.perf_counter() - setup,
+}))
+'''
+
+
+def parse_importtime(lines):
+    """Return the (module, self seconds) pairs of `-X importtime` output"""
+    modules = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():
+            modules.append((name.strip(), int(own) / 10 ** 6))
+    return modules
+
+
+def profile_startup(packages=DEFAULT_PACKAGES):
+    """Profile the startup of a new process of the app
+
+    Returns the seconds spent in `django.setup()` and in loading the URL
+    conf, every imported module with the seconds spent importing it, its
+    submodules excluded, and the total by top level package. Packages
+    that were not imported at all are None.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    profile = json.loads(result.stdout.splitlines()[-1])
+    profile['modules'] = parse_importtime(result.stderr.splitlines())
+    profile['packages'] = dict.fromkeys(packages)
+    for name, seconds in profile['modules']:
+        package = name.partition('.')[0]
+        if package in profile['packages']:
+            profile['packages'][package] = \
+                (profile['packages'][package] or 0) + seconds
+    return profile
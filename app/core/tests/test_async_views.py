@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+import types
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from app import urls
+from core.async_views import async_patterns, run_in_executor
+from core.models import Recipe, Tag
+from core.profiling import RequestProfile
+
+ASYNC_URLCONF = types.ModuleType('async_urls')
+ASYNC_URLCONF.urlpatterns = async_patterns(urls.urlpatterns, urls.ASYNC_VIEWS)
+
+
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+class AsyncViewTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@jmits.com', 'testpass', name='Test'
+        )
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price='7.25'
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+
+    def test_hot_paths_are_coroutines(self):
+        """Test the listed views are async and the others are not"""
+        for name in urls.ASYNC_VIEWS:
+            args = [1] if name.endswith('-detail') else []
+            func = resolve(reverse(name, args=args)).func
+            self.assertTrue(asyncio.iscoroutinefunction(func), name)
+            self.assertTrue(hasattr(func, 'cls'), name)
+
+        stats = resolve(reverse('recipe:stats')).func
+        self.assertFalse(asyncio.iscoroutinefunction(stats))
+
+    def test_same_responses(self):
+        """Test async views answer like their sync versions"""
+        recipe = Recipe.objects.get()
+        for url in (
+            reverse('recipe:recipe-list'),
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            reverse('recipe:tag-list'),
+            reverse('user:me'),
+        ):
+            cache.clear()
+            res = self.client.get(url)
+            cache.clear()
+            with override_settings(ROOT_URLCONF='app.urls'):
+                expected = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, expected.content)
+
+    def test_writes_on_async_route(self):
+        """Test other methods of an async route still work"""
+        res = self.client.patch(reverse('user:me'), {'name': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'New')
+
+    def test_token_checks_password_off_the_loop(self):
+        """Test passwords are checked by the password pool"""
+        threads = []
+
+        def check(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return authenticate(*args, **kwargs)
+
+        with patch('user.serializers.authenticate', side_effect=check):
+            res = APIClient().post(reverse('user:token'), {
+                'email': 'user@jmits.com', 'password': 'testpass'
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+        self.assertTrue(threads[0].startswith('async-password'))
+
+
+class ExecutorTests(TransactionTestCase):
+
+    def test_pool_threads_add_to_request_profile(self):
+        """Test queries run by the pools count in the caller's profile"""
+        with RequestProfile() as profile:
+            asyncio.run(run_in_executor('DATABASE', Tag.objects.count))
+
+        self.assertEqual(profile.queries, 1)
+        self.assertGreater(profile.durations['db'], 0)
+
+    def test_pool_is_bounded(self):
+        """Test no more calls run at once than the pool has threads"""
+        lock = threading.Lock()
+        counts = {'active': 0, 'peak': 0}
+
+        def work():
+            with lock:
+                counts['active'] += 1
+                counts['peak'] = max(counts['peak'], counts['active'])
+            time.sleep(0.02)
+            with lock:
+                counts['active'] -= 1
+            return threading.current_thread().name
+
+        async def main():
+            return await asyncio.gather(*(
+                run_in_executor('PASSWORD', work) for _ in range(10)
+            ))
+
+        names = asyncio.run(main())
+
+        self.assertEqual(len(names), 10)
+        self.assertEqual(
+            counts['peak'], settings.ASYNC_EXECUTORS['PASSWORD']
+        )
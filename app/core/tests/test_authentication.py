@@ -0,0 +1,147 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import authentication
+from core.authentication import TokenCache, get_token_cache
+
+ME_URL = reverse('user:me')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_user(email='test@jmits.com', password='password123'):
+    """Create a sample user"""
+    return get_user_model().objects.create_user(email, password, name='Test')
+
+
+class TokenCacheTests(TestCase):
+    """Test the bounded token cache"""
+
+    def setUp(self):
+        self.user = sample_user()
+
+    def test_least_recently_used_evicted(self):
+        """Test the oldest entries are evicted past the max size"""
+        cache = TokenCache(max_size=2, timeout=60)
+        cache.set('a', self.user)
+        cache.set('b', self.user)
+        cache.get('a')
+        cache.set('c', self.user)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1, 'size': 2})
+
+    @patch('core.authentication.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """Test entries are dropped after the timeout"""
+        monotonic.return_value = 100
+        cache = TokenCache(max_size=10, timeout=60)
+        cache.set('a', self.user)
+
+        monotonic.return_value = 161
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_invalidate_user(self):
+        """Test all tokens of a user can be dropped at once"""
+        cache = TokenCache(max_size=10, timeout=60)
+        cache.set('a', self.user)
+        cache.set('b', self.user)
+
+        cache.invalidate_user(self.user.pk)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+
+    def test_shared_backend(self):
+        """Test entries are shared through a Django cache"""
+        first = TokenCache(max_size=10, timeout=60, cache_alias='default')
+        second = TokenCache(max_size=10, timeout=60, cache_alias='default')
+        first.set('shared', self.user)
+
+        user = second.get('shared')
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(second.stats()['hits'], 1)
+
+        first.invalidate('shared')
+        self.assertIsNone(second.get('shared'))
+
+    def test_shared_backend_invalidate_user(self):
+        """Test dropping a user in one process is seen by the others"""
+        first = TokenCache(max_size=10, timeout=60, cache_alias='default')
+        second = TokenCache(max_size=10, timeout=60, cache_alias='default')
+        first.set('shared', self.user)
+        second.get('shared')
+
+        first.invalidate_user(self.user.pk, ['shared'])
+
+        self.assertIsNone(second.get('shared'))
+
+    def test_process_entries_trusted_briefly(self):
+        """Test tokens cached in the process use the short timeout"""
+        for alias, timeout in ((None, 5), ('default', 300)):
+            with patch.object(authentication, '_token_cache', None), \
+                    self.settings(TOKEN_AUTH_CACHE={'CACHE_ALIAS': alias}):
+                self.assertEqual(get_token_cache().timeout, timeout)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests through the token cache"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = sample_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        get_token_cache().clear()
+
+    def test_cached_token_skips_database(self):
+        """Test the token lookup only hits the database once"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_token_cache().stats()['hits'], 1)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token is no longer accepted"""
+        self.client.get(TAGS_URL)
+        self.token.delete()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user is no longer accepted"""
+        self.client.get(TAGS_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_edit_invalidates_cache(self):
+        """Test editing the user through the API is seen by next requests"""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'New name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New name')
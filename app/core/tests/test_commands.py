@@ -1,23 +1,215 @@
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Tag, Recipe
+
+from recipe.export import csv_lines
 
 
 class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        with patch('core.management.commands.wait_for_db.probe_database') \
+                as probe:
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(probe.call_count, 1)
+
+    def test_wait_for_db_queries(self):
+        """Test the database is probed with a real query"""
+        with CaptureQueriesContext(connection) as queries:
+            call_command('wait_for_db', stdout=StringIO())
+
+        self.assertEqual(queries[0]['sql'], 'SELECT 1')
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
-        """Test waiting for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        """Test waiting for db with exponential backoff"""
+        with patch('core.management.commands.wait_for_db.probe_database') \
+                as probe:
+            probe.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(probe.call_count, 6)
+
+        self.assertEqual(
+            [call[0][0] for call in ts.call_args_list],
+            [0.1, 0.2, 0.4, 0.8, 1.6]
+        )
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_max_delay(self, ts):
+        """Test the delay between retries is capped"""
+        with patch('core.management.commands.wait_for_db.probe_database') \
+                as probe:
+            probe.side_effect = [OperationalError] * 4 + [None]
+            call_command('wait_for_db', delay=1, max_delay=3,
+                         stdout=StringIO())
+
+        self.assertEqual(
+            [call[0][0] for call in ts.call_args_list], [1, 2, 3, 3]
+        )
+
+    def test_wait_for_db_timeout(self):
+        """Test giving up once the deadline has passed"""
+        with patch('core.management.commands.wait_for_db.probe_database') \
+                as probe:
+            probe.side_effect = OperationalError('refused')
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+    def test_profile_startup(self):
+        """Test the startup profile is reported by package and module"""
+        profile = {
+            'setup': 0.25,
+            'urls': 0.05,
+            'modules': [('django', 0.1), ('recipe.views', 0.02)],
+            'packages': {'django': 0.1, 'PIL': None},
+        }
+        out = StringIO()
+        with patch('core.management.commands.profile_startup.'
+                   'profile_startup', return_value=profile) as run:
+            call_command('profile_startup', package=['django', 'PIL'],
+                         top=1, stdout=out)
+
+        run.assert_called_once_with(['django', 'PIL'])
+        output = out.getvalue()
+        self.assertIn('django.setup(): 250.0 ms', output)
+        self.assertIn('URL conf: 50.0 ms', output)
+        self.assertRegex(output, r'PIL +not imported')
+        self.assertRegex(output, r'django +100.0 ms')
+        self.assertNotIn('recipe.views', output)
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test the import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'import@jmits.com',
+            'password123'
+        )
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        """Write a dump file and return its path"""
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as dump:
+            dump.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        """Run the command quietly"""
+        call_command('import_recipes', path, user=self.user.email,
+                     stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_import_ndjson(self):
+        """Test importing recipes with shared tags from NDJSON"""
+        lines = [
+            {'title': 'Curry', 'time_minutes': 20, 'price': '7.50',
+             'tags': ['Spicy', 'Dinner'], 'ingredients': ['Rice']},
+            {'title': 'Chili', 'time_minutes': 40, 'price': '6.00',
+             'tags': ['Spicy'], 'ingredients': []},
+        ]
+        path = self.write('dump.ndjson', '\n'.join(map(json.dumps, lines)))
+
+        self.run_import(path, chunk_size=1)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual([r.title for r in recipes], ['Curry', 'Chili'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            sorted(t.name for t in recipes[0].tags.all()), ['Dinner', 'Spicy']
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_import_csv_skips_invalid_rows(self):
+        """Test importing CSV reports and skips invalid rows"""
+        path = self.write('dump.csv', (
+            'title,time_minutes,price,link,tags,ingredients\n'
+            'Soup,15,3.00,,Starter|Vegan,Leek\n'
+            'Broken,soon,3.00,,,\n'
+        ))
+        stderr = StringIO()
+
+        call_command('import_recipes', path, user=self.user.email,
+                     stdout=StringIO(), stderr=stderr)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Soup')
+        self.assertEqual(recipe.ingredients.get().name, 'Leek')
+        self.assertIn('Line 2', stderr.getvalue())
+
+    def test_import_csv_export_round_trip(self):
+        """Test names holding the separator survive an export and import"""
+        names = ['Salt | Pepper', 'Back\\slash', 'Plain']
+        path = self.write('dump.csv', ''.join(csv_lines([{
+            'id': 1, 'title': 'Soup', 'time_minutes': 15, 'price': '3.00',
+            'link': '', 'tags': names, 'ingredients': [],
+        }])))
+
+        self.run_import(path)
+
+        self.assertEqual(
+            sorted(Tag.objects.values_list('name', flat=True)),
+            sorted(names)
+        )
+
+    def test_import_skips_values_out_of_field_range(self):
+        """Test values the columns cannot hold skip their row only"""
+        lines = [
+            {'title': 'Curry', 'time_minutes': 20, 'price': '7.50'},
+            {'title': 'Caviar', 'time_minutes': 5, 'price': 123456.78},
+            {'title': 'Free', 'time_minutes': 5, 'price': 'NaN'},
+            {'title': 'Rushed', 'time_minutes': -5, 'price': '1.00'},
+        ]
+        path = self.write('dump.ndjson', '\n'.join(map(json.dumps, lines)))
+        stderr = StringIO()
+
+        call_command('import_recipes', path, user=self.user.email,
+                     stdout=StringIO(), stderr=stderr)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Curry')
+        for line_number in range(2, 5):
+            self.assertIn(f'Line {line_number} skipped', stderr.getvalue())
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test an interrupted import resumes after the last chunk"""
+        first = json.dumps({'title': 'Done', 'time_minutes': 1, 'price': 1})
+        second = json.dumps({'title': 'Next', 'time_minutes': 1, 'price': 1})
+        path = self.write('dump.ndjson', f'{first}\n{second}\n')
+        with open(f'{path}.checkpoint', 'w') as checkpoint:
+            json.dump({
+                'offset': len(first) + 1, 'lines': 1, 'rows': 1,
+                'skipped': 0, 'size': os.path.getsize(path),
+                'user': self.user.pk,
+            }, checkpoint)
+
+        self.run_import(path)
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)), ['Next']
+        )
+
+    def test_import_rejects_foreign_checkpoint(self):
+        """Test a checkpoint of another file is not used silently"""
+        path = self.write('dump.ndjson', '{}\n')
+        with open(f'{path}.checkpoint', 'w') as checkpoint:
+            json.dump({'size': 1234, 'user': self.user.pk}, checkpoint)
+
+        with self.assertRaises(CommandError):
+            self.run_import(path)
@@ -0,0 +1,81 @@
+import time
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from core.db import check_connections, mark_connections_used
+
+
+class ConnectionHealthTests(TransactionTestCase):
+
+    def setUp(self):
+        connection.ensure_connection()
+        self.health_checks = connection.settings_dict.get(
+            'CONN_HEALTH_CHECKS'
+        )
+        self.idle = connection.settings_dict.get('CONN_HEALTH_CHECK_IDLE')
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = True
+        connection.settings_dict['CONN_HEALTH_CHECK_IDLE'] = 10
+        connection.health_check_used_at = None
+
+    def tearDown(self):
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = self.health_checks
+        connection.settings_dict['CONN_HEALTH_CHECK_IDLE'] = self.idle
+
+    def test_broken_connection_closed(self):
+        """Test a connection that stopped working is closed"""
+        with patch.object(connection, 'is_usable', return_value=False), \
+                patch.object(connection, 'close') as close:
+            check_connections()
+
+        close.assert_called_once_with()
+
+    def test_usable_connection_kept(self):
+        """Test a working connection is reused"""
+        with patch.object(connection, 'close') as close:
+            check_connections()
+
+        close.assert_not_called()
+
+    def test_disabled(self):
+        """Test nothing is probed without CONN_HEALTH_CHECKS"""
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = False
+        with patch.object(connection, 'is_usable') as is_usable:
+            check_connections()
+
+        is_usable.assert_not_called()
+
+    def test_recently_used_connection_not_probed(self):
+        """Test no query is spent on a connection used moments ago"""
+        mark_connections_used()
+        with patch.object(connection, 'is_usable') as is_usable:
+            check_connections()
+
+        is_usable.assert_not_called()
+
+    def test_idle_connection_probed(self):
+        """Test a connection idle past the threshold is probed"""
+        connection.health_check_used_at = time.monotonic() - 11
+        with patch.object(connection, 'is_usable', return_value=True) \
+                as is_usable:
+            check_connections()
+
+        is_usable.assert_called_once_with()
+
+    def test_marked_on_request_end(self):
+        """Test the next request does not probe the connection again"""
+        self.client.get(reverse('recipe:tag-list'))
+        with patch.object(connection, 'is_usable') as is_usable:
+            self.client.get(reverse('recipe:tag-list'))
+
+        is_usable.assert_not_called()
+
+    def test_checked_on_request_start(self):
+        """Test connections are checked when a request starts"""
+        with patch.object(connection, 'is_usable', return_value=False), \
+                patch.object(connection, 'close') as close:
+            self.client.get(reverse('recipe:tag-list'))
+
+        close.assert_called()
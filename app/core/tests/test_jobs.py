@@ -0,0 +1,188 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from io import StringIO
+
+from core import jobs
+from core.models import Job
+
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task('tests.fail', max_attempts=2)
+def fail():
+    raise ValueError('Broken')
+
+
+class JobTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_job(self):
+        """Test queuing a registered job with its arguments"""
+        job = jobs.enqueue(record, value=1)
+
+        self.assertEqual(job.name, 'tests.record')
+        self.assertEqual(job.payload, {'value': 1})
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.max_attempts, 3)
+
+    def test_enqueue_unknown_job(self):
+        """Test queuing a job that is not registered fails"""
+        with self.assertRaises(LookupError):
+            jobs.enqueue('tests.missing')
+
+    def test_run_pending_jobs(self):
+        """Test running jobs by priority then age"""
+        jobs.enqueue(record, value='low')
+        jobs.enqueue(record, value='high', priority=5)
+        jobs.enqueue(record, value='later', delay=60)
+
+        self.assertEqual(jobs.run_pending(), 2)
+
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(
+            Job.objects.filter(status=Job.SUCCEEDED).count(), 2
+        )
+
+    def test_claimed_job_is_not_claimed_again(self):
+        """Test a running job is never handed to another worker"""
+        job = jobs.enqueue(record, value=1)
+
+        self.assertEqual(jobs.claim_jobs('a'), [job])
+        self.assertEqual(jobs.claim_jobs('b'), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.locked_by, 'a')
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Test a failing job is queued again later, then marked failed"""
+        job = jobs.enqueue(fail)
+
+        with self.settings(JOBS={'RETRY_DELAY': 30}):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Broken', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=20))
+
+        Job.objects.update(run_at=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_delay_doubles(self):
+        """Test the retry delay grows exponentially up to a limit"""
+        with self.settings(JOBS={'RETRY_DELAY': 10, 'MAX_RETRY_DELAY': 50}):
+            self.assertEqual(
+                [jobs.retry_delay(n) for n in range(1, 5)], [10, 20, 40, 50]
+            )
+
+    def test_stale_job_is_requeued(self):
+        """Test a job abandoned by a dead worker is queued again"""
+        job = jobs.enqueue(record, value=1)
+        jobs.claim_jobs('dead')
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_claim_counts_attempt(self):
+        """Test claiming a job counts an attempt before it runs"""
+        job = jobs.enqueue(record, value=1)
+
+        self.assertEqual(jobs.claim_jobs('a')[0].attempts, 1)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+
+    def test_stale_job_out_of_attempts_fails(self):
+        """Test a job that keeps losing its worker is not retried forever"""
+        job = jobs.enqueue(record, value=1, max_attempts=1)
+        jobs.claim_jobs('dead')
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_heartbeat_keeps_job_locked(self):
+        """Test a long job whose lock is renewed is not requeued"""
+        job = jobs.enqueue(record, value=1)
+        jobs.claim_jobs('alive')
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.heartbeat('other', [job.pk]), 0)
+        self.assertEqual(jobs.heartbeat('alive', [job.pk]), 1)
+        self.assertEqual(jobs.requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+    def test_prune_finished_jobs(self):
+        """Test only finished jobs older than the retention are deleted"""
+        old = timezone.now() - timedelta(days=2)
+        jobs.enqueue(record, value='queued')
+        jobs.enqueue(record, value='old')
+        Job.objects.filter(payload__value='old').update(
+            status=Job.SUCCEEDED, finished_at=old,
+        )
+        jobs.enqueue(record, value='recent')
+        Job.objects.filter(payload__value='recent').update(
+            status=Job.FAILED, finished_at=timezone.now(),
+        )
+
+        with self.settings(JOBS={'FINISHED_RETENTION': 24 * 3600}):
+            self.assertEqual(jobs.prune_jobs(), 1)
+        with self.settings(JOBS={'FINISHED_RETENTION': None}):
+            self.assertEqual(jobs.prune_jobs(), 0)
+        self.assertEqual(
+            sorted(Job.objects.values_list('payload__value', flat=True)),
+            ['queued', 'recent'],
+        )
+
+    def test_worker_status(self):
+        """Test printing the number of jobs by status"""
+        jobs.enqueue(record, value=1)
+        jobs.enqueue(record, value=2)
+        jobs.enqueue(fail)
+        out = StringIO()
+
+        call_command('run_worker', status=True, stdout=out)
+
+        self.assertIn('tests.record: queued=2', out.getvalue())
+        self.assertIn('tests.fail: queued=1', out.getvalue())
+
+
+class WorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_jobs_on_threads(self):
+        """Test the worker command drains the queue and exits"""
+        for value in range(5):
+            jobs.enqueue(record, value=value)
+        out = StringIO()
+
+        with patch('signal.signal'):
+            call_command('run_worker', once=True, concurrency=2,
+                         poll_interval=0.01, stdout=out)
+
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertIn('Processed 5 jobs', out.getvalue())
+        self.assertFalse(Job.objects.exclude(status=Job.SUCCEEDED).exists())
@@ -0,0 +1,207 @@
+import asyncio
+import os
+import pstats
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    override_settings
+from django.urls import reverse
+
+from asgiref.sync import async_to_sync
+from rest_framework.test import APIClient
+
+from core.middleware import ProfilingMiddleware
+from core.models import Recipe, Tag
+from core.profiling import RequestProfile, timer
+from core.renderers import FastJSONRenderer
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def parse_server_timing(header):
+    """Return the metrics of a Server-Timing header by name"""
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class RequestProfileTests(TestCase):
+
+    def test_timer_outside_request(self):
+        """Test timers do nothing without a current profile"""
+        with timer('serialize'):
+            pass
+
+    def test_server_timing(self):
+        """Test durations are reported in milliseconds"""
+        with RequestProfile() as profile:
+            profile.queries = 2
+            profile.add('db', 0.0125)
+            with timer('render'):
+                pass
+
+        metrics = parse_server_timing(profile.server_timing())
+        self.assertEqual(metrics['db'], {'dur': '12.5', 'desc': '"2 queries"'})
+        self.assertEqual(
+            list(metrics), ['db', 'serialize', 'render', 'total']
+        )
+
+
+class ProfilingMiddlewareModeTests(SimpleTestCase):
+
+    def test_sync_handler(self):
+        """Test the middleware stays sync in front of a sync handler"""
+        middleware = ProfilingMiddleware(lambda request: HttpResponse())
+
+        self.assertFalse(asyncio.iscoroutinefunction(middleware))
+
+    @override_settings(PROFILING={'SERVER_TIMING': True})
+    def test_async_handler(self):
+        """Test the middleware awaits an async handler"""
+        async def get_response(request):
+            await asyncio.sleep(0.01)
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertGreaterEqual(float(metrics['total']['dur']), 10)
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@jmits.com', 'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price='7.25'
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Hot'))
+
+    @override_settings(PROFILING={'SERVER_TIMING': True})
+    def test_server_timing_header(self):
+        """Test responses carry the query, serializer and render times"""
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+
+        metrics = parse_server_timing(res['Server-Timing'])
+        self.assertRegex(metrics['db']['desc'], r'"[1-9]\d* queries"')
+        for name in ('db', 'serialize', 'total'):
+            self.assertGreater(float(metrics[name]['dur']), 0, name)
+        self.assertIn('dur', metrics['render'])
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']), float(metrics['db']['dur'])
+        )
+
+    @override_settings(PROFILING={'SERVER_TIMING': True})
+    def test_render_time(self):
+        """Test the time spent rendering the response is reported"""
+        render = FastJSONRenderer.render
+
+        def slow_render(renderer, *args, **kwargs):
+            time.sleep(0.01)
+            return render(renderer, *args, **kwargs)
+
+        with patch.object(FastJSONRenderer, 'render', slow_render):
+            res = self.client.get(TAGS_URL)
+
+        metrics = parse_server_timing(res['Server-Timing'])
+        self.assertGreaterEqual(float(metrics['render']['dur']), 10)
+
+    @override_settings(PROFILING={'SERVER_TIMING': False})
+    def test_server_timing_disabled(self):
+        """Test the header is not sent to every client when off"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_server_timing_with_token(self):
+        """Test requests sending the token get the header when it is off"""
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING={
+                'SERVER_TIMING': False, 'TOKEN': 'secret',
+                'DIRECTORY': directory,
+            }):
+                res = self.client.get(
+                    TAGS_URL, HTTP_X_PROFILE_TOKEN='secret'
+                )
+                guess = self.client.get(
+                    TAGS_URL, HTTP_X_PROFILE_TOKEN='guess'
+                )
+
+        self.assertIn('total', parse_server_timing(res['Server-Timing']))
+        self.assertNotIn('Server-Timing', guess)
+
+    @override_settings(PROFILING={'SERVER_TIMING': True})
+    def test_no_server_timing_when_streaming(self):
+        """Test streamed responses get no timings missing the body"""
+        res = self.client.get(reverse('recipe:recipe-export'))
+        b''.join(res.streaming_content)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_request_logged(self):
+        """Test each request is logged with its view and timings"""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.client.get(TAGS_URL)
+
+        record, = logs.records
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual(record.profile['view'], 'recipe:tag-list')
+        self.assertEqual(record.profile['status'], 200)
+        self.assertGreater(record.profile['db_queries'], 0)
+        self.assertEqual(
+            set(record.profile),
+            {'method', 'path', 'view', 'status', 'total_ms', 'db_queries',
+             'db_ms', 'serialize_ms', 'render_ms'}
+        )
+
+    @override_settings(PROFILING={'SLOW_REQUEST_MS': -1})
+    def test_slow_request_warning(self):
+        """Test requests over the threshold are logged as warnings"""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.client.get(TAGS_URL)
+
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+
+    def test_profile_with_token(self):
+        """Test a request sending the token is profiled to a file"""
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILING={
+                'TOKEN': 'secret', 'DIRECTORY': directory,
+            }):
+                res = self.client.get(TAGS_URL, HTTP_X_PROFILE_TOKEN='secret')
+
+            name = res['X-Profile-File']
+            self.assertTrue(name.endswith('.prof'))
+            self.assertIn('recipe-tag-list', name)
+            stats = pstats.Stats(os.path.join(directory, name))
+            self.assertGreater(stats.total_calls, 0)
+
+    def test_no_profile_without_token(self):
+        """Test a wrong or unconfigured token does not profile"""
+        with tempfile.TemporaryDirectory() as directory:
+            for token in ('secret', None):
+                with override_settings(PROFILING={
+                    'TOKEN': token, 'DIRECTORY': directory,
+                }):
+                    res = self.client.get(
+                        TAGS_URL, HTTP_X_PROFILE_TOKEN='guess'
+                    )
+
+                self.assertNotIn('X-Profile-File', res)
+            self.assertEqual(os.listdir(directory), [])
@@ -1,5 +1,6 @@
 from unittest.mock import patch
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -57,6 +58,18 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(tag), tag.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test that a user cannot have two tags with the same name"""
+        user = sample_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(
+            user=sample_user('other@jmit.com'),
+            name='Vegan'
+        )
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Vegan')
+
     def test_ingredient_str(self):
         """Test the ingredient representation"""
         ingredient = models.Ingredient.objects.create(
@@ -0,0 +1,128 @@
+import datetime
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+RECIPE_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+
+DATA = OrderedDict([
+    ('id', 1),
+    ('title', 'Crème brûlée \u2028 "quoted" <b>'),
+    ('price', Decimal('12.50')),
+    ('image', 'http://testserver/media/uploads/recipe/a%20b.jpg'),
+    ('renditions', {'thumbnail': 'http://testserver/media/t.jpg'}),
+    ('tags', [1, 2]),
+    ('created', datetime.datetime(2020, 1, 2, 3, 4, 5)),
+    ('label', gettext_lazy('Recipe')),
+    ('link', None),
+    ('histogram', {10: 2}),
+])
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def test_same_bytes_as_stock_renderer(self):
+        """Test the output matches the stdlib JSON renderer"""
+        self.assertEqual(
+            FastJSONRenderer().render(DATA), JSONRenderer().render(DATA)
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_non_finite_floats_rejected(self):
+        """Test NaN and infinities raise like the strict stock renderer"""
+        for value in (float('nan'), float('inf'), float('-inf')):
+            data = {'results': [{'id': 1, 'link': None, 'score': value}]}
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render(data)
+
+    def test_non_strict(self):
+        """Test NaN is written as a literal when STRICT_JSON is off"""
+        renderer = FastJSONRenderer()
+        renderer.strict = False
+
+        self.assertEqual(
+            renderer.render({'score': float('nan')}), b'{"score":NaN}'
+        )
+
+    def test_indent(self):
+        """Test indented output is left to the stock renderer"""
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, media_type),
+            JSONRenderer().render(DATA, media_type),
+        )
+
+
+@skipIf(msgpack is None, 'msgpack is not installed')
+class MessagePackRendererTests(SimpleTestCase):
+
+    def test_render(self):
+        """Test data is packed with decimals kept exact"""
+        data = msgpack.unpackb(
+            MessagePackRenderer().render(DATA), raw=False, strict_map_key=False
+        )
+
+        self.assertEqual(data['price'], '12.50')
+        self.assertEqual(data['title'], DATA['title'])
+        self.assertEqual(data['image'], DATA['image'])
+        self.assertEqual(data['created'], '2020-01-02T03:04:05')
+        self.assertEqual(data['label'], 'Recipe')
+        self.assertEqual(data['histogram'], {10: 2})
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+
+@skipIf(msgpack is None, 'msgpack is not installed')
+class ContentNegotiationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@jmits.com', 'testpass', name='Test'
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price='7.25'
+        )
+
+    def test_recipes_as_msgpack(self):
+        """Test recipes are sent as MessagePack when accepted"""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(res.content, raw=False)
+        self.assertEqual(data['results'][0]['title'], 'Curry')
+        self.assertEqual(data['results'][0]['price'], '7.25')
+
+    def test_json_by_default(self):
+        """Test JSON stays the default and is cached apart"""
+        self.client.get(RECIPE_URL, HTTP_ACCEPT='application/msgpack')
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res.json()['results'][0]['price'], '7.25')
+
+    def test_user_as_msgpack(self):
+        """Test the user API negotiates MessagePack too"""
+        res = self.client.get(ME_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(
+            msgpack.unpackb(res.content, raw=False),
+            {'email': 'user@jmits.com', 'name': 'Test'},
+        )
@@ -0,0 +1,94 @@
+import os
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
+from django.test import TestCase, override_settings
+
+from core.management.commands.serve import Command, DEFAULT_WORKERS
+from core.server import DjangoApplication, warmup, warmup_host
+
+
+class WarmupTests(TestCase):
+
+    def test_warmup_requests(self):
+        """Test warmup paths are requested through the WSGI app"""
+        statuses = warmup(
+            get_wsgi_application(), ['/api/recipe/tags/', '/missing/']
+        )
+
+        self.assertEqual(statuses, ['401 Unauthorized', '404 Not Found'])
+
+    @override_settings(ALLOWED_HOSTS=['*', '.example.com'])
+    def test_warmup_host(self):
+        """Test warmup requests use a host that is allowed"""
+        self.assertEqual(warmup_host(), 'example.com')
+
+    def test_worker_warms_up_before_serving(self):
+        """Test the post_worker_init hook warms the worker up"""
+        application = DjangoApplication({}, warmup_paths=['/missing/'])
+        worker = Mock(wsgi=get_wsgi_application(), pid=1)
+
+        application.cfg.post_worker_init(worker)
+
+        self.assertIn('404 Not Found', worker.log.info.call_args[0])
+
+
+class ServeCommandTests(TestCase):
+
+    @patch.object(DjangoApplication, 'run')
+    def test_serve_options(self, run):
+        """Test the command options configure gunicorn"""
+        with patch('core.management.commands.serve.DjangoApplication',
+                   wraps=DjangoApplication) as application:
+            call_command(
+                'serve', '--workers=3', '--threads=4', '--preload',
+                '--max-requests=500', '--max-requests-jitter=50',
+                '--warmup=/api/recipe/recipes/',
+            )
+
+        options = application.call_args[0][0]
+        cfg = DjangoApplication(options).cfg
+        self.assertEqual(cfg.workers, 3)
+        self.assertEqual(cfg.threads, 4)
+        self.assertEqual(cfg.worker_class_str, 'gthread')
+        self.assertTrue(cfg.preload_app)
+        self.assertEqual(cfg.max_requests, 500)
+        self.assertEqual(cfg.max_requests_jitter, 50)
+        self.assertEqual(
+            application.call_args[1]['warmup_paths'],
+            ['/api/recipe/recipes/']
+        )
+        run.assert_called_once_with()
+
+    @patch.object(DjangoApplication, 'run')
+    def test_serve_defaults(self, run):
+        """Test a single thread uses the sync worker"""
+        with patch('core.management.commands.serve.DjangoApplication',
+                   wraps=DjangoApplication) as application:
+            call_command('serve', '--workers=2')
+
+        options = application.call_args[0][0]
+        self.assertEqual(options['worker_class'], 'sync')
+        self.assertFalse(options['preload_app'])
+        self.assertEqual(options['max_requests'], 0)
+
+    @patch.object(DjangoApplication, 'run')
+    def test_serve_default_workers(self, run):
+        """Test the workers come from WEB_CONCURRENCY when serving"""
+        with patch('core.management.commands.serve.DjangoApplication',
+                   wraps=DjangoApplication) as application:
+            with patch.dict('os.environ', {'WEB_CONCURRENCY': '3'}):
+                call_command('serve')
+            with patch.dict('os.environ'):
+                os.environ.pop('WEB_CONCURRENCY', None)
+                call_command('serve')
+
+        self.assertEqual(
+            [call[0][0]['workers'] for call in application.call_args_list],
+            [3, DEFAULT_WORKERS]
+        )
+
+    def test_serve_skips_system_checks(self):
+        """Test serving leaves the system checks to migrate"""
+        self.assertFalse(Command.requires_system_checks)
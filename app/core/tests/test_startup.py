@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+
+from core.startup import parse_importtime, profile_startup
+
+
+class StartupProfileTests(SimpleTestCase):
+
+    def test_parse_importtime(self):
+        """Test the self time of each module is read"""
+        modules = parse_importtime([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       250 |        250 |   django.utils',
+            'import time:      1500 |       1750 | django',
+            'unrelated output',
+        ])
+
+        self.assertEqual(
+            modules, [('django.utils', 0.00025), ('django', 0.0015)]
+        )
+
+    def test_profile_startup(self):
+        """Test startup is profiled by package in a new process"""
+        profile = profile_startup(('django', 'recipe', 'PIL'))
+
+        self.assertGreater(profile['setup'], 0)
+        self.assertGreater(profile['urls'], 0)
+        self.assertGreater(profile['packages']['django'], 0)
+        self.assertGreater(profile['packages']['recipe'], 0)
+        self.assertIn('recipe.views', dict(profile['modules']))
+
+    def test_pillow_imported_lazily(self):
+        """Test starting the app does not import Pillow"""
+        profile = profile_startup(('PIL',))
+
+        self.assertIsNone(profile['packages']['PIL'])
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+DIGEST = 'a' * 64
+CONTENT = bytes(range(256)) * 4
+
+
+def media_url(path):
+    return reverse('media', args=[path])
+
+
+class ServeMediaTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.media_root, MEDIA_SENDFILE_BACKEND=None
+        )
+        self.override.enable()
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        for name in (f'{DIGEST}.jpg', 'photo.jpg'):
+            with open(os.path.join(self.media_root, 'uploads', name),
+                      'wb') as f:
+                f.write(CONTENT)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_serve_file(self):
+        """Test serving a whole media file"""
+        res = self.client.get(media_url('uploads/photo.jpg'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=3600', res['Cache-Control'])
+        self.assertNotIn('immutable', res['Cache-Control'])
+
+    def test_digest_names_are_immutable(self):
+        """Test content addressed files are cached forever"""
+        res = self.client.get(media_url(f'uploads/{DIGEST}.jpg'))
+
+        self.assertEqual(res['ETag'], f'"{DIGEST}"')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+
+    def test_conditional_get(self):
+        """Test a matching ETag or date is answered with 304"""
+        url = media_url('uploads/photo.jpg')
+        res = self.client.get(url)
+
+        etag = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        date = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+        self.assertEqual(etag.status_code, 304)
+        self.assertEqual(date.status_code, 304)
+
+    def test_range_request(self):
+        """Test serving a slice of a file"""
+        url = media_url('uploads/photo.jpg')
+
+        res = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[10:20])
+
+        res = self.client.get(url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(res['Content-Length'], '24')
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[1000:])
+
+        res = self.client.get(url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[-4:])
+
+    def test_unsatisfiable_range(self):
+        """Test a range past the end of the file is answered with 416"""
+        res = self.client.get(
+            media_url('uploads/photo.jpg'), HTTP_RANGE='bytes=2000-'
+        )
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */1024')
+
+    def test_stale_if_range_serves_whole_file(self):
+        """Test a range is ignored when the file has changed"""
+        res = self.client.get(
+            media_url('uploads/photo.jpg'),
+            HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+
+    def test_sendfile_offload(self):
+        """Test the transfer is left to the front proxy when configured"""
+        url = media_url('uploads/photo.jpg')
+
+        with self.settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect'):
+            res = self.client.get(url)
+        self.assertEqual(
+            res['X-Accel-Redirect'], '/protected-media/uploads/photo.jpg'
+        )
+        self.assertEqual(res.content, b'')
+
+        with self.settings(MEDIA_SENDFILE_BACKEND='x-sendfile'):
+            res = self.client.get(url)
+        self.assertEqual(
+            res['X-Sendfile'],
+            os.path.join(self.media_root, 'uploads', 'photo.jpg')
+        )
+
+    def test_missing_or_outside_files(self):
+        """Test files missing or outside the media root are not found"""
+        self.assertEqual(
+            self.client.get(media_url('uploads/missing.jpg')).status_code,
+            404
+        )
+        self.assertEqual(
+            self.client.get(media_url('../etc/passwd')).status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(media_url('uploads')).status_code, 404
+        )
@@ -0,0 +1,91 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import (
+    MultiPartParser as DjangoMultiPartParser,
+    MultiPartParserError,
+)
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Upload too large.')
+    default_code = 'upload_too_large'
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploaded files to disk, hashing them on the way
+
+    Files never sit in memory whatever their size: each chunk is written
+    to a temporary file and fed to a SHA-256 hash, which is set on the
+    uploaded file as `digest`. Uploads larger than `max_size` bytes are
+    rejected as soon as the limit is crossed.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # Reject early when the declared body cannot fit the limit
+        if self.max_size is not None and content_length and \
+                content_length > self.max_size + self.chunk_size:
+            raise UploadTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hash = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.max_size is not None and self.received > self.max_size:
+            self.file.close()
+            raise UploadTooLarge()
+        self.hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.digest = self.hash.hexdigest()
+        return file
+
+
+class HashingMultiPartParser(MultiPartParser):
+    """Multipart parser streaming files through `HashingUploadHandler`
+
+    The size limit is read from the `max_upload_size` attribute of the
+    view, falling back to the `MAX_UPLOAD_SIZE` setting.
+    """
+
+    def get_upload_handlers(self, request, view=None):
+        max_size = getattr(view, 'max_upload_size', None) or \
+            getattr(settings, 'MAX_UPLOAD_SIZE', None)
+        return [HashingUploadHandler(request, max_size=max_size)]
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        upload_handlers = self.get_upload_handlers(
+            request, parser_context.get('view')
+        )
+
+        try:
+            parser = DjangoMultiPartParser(
+                meta, stream, upload_handlers, encoding
+            )
+            data, files = parser.parse()
+            return DataAndFiles(data, files)
+        except MultiPartParserError as exc:
+            raise ParseError('Multipart form parse error - %s' % str(exc))
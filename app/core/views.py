@@ -0,0 +1,159 @@
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+# Names made of a SHA-256 digest never change content, see core.uploads
+DIGEST_NAME_RE = re.compile(r'^[0-9a-f]{64}\.\w+$')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def parse_range(header, size):
+    """Return the (start, end) bytes of a single range request, or None
+
+    Multiple ranges are not supported and, as the RFC allows, answered
+    with the whole file. Raises ValueError for unsatisfiable ranges.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def _read_range(file, length, block_size):
+    """Yield `length` bytes of a file from its current position"""
+    while length > 0:
+        chunk = file.read(min(block_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+def _offload(response, path, full_path):
+    """Let the front proxy send the file, if configured to do so"""
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    if backend == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX',
+                         '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + path
+    elif backend == 'x-sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        return False
+    return True
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file of MEDIA_ROOT
+
+    Supports conditional requests and single byte ranges. Files named by
+    their digest are cached forever by clients. The transfer itself is
+    left to the front proxy when MEDIA_SENDFILE_BACKEND is set, otherwise
+    the open file is handed to the WSGI server, which sends it with
+    `os.sendfile` when it provides `wsgi.file_wrapper`.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, ValueError, OSError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('File not found')
+
+    size = stat_result.st_size
+    name = os.path.basename(full_path)
+    immutable = DIGEST_NAME_RE.match(name) is not None
+    if immutable:
+        etag = quote_etag(name.split('.')[0])
+    else:
+        etag = quote_etag(f'{stat_result.st_mtime_ns:x}-{size:x}')
+    last_modified = int(stat_result.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = _file_response(request, path, full_path, size, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if immutable:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(
+            response, public=True,
+            max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600),
+        )
+
+    return response
+
+
+def _file_response(request, path, full_path, size, etag):
+    """Build the full or partial response sending a file"""
+    offloaded = HttpResponse()
+    if _offload(offloaded, path, full_path):
+        # The proxy sets the content type and handles ranges itself
+        del offloaded['Content-Type']
+        return offloaded
+
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and size:
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range is None or etag in parse_etags(if_range):
+            try:
+                byte_range = parse_range(header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    start, end = byte_range
+    length = end - start + 1
+    file.seek(start)
+    response = FileResponse(file, status=206)
+    if end < size - 1:
+        # wsgi.file_wrapper sends up to the end of the file, so a range
+        # stopping before it is streamed in Python instead
+        response.streaming_content = _read_range(
+            file, length, response.block_size
+        )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RecipeConfig(AppConfig):
     name = 'recipe'
+
+    def ready(self):
+        """Connect the signal receivers"""
+        from recipe import signals  # noqa: F401
@@ -0,0 +1,93 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def version_key(user_id):
+    """Return the cache key holding the data version of a user"""
+    return f'recipe:version:{user_id}'
+
+
+def get_user_version(user_id):
+    """Return the current data version of a user"""
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a version evicted from the cache never
+        # comes back with a number that older responses were cached under
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached response of a user"""
+    key = version_key(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        get_user_version(user_id)
+        return cache.incr(key)
+
+
+class VersionedCacheMixin:
+    """Cache list and retrieve responses per user and data version
+
+    Responses are stored under the user's data version, which signal
+    receivers in `recipe.signals` bump whenever a tag, ingredient or
+    recipe of the user changes. A matching `If-None-Match` is answered
+    with 304 from the version alone, without querying the recipe tables.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cache_digest(self, request):
+        """Return a digest of the request at the user's data version"""
+        version = get_user_version(request.user.pk)
+
+        return hashlib.sha1('\n'.join((
+            str(request.user.pk),
+            str(version),
+            request.get_full_path(),
+            request.accepted_media_type or '',
+        )).encode('utf-8')).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Answer from the cache, or call the handler and cache its data"""
+        digest = self.get_cache_digest(request)
+        etag = f'"{digest}"'
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f'recipe:response:{digest}'
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(
+                    key, response.data,
+                    getattr(settings, 'RECIPE_RESPONSE_CACHE_TIMEOUT', 3600)
+                )
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+
+        return response
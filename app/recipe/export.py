@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+from core.models import Recipe
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+
+# Separates the names of a list value in a CSV cell
+NAME_SEPARATOR = '|'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renderer for newline delimited JSON, one object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(ndjson_lines(rows)).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """Renderer for comma separated values with a header row"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        fields = list(rows[0]) if rows else []
+        return ''.join(csv_lines(rows, fields)).encode(self.charset)
+
+
+def iter_recipes(queryset, batch_size=1000):
+    """Yield the recipes of a queryset as dicts with tag/ingredient names
+
+    Rows are read in primary key order, one keyset batch at a time, and
+    the names of each batch are loaded with one query per relation. Memory
+    therefore stays bounded by the batch size, not by the catalog size.
+    """
+    RecipeTag = Recipe.tags.through
+    RecipeIngredient = Recipe.ingredients.through
+    queryset = queryset.order_by('id').values(*EXPORT_FIELDS)
+    last_id = None
+
+    while True:
+        batch = queryset if last_id is None \
+            else queryset.filter(id__gt=last_id)
+        rows = list(batch[:batch_size])
+        if not rows:
+            return
+
+        ids = [row['id'] for row in rows]
+        tags = _names_by_recipe(
+            RecipeTag.objects.filter(recipe_id__in=ids)
+            .values_list('recipe_id', 'tag__name')
+        )
+        ingredients = _names_by_recipe(
+            RecipeIngredient.objects.filter(recipe_id__in=ids)
+            .values_list('recipe_id', 'ingredient__name')
+        )
+
+        for row in rows:
+            row['price'] = str(row['price'])
+            row['tags'] = tags.get(row['id'], [])
+            row['ingredients'] = ingredients.get(row['id'], [])
+            yield row
+
+        last_id = ids[-1]
+
+
+def ndjson_lines(rows):
+    """Yield each row as a line of JSON"""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def join_names(names):
+    """Join names with `|`, escaping it and `\\` with a backslash"""
+    return NAME_SEPARATOR.join(
+        name.replace('\\', '\\\\').replace(NAME_SEPARATOR, '\\|')
+        for name in names
+    )
+
+
+def split_names(value):
+    """Return the non blank names of a value made by `join_names`"""
+    names = []
+    name = []
+    chars = iter(value)
+    for char in chars:
+        if char == '\\':
+            name.append(next(chars, ''))
+        elif char == NAME_SEPARATOR:
+            names.append(''.join(name))
+            name = []
+        else:
+            name.append(char)
+    names.append(''.join(name))
+    return [name for name in names if name]
+
+
+def csv_lines(rows, fields=EXPORT_FIELDS + ('tags', 'ingredients')):
+    """Yield a CSV header then one line per row
+
+    List values such as tag names are joined by `join_names`.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(fields)
+    for row in rows:
+        yield line([
+            join_names(row[field]) if isinstance(row[field], list)
+            else row[field]
+            for field in fields
+        ])
+
+
+def _names_by_recipe(pairs):
+    """Group (recipe id, name) pairs into a dict of sorted name lists"""
+    names = {}
+    for recipe_id, name in pairs:
+        names.setdefault(recipe_id, []).append(name)
+    for values in names.values():
+        values.sort()
+    return names
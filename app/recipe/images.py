@@ -0,0 +1,115 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from core.models import StoredImage, recipe_image_digest_path
+from recipe.renditions import delete_renditions
+
+# Formats accepted for upload and the extension they are stored with
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+DEFAULT_MAX_PIXELS = 50 * 10 ** 6
+
+
+def read_image_header(image_file):
+    """Return the (format, width, height) of an image file
+
+    Only the header is parsed: Pillow opens images lazily and the pixel
+    data is never decoded. Raises ValueError for unreadable or unsupported
+    images and for dimensions above RECIPE_IMAGE_MAX_PIXELS.
+    """
+    from PIL import Image
+
+    max_pixels = getattr(
+        settings, 'RECIPE_IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS
+    )
+    position = image_file.tell()
+    try:
+        with Image.open(image_file) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError('Upload a valid image.')
+    finally:
+        image_file.seek(position)
+
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f'Unsupported image format {image_format}.')
+    if width * height > max_pixels:
+        raise ValueError('Image dimensions are too large.')
+
+    return image_format, width, height
+
+
+def file_digest(image_file):
+    """Return the SHA-256 of a file, hashed in chunks"""
+    digest = hashlib.sha256()
+    image_file.seek(0)
+    for chunk in image_file.chunks():
+        digest.update(chunk)
+    image_file.seek(0)
+    return digest.hexdigest()
+
+
+def store_image(image_file, storage=default_storage):
+    """Store an uploaded image by content and take a reference to it
+
+    `image_file` must have been checked by `read_image_header`, whose
+    result is expected in its `image_info` attribute. The digest computed
+    while streaming the upload is reused when present. Identical content
+    is written once and shared, the returned `StoredImage` counting the
+    references to it.
+    """
+    digest = getattr(image_file, 'digest', None) or file_digest(image_file)
+    image_format, width, height = image_file.image_info
+    name = recipe_image_digest_path(digest, IMAGE_FORMATS[image_format])
+
+    with transaction.atomic():
+        stored, created = StoredImage.objects.select_for_update() \
+            .get_or_create(digest=digest, defaults={
+                'name': name,
+                'size': image_file.size,
+                'width': width,
+                'height': height,
+            })
+        if created or not storage.exists(stored.name):
+            image_file.seek(0)
+            saved = storage.save(stored.name, image_file)
+            if saved != stored.name:
+                stored.name = saved
+                stored.save(update_fields=['name'])
+
+        StoredImage.objects.filter(pk=stored.pk) \
+            .update(ref_count=F('ref_count') + 1)
+        stored.refresh_from_db(fields=['ref_count'])
+
+    return stored
+
+
+def release_image(name, storage=default_storage):
+    """Drop a reference to a stored image, deleting it once unused
+
+    Files are deleted after the transaction commits. Images that were not
+    stored by content belong to a single recipe and are deleted directly.
+    """
+    with transaction.atomic():
+        stored = StoredImage.objects.select_for_update() \
+            .filter(name=name).first()
+        if stored is not None:
+            stored.ref_count = max(stored.ref_count - 1, 0)
+            if stored.ref_count:
+                stored.save(update_fields=['ref_count'])
+                return
+            stored.delete()
+
+        transaction.on_commit(lambda: _delete_image(name, storage))
+
+
+def _delete_image(name, storage):
+    """Delete an image file and its renditions unless stored again"""
+    if StoredImage.objects.filter(name=name).exists():
+        return
+    delete_renditions(name, storage)
+    storage.delete(name)
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import RecipeStats
+
+from recipe.stats import STATS_FIELDS, compute_stats, rebuild_stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute the recipe stats of users
+
+    With --verify the stored stats are compared with freshly computed
+    ones and nothing is written; the command fails if any differ.
+    """
+    help = 'Rebuild or verify the per user recipe stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', default=[],
+                            help='Email of a user, may be repeated')
+        parser.add_argument('--verify', action='store_true',
+                            help='Report stats that differ, without fixing')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('id')
+        if options['user']:
+            users = users.filter(email__in=options['user'])
+            if users.count() != len(set(options['user'])):
+                raise CommandError('Unknown user')
+        user_ids = list(users.values_list('id', flat=True))
+
+        if not options['verify']:
+            for user_id in user_ids:
+                rebuild_stats(user_id)
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt the stats of {len(user_ids)} users'
+            ))
+            return
+
+        stored = RecipeStats.objects.in_bulk(user_ids)
+        mismatches = 0
+        for user_id in user_ids:
+            if user_id not in stored:
+                continue
+            expected = compute_stats(user_id)
+            fields = [
+                field for field in STATS_FIELDS
+                if getattr(stored[user_id], field) != getattr(expected, field)
+            ]
+            if fields:
+                mismatches += 1
+                self.stderr.write(
+                    f'User {user_id}: {", ".join(fields)} differ'
+                )
+
+        if mismatches:
+            raise CommandError(f'{mismatches} users have stale stats')
+        self.stdout.write(self.style.SUCCESS(
+            f'Verified the stats of {len(stored)} users'
+        ))
@@ -0,0 +1,216 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+
+from core.models import Recipe
+
+
+DEFAULT_PANTRY_INDEX = {
+    # Maximum number of users whose index is kept in the process
+    'MAX_USERS': 100,
+    # Seconds an index is trusted, bounding how long changes made by
+    # other processes may go unseen
+    'TIMEOUT': 60,
+}
+
+
+def _popcount(value):
+    return bin(value).count('1')
+
+
+class UserPantry:
+    """Recipe x ingredient bitsets of one user
+
+    Every ingredient of the user is given a bit and every recipe is a
+    Python int with the bits of its ingredients set, so the ingredients
+    a recipe misses are `recipe & ~pantry`. An inverted index from
+    ingredient to recipes limits each match to the recipes sharing at
+    least one ingredient with the pantry.
+    """
+
+    def __init__(self, links=()):
+        self.bits = {}
+        self.ingredient_ids = []
+        self.masks = {}
+        self.recipes = defaultdict(set)
+        self.built_at = time.monotonic()
+        for recipe_id, ingredient_id in links:
+            self.add(recipe_id, ingredient_id)
+
+    def bit(self, ingredient_id):
+        """Return the bit of an ingredient, allocating one if needed"""
+        bit = self.bits.get(ingredient_id)
+        if bit is None:
+            bit = self.bits[ingredient_id] = len(self.ingredient_ids)
+            self.ingredient_ids.append(ingredient_id)
+        return bit
+
+    def add(self, recipe_id, ingredient_id):
+        mask = 1 << self.bit(ingredient_id)
+        self.masks[recipe_id] = self.masks.get(recipe_id, 0) | mask
+        self.recipes[ingredient_id].add(recipe_id)
+
+    def remove(self, recipe_id, ingredient_id):
+        bit = self.bits.get(ingredient_id)
+        if bit is None or recipe_id not in self.masks:
+            return
+        self.masks[recipe_id] &= ~(1 << bit)
+        self.recipes[ingredient_id].discard(recipe_id)
+
+    def remove_recipe(self, recipe_id):
+        mask = self.masks.pop(recipe_id, 0)
+        for ingredient_id in self.ingredients(mask):
+            self.recipes[ingredient_id].discard(recipe_id)
+
+    def ingredients(self, mask):
+        """Return the ingredient ids of a bitset"""
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(self.ingredient_ids[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+    def match(self, ingredient_ids, limit):
+        """Rank the recipes sharing ingredients with a pantry
+
+        Returns up to `limit` (recipe_id, missing ingredient ids) pairs,
+        recipes the pantry fully covers first, then by fewest missing
+        ingredients, most matched ingredients and newest recipe.
+        """
+        pantry = 0
+        candidates = set()
+        for ingredient_id in ingredient_ids:
+            bit = self.bits.get(ingredient_id)
+            if bit is not None:
+                pantry |= 1 << bit
+                candidates |= self.recipes[ingredient_id]
+
+        def rank(recipe_id):
+            mask = self.masks[recipe_id]
+            return (
+                _popcount(mask & ~pantry),
+                -_popcount(mask & pantry),
+                -recipe_id,
+            )
+
+        return [
+            (recipe_id, self.ingredients(self.masks[recipe_id] & ~pantry))
+            for recipe_id in heapq.nsmallest(limit, candidates, key=rank)
+        ]
+
+
+class _Build:
+    """Bitsets of a user being loaded by one thread for the others"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.pantry = None
+        # Set when the user changed while loading, the result may miss it
+        self.stale = False
+
+
+class PantryIndex:
+    """Bounded LRU of the pantry bitsets of each user
+
+    A user's bitsets are loaded with one query on first use and then
+    kept in step by the signal receivers in `recipe.signals`. Threads
+    asking for a user being loaded wait for that build, and a build the
+    user changed during is returned to its thread but not kept.
+    """
+
+    def __init__(self, max_users, timeout):
+        self.max_users = max_users
+        self.timeout = timeout
+        self._users = OrderedDict()
+        self._builds = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the bitsets of a user, building them if needed"""
+        with self._lock:
+            pantry = self._users.get(user_id)
+            if pantry is not None:
+                if time.monotonic() - pantry.built_at < self.timeout:
+                    self._users.move_to_end(user_id)
+                    return pantry
+                del self._users[user_id]
+            build = self._builds.get(user_id)
+            if build is None:
+                build = self._builds[user_id] = _Build()
+                building = True
+            else:
+                building = False
+
+        if not building:
+            build.done.wait()
+            if build.pantry is None or build.stale:
+                return self.get(user_id)
+            return build.pantry
+
+        try:
+            build.pantry = self.load(user_id)
+        finally:
+            with self._lock:
+                del self._builds[user_id]
+                if build.pantry is not None and not build.stale:
+                    self._users[user_id] = build.pantry
+                    while len(self._users) > self.max_users:
+                        self._users.popitem(last=False)
+            build.done.set()
+
+        return build.pantry
+
+    def load(self, user_id):
+        """Build the bitsets of a user from the database"""
+        return UserPantry(
+            Recipe.ingredients.through.objects.filter(
+                recipe__user_id=user_id
+            ).values_list('recipe_id', 'ingredient_id').iterator()
+        )
+
+    def update(self, user_id, func):
+        """Apply a change to the bitsets of a user, if they are loaded"""
+        with self._lock:
+            pantry = self._users.get(user_id)
+            if pantry is not None:
+                func(pantry)
+            self._mark_stale(user_id)
+
+    def invalidate(self, user_id):
+        """Forget the bitsets of a user"""
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._mark_stale(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            for build in self._builds.values():
+                build.stale = True
+
+    def _mark_stale(self, user_id):
+        build = self._builds.get(user_id)
+        if build is not None:
+            build.stale = True
+
+
+_pantry_index = None
+
+
+def get_pantry_index():
+    """Return the process wide pantry index built from settings"""
+    global _pantry_index
+    if _pantry_index is None:
+        options = dict(
+            DEFAULT_PANTRY_INDEX,
+            **getattr(settings, 'PANTRY_INDEX', {})
+        )
+        _pantry_index = PantryIndex(
+            max_users=options['MAX_USERS'],
+            timeout=options['TIMEOUT'],
+        )
+    return _pantry_index
@@ -0,0 +1,127 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RENDITIONS = {
+    'thumbnail': {'size': (150, 150), 'format': 'JPEG', 'quality': 80},
+    'medium': {'size': (800, 800), 'format': 'JPEG', 'quality': 85},
+    'webp': {'size': (1600, 1600), 'format': 'WEBP', 'quality': 80},
+}
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def get_rendition_specs():
+    """Return the configured renditions, largest first"""
+    specs = getattr(settings, 'RECIPE_IMAGE_RENDITIONS', DEFAULT_RENDITIONS)
+    return sorted(
+        specs.items(),
+        key=lambda item: item[1]['size'][0] * item[1]['size'][1],
+        reverse=True,
+    )
+
+
+def rendition_path(image_name, name, spec):
+    """Return the storage path of a rendition of an image"""
+    directory, file_name = os.path.split(image_name)
+    stem = os.path.splitext(file_name)[0]
+    extension = EXTENSIONS.get(spec['format'], spec['format'].lower())
+    return os.path.join(directory, 'renditions', f'{stem}_{name}.{extension}')
+
+
+def render_renditions(image_file, specs):
+    """Yield (name, spec, encoded bytes) for each rendition of an image
+
+    The source is decoded once. For JPEG the decoder is put in draft mode
+    so it only decodes at the smallest DCT scale still larger than the
+    biggest rendition, which is several times cheaper for large photos.
+    Smaller renditions are then derived from the bigger ones.
+    """
+    from PIL import Image
+
+    largest = specs[0][1]['size']
+    with Image.open(image_file) as source:
+        if source.format == 'JPEG':
+            source.draft('RGB', largest)
+        image = source.copy()
+
+    for name, spec in specs:
+        image.thumbnail(spec['size'], Image.LANCZOS)
+        output = image
+        if spec['format'] == 'JPEG' and output.mode != 'RGB':
+            output = output.convert('RGB')
+
+        buffer = io.BytesIO()
+        try:
+            output.save(
+                buffer,
+                format=spec['format'],
+                quality=spec.get('quality', 85),
+                optimize=spec['format'] == 'JPEG',
+            )
+        except (KeyError, OSError):
+            logger.warning('Rendition %s: %s is not supported by Pillow',
+                           name, spec['format'])
+            continue
+
+        yield name, spec, buffer.getvalue()
+
+
+def generate_renditions(recipe, storage=default_storage):
+    """Create the renditions of the image of a recipe and record them
+
+    Images are stored by content, so renditions already present in the
+    storage were made from the same image and are reused as they are.
+    Renditions of a previous image are deleted with that image.
+    """
+    renditions = {}
+
+    if recipe.image:
+        specs = get_rendition_specs()
+        paths = {
+            name: rendition_path(recipe.image.name, name, spec)
+            for name, spec in specs
+        }
+        missing = [
+            (name, spec) for name, spec in specs
+            if not storage.exists(paths[name])
+        ]
+        if missing:
+            with recipe.image.open('rb') as image_file:
+                for name, spec, content in render_renditions(image_file,
+                                                             specs):
+                    if storage.exists(paths[name]):
+                        storage.delete(paths[name])
+                    storage.save(paths[name], ContentFile(content))
+        renditions = {
+            name: path for name, path in paths.items()
+            if storage.exists(path)
+        }
+
+    recipe.renditions = renditions
+    recipe.save(update_fields=['renditions'])
+
+    return renditions
+
+
+def delete_renditions(image_name, storage=default_storage):
+    """Delete every rendition of an image"""
+    for name, spec in get_rendition_specs():
+        path = rendition_path(image_name, name, spec)
+        if storage.exists(path):
+            storage.delete(path)
+
+
+def rendition_urls(recipe, request=None, storage=default_storage):
+    """Return the URL of every rendition of a recipe by name"""
+    urls = {}
+    for name, path in (recipe.renditions or {}).items():
+        url = storage.url(path)
+        urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
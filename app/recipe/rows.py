@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from core.profiling import timer
+
+# Fields whose representation of a database value is the value itself
+PASS_THROUGH_FIELDS = (serializers.CharField, serializers.IntegerField)
+
+
+class RowSerializer:
+    """Read-only serializer building output from values() rows
+
+    Mirrors a model serializer, after any `fields` and `expand` pruning,
+    without its per object field machinery: plain columns are copied from
+    the row, other fields only run their `to_representation`, and many to
+    many relations are read from the through table with one query per
+    relation for the whole page. Relations are listed by primary key.
+
+    Method fields receive an object holding the row and must name the
+    columns they read in the `method_columns` of the serializer.
+    """
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.model = serializer.Meta.model
+        self.fields = []
+        self.columns = ['id']
+        self.relations = {}
+        for name, field in serializer.fields.items():
+            self.add_field(name, field)
+
+    def add_field(self, name, field):
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(self.serializer, field.method_name)
+            self.columns.extend(
+                getattr(self.serializer, 'method_columns', {}).get(name, ())
+            )
+            self.fields.append((name, 'method', method))
+            return
+
+        model_field = self.model._meta.get_field(field.source)
+        if isinstance(field, (serializers.ManyRelatedField,
+                              serializers.ListSerializer)):
+            if not model_field.many_to_many or model_field.auto_created:
+                raise TypeError(f'Unsupported relation {name}')
+            child = None
+            if isinstance(field, serializers.ListSerializer):
+                child = RowSerializer(field.child)
+            self.relations[name] = (model_field, child)
+            self.fields.append((name, 'relation', None))
+        elif model_field.concrete and not model_field.is_relation:
+            self.columns.append(field.source)
+            convert = None if type(field) in PASS_THROUGH_FIELDS \
+                else field.to_representation
+            self.fields.append((name, field.source, convert))
+        else:
+            raise TypeError(f'Unsupported field {name}')
+
+    def get_related(self, ids):
+        """Return {name: {row id: [related data]}} for every relation"""
+        related = {}
+        for name, (model_field, child) in self.relations.items():
+            through = model_field.remote_field.through
+            source = f'{model_field.m2m_field_name()}_id'
+            target = f'{model_field.m2m_reverse_field_name()}_id'
+            by_row = {}
+            for row_id, related_id in through.objects.filter(
+                **{f'{source}__in': ids}
+            ).values_list(source, target):
+                by_row.setdefault(row_id, []).append(related_id)
+            for values in by_row.values():
+                values.sort()
+
+            if child is not None:
+                rows = list(model_field.related_model.objects.filter(
+                    pk__in={pk for values in by_row.values() for pk in values}
+                ).values(*child.columns))
+                data = dict(zip(
+                    (row['id'] for row in rows), child.to_representation(rows)
+                ))
+                by_row = {
+                    row_id: [data[pk] for pk in values if pk in data]
+                    for row_id, values in by_row.items()
+                }
+            related[name] = by_row
+
+        return related
+
+    def to_representation(self, rows):
+        """Return the serialized data of a list of values() rows"""
+        rows = list(rows)
+        related = self.get_related([row['id'] for row in rows]) \
+            if self.relations else {}
+
+        data = []
+        for row in rows:
+            item = OrderedDict()
+            for name, source, convert in self.fields:
+                if source == 'relation':
+                    item[name] = related[name].get(row['id'], [])
+                elif source == 'method':
+                    item[name] = convert(SimpleNamespace(**row))
+                else:
+                    value = row[source]
+                    if convert is not None and value is not None:
+                        value = convert(value)
+                    item[name] = value
+            data.append(item)
+
+        return data
+
+
+class RowListMixin:
+    """Serve list pages through a `RowSerializer` when possible
+
+    Disabled by setting RECIPE_ROW_SERIALIZATION to False, and skipped
+    for serializers it cannot mirror, both falling back to the regular
+    list. The rows hold the ordering columns the paginator seeks on.
+    """
+
+    def get_row_serializer(self):
+        """Return a `RowSerializer` of the view serializer, or None"""
+        if not getattr(settings, 'RECIPE_ROW_SERIALIZATION', True):
+            return None
+        try:
+            return RowSerializer(self.get_serializer())
+        except (TypeError, FieldDoesNotExist):
+            return None
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+
+        columns = list(OrderedDict.fromkeys(
+            rows.columns + [field.lstrip('-') for field in self.ordering]
+        ))
+        queryset = self.filter_queryset(self.get_queryset()) \
+            .prefetch_related(None).values(*columns)
+
+        page = self.paginate_queryset(queryset)
+        with timer('serialize'):
+            data = rows.to_representation(
+                queryset if page is None else page
+            )
+        if page is not None:
+            return self.get_paginated_response(data)
+
+        return Response(data)
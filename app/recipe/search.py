@@ -0,0 +1,231 @@
+import re
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Q
+
+from core.models import Recipe
+
+# Table holding one search document per recipe, created by the
+# core 0011 migration for the backends below
+SEARCH_TABLE = 'recipe_search'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Terms beyond this are ignored to bound the cost of a query
+MAX_TERMS = 8
+
+BATCH_SIZE = 500
+
+# Only the newest matches are ranked, so a query matching most of the
+# recipes of a user does not score every one of them
+MAX_CANDIDATES = 1000
+
+
+def search_terms(query):
+    """Split a search query into lower case words"""
+    return WORD_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def _batches(ids, size=BATCH_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _restrict(column, within):
+    """Return the SQL and params limiting matches to a recipe queryset"""
+    if within is None:
+        return '', []
+    sql, params = within.prefetch_related(None).order_by() \
+        .values('id').query.sql_with_params()
+    return f' AND {column} IN ({sql})', list(params)
+
+
+def recipe_documents(ids):
+    """Return (id, user_id, title, names) rows for recipes
+
+    `names` joins the names of the tags and ingredients of the recipe.
+    """
+    names = defaultdict(list)
+    for through, field in (
+        (Recipe.tags.through, 'tag__name'),
+        (Recipe.ingredients.through, 'ingredient__name'),
+    ):
+        rows = through.objects.filter(recipe_id__in=ids) \
+            .values_list('recipe_id', field)
+        for recipe_id, name in rows:
+            names[recipe_id].append(name)
+
+    return [
+        (recipe_id, user_id, title, ' '.join(sorted(names[recipe_id])))
+        for recipe_id, user_id, title in Recipe.objects.filter(
+            id__in=ids
+        ).values_list('id', 'user_id', 'title')
+    ]
+
+
+class SQLiteSearchBackend:
+    """Search documents kept in an SQLite FTS5 table
+
+    The owner is indexed as a `u<id>` token so restricting a query to a
+    user is an index lookup rather than a scan of every match.
+    """
+
+    def index(self, rows):
+        with connection.cursor() as cursor:
+            self._delete(cursor, [row[0] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, owner, title, names) '
+                f'VALUES (%s, %s, %s, %s)',
+                [(recipe_id, f'u{user_id}', title, names)
+                 for recipe_id, user_id, title, names in rows]
+            )
+
+    def remove(self, ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, ids)
+
+    def _delete(self, cursor, ids):
+        if ids:
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} '
+                f'WHERE rowid IN ({placeholders})', ids
+            )
+
+    def search(self, user_id, terms, limit, within=None):
+        # Quoted prefix terms, so no word is read as FTS5 syntax
+        match = 'owner:u%d AND {title names}: (%s)' % (
+            user_id, ' AND '.join(f'"{term}"*' for term in terms)
+        )
+        restrict, params = _restrict('rowid', within)
+        with connection.cursor() as cursor:
+            # The rowid of the last candidate bounds the matches ranked,
+            # which FTS5 walks newest first without scoring them. Title
+            # matches weigh five times more than name matches.
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s{restrict} '
+                f'AND rowid >= coalesce(('
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s{restrict} '
+                f'ORDER BY rowid DESC LIMIT 1 OFFSET %s), 0) '
+                f'ORDER BY bm25({SEARCH_TABLE}, 0, 10, 2), rowid DESC '
+                f'LIMIT %s',
+                [match, *params, match, *params, MAX_CANDIDATES - 1, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    """Search documents kept as weighted tsvectors under a GIN index"""
+    config = 'english'
+
+    def index(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (recipe_id, user_id, document) '
+                f"VALUES (%s, %s, setweight(to_tsvector('{self.config}', %s), "
+                f"'A') || setweight(to_tsvector('{self.config}', %s), 'B')) "
+                f'ON CONFLICT (recipe_id) DO UPDATE SET '
+                f'user_id = EXCLUDED.user_id, document = EXCLUDED.document',
+                rows
+            )
+
+    def remove(self, ids):
+        if ids:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {SEARCH_TABLE} WHERE recipe_id = ANY(%s)',
+                    [list(ids)]
+                )
+
+    def search(self, user_id, terms, limit, within=None):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        restrict, params = _restrict('recipe_id', within)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT recipe_id FROM ('
+                f'SELECT recipe_id, document, query FROM {SEARCH_TABLE}, '
+                f"to_tsquery('{self.config}', %s) query "
+                f'WHERE user_id = %s AND document @@ query{restrict} '
+                f'ORDER BY recipe_id DESC LIMIT %s) candidates '
+                f'ORDER BY ts_rank(document, query) DESC, recipe_id DESC '
+                f'LIMIT %s',
+                [query, user_id, *params, MAX_CANDIDATES, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class DatabaseSearchBackend:
+    """Unindexed fallback for other databases, matching titles and names"""
+
+    def index(self, rows):
+        pass
+
+    def remove(self, ids):
+        pass
+
+    def search(self, user_id, terms, limit, within=None):
+        queryset = Recipe.objects.filter(user_id=user_id)
+        if within is not None:
+            queryset = queryset.filter(
+                id__in=within.prefetch_related(None).order_by().values('id')
+            )
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) |
+                Q(tags__name__icontains=term) |
+                Q(ingredients__name__icontains=term)
+            )
+        return list(queryset.distinct().order_by('-id')
+                    .values_list('id', flat=True)[:limit])
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    """Return the search backend of the default database"""
+    return BACKENDS.get(connection.vendor, DatabaseSearchBackend)()
+
+
+def index_recipes(ids):
+    """Build the search documents of recipes, dropping deleted ones"""
+    backend = get_backend()
+    for batch in _batches(set(ids)):
+        rows = recipe_documents(batch)
+        backend.index(rows)
+        missing = set(batch) - {row[0] for row in rows}
+        if missing:
+            backend.remove(list(missing))
+
+
+def index_new_recipe(recipe):
+    """Index a recipe that was just created, before any tag is added"""
+    get_backend().index([(recipe.pk, recipe.user_id, recipe.title, '')])
+
+
+def remove_recipes(ids):
+    """Drop the search documents of recipes"""
+    backend = get_backend()
+    for batch in _batches(ids):
+        backend.remove(batch)
+
+
+def search_recipes(user_id, query, limit, within=None):
+    """Return the ids of the best matching recipes of a user, best first
+
+    Every word of the query must match the start of a word in the title
+    or in the name of a tag or ingredient of the recipe. Only the newest
+    MAX_CANDIDATES matches are ranked. `within`, a queryset of recipes,
+    restricts the matches before they are ranked and cut to `limit`.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    return get_backend().search(user_id, terms, limit, within)
@@ -1,7 +1,63 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from django.utils.translation import gettext_lazy as _
+
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
+from core.bulk import bulk_create_recipes
 from core.models import Tag, Ingredient, Recipe
 
+from recipe.images import read_image_header, store_image, release_image
+from recipe.renditions import rendition_urls
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Many related field resolving all primary keys in a single query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pk_field = child.get_queryset().model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, ValidationError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        # One query for the whole list instead of one per primary key,
+        # none when a list serializer already loaded them for all items
+        objects = getattr(self.root, 'related_objects', {}).get(
+            self.field_name
+        )
+        if objects is None:
+            objects = child.get_queryset().in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field whose `many=True` form validates in one query"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
 
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for tag objects"""
@@ -21,27 +77,127 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class NameListSerializer(serializers.Serializer):
+    """Serializer for a batch of tag or ingredient names"""
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=1000,
+    )
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serializer creating many recipes with set based inserts"""
+    max_items = 10000
+    related_fields = ('ingredients', 'tags')
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            if len(data) > self.max_items:
+                raise serializers.ValidationError({
+                    'non_field_errors': [
+                        _('Ensure this list has at most {max} items.')
+                        .format(max=self.max_items)
+                    ]
+                })
+            self.load_related_objects(data)
+
+        return super().to_internal_value(data)
+
+    def load_related_objects(self, data):
+        """Load the related objects of every item with one query each"""
+        self.related_objects = {}
+        for name in self.related_fields:
+            field = self.child.fields[name]
+            queryset = field.child_relation.get_queryset()
+            pk_field = queryset.model._meta.pk
+            pks = set()
+            for item in data:
+                values = item.get(name) if isinstance(item, dict) else None
+                if isinstance(values, str) or \
+                        not isinstance(values, (list, tuple)):
+                    continue
+                for value in values:
+                    try:
+                        pks.add(pk_field.to_python(value))
+                    except (TypeError, ValueError, ValidationError):
+                        continue
+            self.related_objects[name] = queryset.in_bulk(pks)
+
+    def create(self, validated_data):
+        items = []
+        for attrs in validated_data:
+            attrs = dict(attrs)
+            tags = attrs.pop('tags', [])
+            ingredients = attrs.pop('ingredients', [])
+            items.append((Recipe(**attrs), tags, ingredients))
+
+        return bulk_create_recipes(items)
+
+
+class DynamicFieldsMixin:
+    """Serializer mixin selecting and expanding fields per request
+
+    `fields` keeps only the named fields and `expand` swaps the primary
+    keys of the named relations for the nested objects listed in
+    `expandable_fields`.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+
+        unknown = set(expand) - set(self.expandable_fields)
+        if fields is not None:
+            unknown |= set(fields) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': f'Unknown fields: {", ".join(sorted(unknown))}.'
+            })
+
+        for name in expand:
+            self.fields[name] = self.expandable_fields[name]()
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipe"""
 
     # Return all ingredients associated with such recipe
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
 
     # Return all tags associated with such recipe
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
 
+    # URLs of the resized variants of the image, by rendition name
+    renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'ingredients',
                   'tags', 'time_minutes', 'price',
-                  'link')
+                  'link', 'renditions')
         read_only_fields = ('id',)
+        list_serializer_class = RecipeListSerializer
+
+    expandable_fields = {
+        'ingredients': lambda: IngredientSerializer(many=True, read_only=True),
+        'tags': lambda: TagSerializer(many=True, read_only=True),
+    }
+
+    # Columns read by the method fields, see recipe.rows
+    method_columns = {'renditions': ('renditions',)}
+
+    def get_renditions(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -51,10 +207,42 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class ImageUploadField(serializers.FileField):
+    """File field validating images from their header alone"""
+
+    def to_internal_value(self, data):
+        image_file = super().to_internal_value(data)
+        try:
+            image_file.image_info = read_image_header(image_file)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+        return image_file
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading image"""
 
+    image = ImageUploadField()
+    renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
\ No newline at end of file
+        fields = ('id', 'image', 'renditions')
+        read_only_fields = ('id',)
+
+    def get_renditions(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
+    def update(self, instance, validated_data):
+        """Point the recipe at the stored copy of the uploaded image"""
+        previous = instance.image.name if instance.image else None
+        with transaction.atomic():
+            stored = store_image(validated_data['image'])
+            instance.image = stored.name
+            instance.renditions = {}
+            instance.save(update_fields=['image', 'renditions'])
+            if previous:
+                release_image(previous)
+
+        return instance
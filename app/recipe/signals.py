@@ -0,0 +1,243 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import (
+    pre_save, post_save, pre_delete, post_delete, m2m_changed,
+)
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+from core.signals import bulk_created
+
+from recipe.cache import bump_user_version
+from recipe.images import release_image
+from recipe.pantry import get_pantry_index
+from recipe.stats import recount_stats, update_stats
+from recipe.search import index_recipes, index_new_recipe, remove_recipes
+
+
+def invalidate_user(user_id):
+    """Bump the data version of a user now and once committed
+
+    The second bump stops a concurrent request from caching data read
+    before the transaction committed under the new version.
+    """
+    bump_user_version(user_id)
+    transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def invalidate_on_change(sender, instance, **kwargs):
+    """Invalidate cached responses when a user's object changes"""
+    invalidate_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_relation_change(sender, instance, action, **kwargs):
+    """Invalidate cached responses when recipe tags or ingredients change"""
+    if action.startswith('post_'):
+        invalidate_user(instance.user_id)
+
+
+@receiver(bulk_created)
+def invalidate_on_bulk_create(sender, user_id, **kwargs):
+    """Invalidate cached responses after objects were created in bulk"""
+    invalidate_user(user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """Drop the reference of a deleted recipe to its image"""
+    if instance.image:
+        release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the search document of a recipe in step with its title"""
+    if created:
+        index_new_recipe(instance)
+    elif update_fields is None or 'title' in update_fields:
+        index_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    """Drop the search document of a deleted recipe"""
+    remove_recipes([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def index_on_relation_change(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Reindex recipes whose tags or ingredients were changed"""
+    if not reverse:
+        if action.startswith('post_'):
+            index_recipes([instance.pk])
+    elif action == 'pre_clear':
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        index_recipes(instance._search_recipe_ids)
+    elif action in ('post_add', 'post_remove'):
+        index_recipes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def index_on_rename(sender, instance, created, **kwargs):
+    """Reindex the recipes using a renamed tag or ingredient"""
+    if not created:
+        index_recipes(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_recipes_to_index(sender, instance, **kwargs):
+    """Remember the recipes of a tag or ingredient about to be deleted"""
+    instance._search_recipe_ids = list(
+        instance.recipe_set.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def index_on_delete(sender, instance, **kwargs):
+    """Reindex the recipes that lost a deleted tag or ingredient"""
+    index_recipes(getattr(instance, '_search_recipe_ids', ()))
+
+
+@receiver(bulk_created)
+def index_on_bulk_create(sender, objs, **kwargs):
+    """Index recipes created in bulk along with their relations"""
+    index_recipes([
+        obj.pk for obj in objs
+        if isinstance(obj, Recipe) and obj.pk is not None
+    ])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_pantry_index(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """Apply ingredient changes to the pantry bitsets once committed"""
+    if not action.startswith('post_'):
+        return
+    index = get_pantry_index()
+    user_id = instance.user_id
+    pk_set = set(pk_set or ())
+
+    def apply(pantry):
+        if action == 'post_clear':
+            pantry.remove_recipe(instance.pk)
+            return
+        for pk in pk_set:
+            recipe_id, ingredient_id = \
+                (pk, instance.pk) if reverse else (instance.pk, pk)
+            if action == 'post_add':
+                pantry.add(recipe_id, ingredient_id)
+            else:
+                pantry.remove(recipe_id, ingredient_id)
+
+    if reverse and action == 'post_clear':
+        transaction.on_commit(lambda: index.invalidate(user_id))
+    else:
+        transaction.on_commit(lambda: index.update(user_id, apply))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_pantry_index(sender, instance, **kwargs):
+    """Drop a deleted recipe from the pantry bitsets once committed"""
+    transaction.on_commit(lambda: get_pantry_index().update(
+        instance.user_id, lambda pantry: pantry.remove_recipe(instance.pk)
+    ))
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(bulk_created, sender=Recipe)
+def invalidate_pantry_index(sender, instance=None, user_id=None, **kwargs):
+    """Rebuild the pantry bitsets after changes without m2m_changed"""
+    user_id = instance.user_id if instance is not None else user_id
+    transaction.on_commit(lambda: get_pantry_index().invalidate(user_id))
+
+
+STATS_FIELDS = {'time_minutes', 'price'}
+
+
+def stats_values(recipe):
+    """Return the (time_minutes, price) pair a recipe is counted under"""
+    return int(recipe.time_minutes), Decimal(str(recipe.price))
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_stats(sender, instance, update_fields=None, **kwargs):
+    """Read the values a recipe is counted under before it changes"""
+    instance._stats_previous = None
+    if instance._state.adding or (
+        update_fields is not None and not STATS_FIELDS & set(update_fields)
+    ):
+        return
+    instance._stats_previous = Recipe.objects.filter(pk=instance.pk) \
+        .values_list('time_minutes', 'price').first()
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe(sender, instance, created, **kwargs):
+    """Count a new or edited recipe in the stats of its user"""
+    current = stats_values(instance)
+    if created:
+        instance._stats_counted = True
+        update_stats(instance.user_id, recipes=1, added=[current])
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    if previous is not None and previous != current:
+        update_stats(instance.user_id, removed=[previous], added=[current])
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_recipe(sender, instance, **kwargs):
+    """Remove a deleted recipe from the stats of its user"""
+    update_stats(
+        instance.user_id, recipes=-1,
+        removed=[(instance.time_minutes, instance.price)]
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def count_recipe_attribute(sender, instance, created=None, **kwargs):
+    """Count created and deleted tags and ingredients"""
+    if created is False:
+        return
+    if created:
+        instance._stats_counted = True
+    delta = 1 if created else -1
+    field = 'tags' if sender is Tag else 'ingredients'
+    update_stats(instance.user_id, **{field: delta})
+
+
+@receiver(bulk_created)
+def count_bulk_created(sender, user_id, objs, **kwargs):
+    """Count objects created in bulk in the stats of their user
+
+    Objects a backend saved one by one were counted by post_save already.
+    Tags and ingredients are counted again instead, as names a concurrent
+    transaction inserted first are also in `objs`.
+    """
+    objs = [obj for obj in objs if not getattr(obj, '_stats_counted', False)]
+    if not objs:
+        return
+    if sender is Recipe:
+        update_stats(user_id, recipes=len(objs),
+                     added=[stats_values(recipe) for recipe in objs])
+    elif sender in (Tag, Ingredient):
+        recount_stats(user_id, [sender])
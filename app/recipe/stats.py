@@ -0,0 +1,185 @@
+import bisect
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+# Upper bounds of the price histogram buckets, the last one is open
+DEFAULT_PRICE_BUCKETS = ('5', '10', '20', '50', '100')
+
+PERCENTILES = (50, 90, 99)
+
+# Fields of RecipeStats computed from the data of a user
+STATS_FIELDS = ('recipe_count', 'tag_count', 'ingredient_count',
+                'time_histogram', 'price_histogram')
+
+
+def price_buckets():
+    """Return the configured price bucket bounds as decimals"""
+    return [
+        Decimal(bound) for bound in
+        getattr(settings, 'RECIPE_STATS_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+    ]
+
+
+def price_bucket(price, bounds=None):
+    """Return the index of the histogram bucket of a price"""
+    bounds = price_buckets() if bounds is None else bounds
+    return bisect.bisect_right(bounds, Decimal(str(price)))
+
+
+def compute_stats(user_id):
+    """Return the stats of a user aggregated from scratch, unsaved"""
+    bounds = price_buckets()
+    recipes = Recipe.objects.filter(user_id=user_id).order_by()
+    time_histogram = {
+        str(time_minutes): count for time_minutes, count in
+        recipes.values('time_minutes').annotate(count=Count('id'))
+        .values_list('time_minutes', 'count')
+    }
+    price_histogram = Counter()
+    for price, count in recipes.values('price').annotate(
+        count=Count('id')
+    ).values_list('price', 'count'):
+        price_histogram[str(price_bucket(price, bounds))] += count
+
+    return RecipeStats(
+        user_id=user_id,
+        recipe_count=sum(time_histogram.values()),
+        tag_count=Tag.objects.filter(user_id=user_id).count(),
+        ingredient_count=Ingredient.objects.filter(user_id=user_id).count(),
+        time_histogram=time_histogram,
+        price_histogram=dict(price_histogram),
+    )
+
+
+def rebuild_stats(user_id):
+    """Replace the stored stats of a user by freshly computed ones
+
+    The stored row is locked before computing, so `update_stats` calls
+    made meanwhile wait and then apply to the new values. Concurrent first
+    computations for a user end up updating the same row.
+    """
+    with transaction.atomic():
+        RecipeStats.objects.select_for_update() \
+            .filter(user_id=user_id).first()
+        computed = compute_stats(user_id)
+        stats, _ = RecipeStats.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                field: getattr(computed, field) for field in STATS_FIELDS
+            },
+        )
+    return stats
+
+
+def get_stats(user_id):
+    """Return the stored stats of a user, computing them the first time"""
+    stats = RecipeStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        stats = rebuild_stats(user_id)
+    return stats
+
+
+def _add(histogram, key, delta):
+    key = str(key)
+    count = histogram.get(key, 0) + delta
+    if count > 0:
+        histogram[key] = count
+    else:
+        histogram.pop(key, None)
+
+
+def update_stats(user_id, recipes=0, tags=0, ingredients=0,
+                 removed=(), added=()):
+    """Apply a change to the stored stats of a user
+
+    `removed` and `added` are the (time_minutes, price) pairs of recipes
+    before and after the change. Users without stored stats are skipped,
+    they are computed from scratch on first read.
+    """
+    with transaction.atomic():
+        stats = RecipeStats.objects.select_for_update() \
+            .filter(user_id=user_id).first()
+        if stats is None:
+            return
+        stats.recipe_count = max(stats.recipe_count + recipes, 0)
+        stats.tag_count = max(stats.tag_count + tags, 0)
+        stats.ingredient_count = max(stats.ingredient_count + ingredients, 0)
+        bounds = price_buckets()
+        for pairs, delta in ((removed, -1), (added, 1)):
+            for time_minutes, price in pairs:
+                _add(stats.time_histogram, time_minutes, delta)
+                _add(stats.price_histogram,
+                     price_bucket(price, bounds), delta)
+        stats.save()
+
+
+def recount_stats(user_id, models):
+    """Count the tags and/or ingredients of a user again, under the lock
+
+    Used after bulk inserts that may have raced with another transaction
+    creating the same names, where the number of rows written is unknown.
+    Both counts read the (user, name) unique index only.
+    """
+    with transaction.atomic():
+        stats = RecipeStats.objects.select_for_update() \
+            .filter(user_id=user_id).first()
+        if stats is None:
+            return
+        if Tag in models:
+            stats.tag_count = Tag.objects.filter(user_id=user_id).count()
+        if Ingredient in models:
+            stats.ingredient_count = \
+                Ingredient.objects.filter(user_id=user_id).count()
+        stats.save(update_fields=['tag_count', 'ingredient_count'])
+
+
+def percentile(histogram, total, rank):
+    """Return the nearest-rank percentile of a value histogram"""
+    position = max(1, -(-rank * total // 100))
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= position:
+            return value
+
+
+def summarize(stats):
+    """Return the API representation of the stats of a user"""
+    histogram = {int(key): count
+                 for key, count in stats.time_histogram.items()}
+    total = sum(histogram.values())
+    time_minutes = {'average': None}
+    time_minutes.update({f'p{rank}': None for rank in PERCENTILES})
+    if total:
+        time_minutes['average'] = round(
+            sum(value * count for value, count in histogram.items()) / total,
+            2
+        )
+        for rank in PERCENTILES:
+            time_minutes[f'p{rank}'] = percentile(histogram, total, rank)
+
+    bounds = price_buckets()
+    lower = [Decimal(0)] + bounds
+    upper = bounds + [None]
+    prices = [
+        {
+            'min': str(lower[index]),
+            'max': str(upper[index]) if upper[index] is not None else None,
+            'count': stats.price_histogram.get(str(index), 0),
+        }
+        for index in range(len(lower))
+    ]
+
+    return {
+        'recipes': stats.recipe_count,
+        'tags': stats.tag_count,
+        'ingredients': stats.ingredient_count,
+        'time_minutes': time_minutes,
+        'price_histogram': prices,
+    }
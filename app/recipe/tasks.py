@@ -0,0 +1,12 @@
+from core.jobs import task
+from core.models import Recipe
+from recipe.renditions import generate_renditions
+
+
+@task('recipe.generate_renditions', priority=10)
+def generate_recipe_renditions(recipe_id):
+    """Build the resized variants of the current image of a recipe"""
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None:
+        return
+    generate_renditions(recipe)
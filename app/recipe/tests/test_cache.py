@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Recipe
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class VersionedCacheTests(TransactionTestCase):
+    """Test the per user response cache of the recipe API"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@jmits.com',
+            'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_etag_not_modified(self):
+        """Test a matching If-None-Match is answered without queries"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.get(TAGS_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_cached_response_reused(self):
+        """Test an unchanged list is served from the cache"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        first = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(TAGS_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+
+    def test_change_invalidates_cache(self):
+        """Test creating a tag changes the ETag and the list"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        Tag.objects.create(user=self.user, name='Dessert')
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_relation_change_invalidates_cache(self):
+        """Test adding a tag to a recipe invalidates its detail"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price=5
+        )
+        url = detail_url(recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Spicy')
+
+    def test_bulk_create_invalidates_cache(self):
+        """Test the bulk endpoint invalidates the recipe list"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        payload = [{'title': 'Curry', 'time_minutes': 10, 'price': '5.00',
+                    'tags': [], 'ingredients': []}]
+        self.client.post(
+            reverse('recipe:recipe-bulk-create'), payload, format='json'
+        )
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_etag_per_user(self):
+        """Test another user's ETag never matches"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        other = get_user_model().objects.create_user(
+            'other@jmits.com',
+            'password123'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
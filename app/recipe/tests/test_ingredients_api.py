@@ -1,15 +1,19 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 
 from recipe.serializers import IngredientSerializer
 
 INGREDIENT_URL = reverse('recipe:ingredient-list')
+BATCH_URL = reverse('recipe:ingredient-batch')
 
 
 class PublicIngredientAPITTest(TransactionTestCase):
@@ -29,6 +33,7 @@ class PrivateIngredientsAPITTest(TransactionTestCase):
     """Test ingredients can be retrieved by auth user"""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             'test@jmits.com',
@@ -46,7 +51,7 @@ class PrivateIngredientsAPITTest(TransactionTestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test that ingredients for the authenticated user are returned"""
@@ -60,8 +65,8 @@ class PrivateIngredientsAPITTest(TransactionTestCase):
         res = self.client.get(INGREDIENT_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
     def test_create_ingredient_successful(self):
         """Test create a new ingredient"""
@@ -74,9 +79,72 @@ class PrivateIngredientsAPITTest(TransactionTestCase):
         ).exists()
         self.assertTrue(exists)
 
+    def test_create_ingredient_existing_name(self):
+        """Test creating a ingredient with an existing name reuses it"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Lemon')
+
+        res = self.client.post(INGREDIENT_URL, {'name': 'Lemon'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['id'], ingredient.id)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user, name='Lemon').count(), 1
+        )
+
     def test_create_ingredient_invalid(self):
         """Test create invalid ingredient fails"""
         payload = {'name': ''}
         res = self.client.post(INGREDIENT_URL, payload)
 
-        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_get_or_create(self):
+        """Test a batch of names returns existing and new ingredients"""
+        existing = Ingredient.objects.create(user=self.user, name='Salt')
+        payload = {'names': ['Salt', 'Pepper', ' Pepper ', 'Basil']}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in res.data], ['Salt', 'Pepper', 'Basil']
+        )
+        self.assertEqual(res.data[0]['id'], existing.id)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 3)
+
+    def test_batch_constant_queries(self):
+        """Test a batch runs the same queries for any number of names"""
+        def batch_queries(names):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(BATCH_URL, {'names': names}, format='json')
+            return len(queries)
+
+        self.assertEqual(
+            batch_queries([f'Small {i}' for i in range(2)]),
+            batch_queries([f'Large {i}' for i in range(50)])
+        )
+
+    def test_batch_invalid(self):
+        """Test an empty batch is rejected"""
+        res = self.client.post(BATCH_URL, {'names': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_ingredients_assigned_only(self):
+        """Test filtering ingredients by those assigned to recipes"""
+        assigned = Ingredient.objects.create(user=self.user, name='Apples')
+        unassigned = Ingredient.objects.create(user=self.user, name='Turkey')
+        for title in ('Apple crumble', 'Apple pie'):
+            recipe = Recipe.objects.create(
+                title=title, time_minutes=5, price=10, user=self.user
+            )
+            recipe.ingredients.add(assigned)
+
+        res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
+
+        self.assertEqual(
+            [item['id'] for item in res.data['results']], [assigned.id]
+        )
+        self.assertNotIn(
+            unassigned.id, [item['id'] for item in res.data['results']]
+        )
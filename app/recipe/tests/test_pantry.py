@@ -0,0 +1,172 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Ingredient
+
+from recipe.pantry import PantryIndex, UserPantry, get_pantry_index
+
+PANTRY_URL = reverse('recipe:recipe-pantry')
+
+
+class UserPantryTests(SimpleTestCase):
+
+    def test_match_ranks_by_coverage(self):
+        """Test full matches come first, then the fewest missing"""
+        pantry = UserPantry([
+            (1, 10), (1, 11), (1, 12),
+            (2, 10), (2, 11),
+            (3, 10), (3, 13), (3, 14), (3, 15),
+            (4, 13),
+        ])
+
+        self.assertEqual(
+            pantry.match([10, 11, 99], limit=10),
+            [(2, []), (1, [12]), (3, [13, 14, 15])]
+        )
+        self.assertEqual(pantry.match([10, 11], limit=1), [(2, [])])
+
+    def test_incremental_changes(self):
+        """Test adding and removing links updates the ranking"""
+        pantry = UserPantry([(1, 10), (1, 11)])
+
+        pantry.remove(1, 11)
+        self.assertEqual(pantry.match([10], limit=5), [(1, [])])
+
+        pantry.add(2, 10)
+        pantry.remove_recipe(1)
+        self.assertEqual(pantry.match([10], limit=5), [(2, [])])
+
+
+class PantryIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = PantryIndex(max_users=10, timeout=60)
+
+    def test_change_during_build_not_kept(self):
+        """Test bitsets loaded before a change are not cached"""
+        def load(user_id):
+            pantry = UserPantry([(1, 10)])
+            self.index.invalidate(user_id)
+            return pantry
+
+        with patch.object(self.index, 'load', side_effect=load):
+            self.index.get(1)
+        with patch.object(self.index, 'load',
+                          return_value=UserPantry()) as load:
+            self.index.get(1)
+
+        load.assert_called_once_with(1)
+
+    def test_concurrent_gets_build_once(self):
+        """Test threads asking for a user being loaded share the build"""
+        started = threading.Event()
+        release = threading.Event()
+        pantry = UserPantry([(1, 10)])
+
+        def load(user_id):
+            started.set()
+            release.wait(5)
+            return pantry
+
+        results = []
+        with patch.object(self.index, 'load', side_effect=load) as mock:
+            first = threading.Thread(
+                target=lambda: results.append(self.index.get(1))
+            )
+            first.start()
+            started.wait(5)
+            second = threading.Thread(
+                target=lambda: results.append(self.index.get(1))
+            )
+            second.start()
+            release.set()
+            first.join(5)
+            second.join(5)
+
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(results, [pantry, pantry])
+
+
+class PantryAPITests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_pantry_index().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@jmits.com', 'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.eggs, self.flour, self.milk = (
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Eggs', 'Flour', 'Milk')
+        )
+
+    def sample_recipe(self, title, *ingredients):
+        recipe = Recipe.objects.create(
+            user=self.user, title=title, time_minutes=10, price=5
+        )
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def pantry(self, *ingredients):
+        res = self.client.get(PANTRY_URL, {
+            'ingredients': ','.join(str(i.id) for i in ingredients)
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [
+            (recipe['id'], recipe['missing_ingredients'])
+            for recipe in res.data['results']
+        ]
+
+    def test_pantry_ranks_recipes(self):
+        """Test recipes are ranked by the ingredients they miss"""
+        pancakes = self.sample_recipe(
+            'Pancakes', self.eggs, self.flour, self.milk
+        )
+        omelette = self.sample_recipe('Omelette', self.eggs)
+        other = get_user_model().objects.create_user('o@jmits.com', 'pw')
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=1, price=1
+        ).ingredients.add(
+            Ingredient.objects.create(user=other, name='Eggs')
+        )
+
+        self.assertEqual(
+            self.pantry(self.eggs, self.flour),
+            [(omelette.id, []), (pancakes.id, [self.milk.id])]
+        )
+
+    def test_pantry_follows_changes(self):
+        """Test the index is updated as recipes and ingredients change"""
+        pancakes = self.sample_recipe('Pancakes', self.eggs, self.flour)
+        self.assertEqual(self.pantry(self.eggs),
+                         [(pancakes.id, [self.flour.id])])
+
+        pancakes.ingredients.remove(self.flour)
+        self.assertEqual(self.pantry(self.eggs), [(pancakes.id, [])])
+
+        self.milk.recipe_set.add(pancakes)
+        self.assertEqual(self.pantry(self.eggs),
+                         [(pancakes.id, [self.milk.id])])
+
+        self.milk.delete()
+        self.assertEqual(self.pantry(self.eggs), [(pancakes.id, [])])
+
+        pancakes.delete()
+        self.assertEqual(self.pantry(self.eggs), [])
+
+    def test_pantry_requires_ingredients(self):
+        """Test the ingredient list is required and validated"""
+        for params in ({}, {'ingredients': 'x'}):
+            res = self.client.get(PANTRY_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
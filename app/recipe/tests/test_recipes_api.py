@@ -1,20 +1,34 @@
+import base64
+import csv
+import hashlib
+import json
 import tempfile
 import os
+from unittest.mock import patch
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
 from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.jobs import run_pending
+from core.models import Recipe, Tag, Ingredient, Job, StoredImage
+from core.pagination import KeysetPagination
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.views import RecipeViewSet
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 # Helper Functions
 
@@ -70,6 +84,7 @@ class PrivateRecipeAPITest(TransactionTestCase):
     """Test auth recipe API access"""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             'test@jmits.com',
@@ -88,7 +103,7 @@ class PrivateRecipeAPITest(TransactionTestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertTrue(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_limited_to_user(self):
         """Test retrieving recipe for user"""
@@ -105,8 +120,96 @@ class PrivateRecipeAPITest(TransactionTestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_recipes_paginated(self):
+        """Test that recipes are paged newest first with a cursor"""
+        recipes = [sample_recipe(user=self.user) for _ in range(5)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipe.id for recipe in recipes[:1:-1]]
+        )
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[1].id, recipes[0].id]
+        )
+        self.assertIsNone(res.data['next'])
+        self.assertIsNotNone(res.data['previous'])
+
+    def test_recipes_page_size_limited(self):
+        """Test that clients cannot request more than the max page size"""
+        for _ in range(3):
+            sample_recipe(user=self.user)
+
+        with patch.object(KeysetPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPE_URL, {'page_size': 50})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_recipes_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        res = self.client.get(RECIPE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recipes_tampered_cursor(self):
+        """Test that cursor values of the wrong type are rejected"""
+        sample_recipe(user=self.user)
+        for position in (['abc'], [{'a': 1}], [None], [[1]]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'p': position}).encode()
+            ).decode()
+
+            res = self.client.get(RECIPE_URL, {'cursor': cursor})
+
+            self.assertEqual(
+                res.status_code, status.HTTP_404_NOT_FOUND, position
+            )
+
+    def test_list_recipes_query_count_constant(self):
+        """Test listing recipes does not run a query per recipe"""
+        def list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(RECIPE_URL)
+            return len(queries)
+
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        for _ in range(2):
+            recipe = sample_recipe(user=self.user)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+        expected = list_queries()
+
+        for _ in range(5):
+            recipe = sample_recipe(user=self.user)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        self.assertEqual(list_queries(), expected)
+
+    def test_create_recipe_invalid_tag(self):
+        """Test creating a recipe with an unknown tag fails"""
+        payload = {
+            'title': 'Avocado lime cheesecake',
+            'tags': [9999],
+            'time_minutes': 60,
+            'price': 20.00
+        }
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -220,6 +323,240 @@ class PrivateRecipeAPITest(TransactionTestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_bulk_create_recipes(self):
+        """Test creating a list of recipes at once"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10 + i,
+                'price': '5.00',
+                'tags': [tag.id],
+                'ingredients': [ingredient.id, ingredient.id],
+            }
+            for i in range(3)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data],
+            ['Recipe 0', 'Recipe 1', 'Recipe 2']
+        )
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [tag])
+            self.assertEqual(list(recipe.ingredients.all()), [ingredient])
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test invalid items are reported and nothing is created"""
+        payload = [
+            {'title': 'Valid', 'time_minutes': 10, 'price': '5.00',
+             'tags': [], 'ingredients': []},
+            {'title': '', 'time_minutes': 10, 'price': '5.00',
+             'tags': [9999]},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('title', res.data[1])
+        self.assertIn('tags', res.data[1])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_validates_relations_once(self):
+        """Test related keys are loaded once for the whole list"""
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(5)]
+        payload = [
+            {'title': f'Recipe {i}', 'time_minutes': 10, 'price': '5.00',
+             'tags': [tag.id for tag in tags], 'ingredients': []}
+            for i in range(5)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(BULK_URL, payload, format='json')
+
+        # The response reads tag ids from the through table
+        tag_queries = [
+            query for query in queries
+            if query['sql'].startswith('SELECT') and
+            'FROM "core_tag"' in query['sql']
+        ]
+        self.assertEqual(len(tag_queries), 1)
+
+    def test_filter_recipes_by_tags(self):
+        """Test returning recipes with any of the given tags"""
+        recipe1 = sample_recipe(user=self.user, title='Thai curry')
+        recipe2 = sample_recipe(user=self.user, title='Aubergine')
+        recipe3 = sample_recipe(user=self.user, title='Fish and chips')
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Vegetarian')
+        recipe1.tags.add(tag1)
+        recipe2.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipe2.id, recipe1.id])
+        self.assertNotIn(recipe3.id, ids)
+
+    def test_filter_recipes_by_all_ingredients(self):
+        """Test returning recipes with every one of the ingredients"""
+        recipe1 = sample_recipe(user=self.user, title='Posh beans')
+        recipe2 = sample_recipe(user=self.user, title='Chicken cacciatore')
+        ingredient1 = sample_ingredient(user=self.user, name='Feta')
+        ingredient2 = sample_ingredient(user=self.user, name='Chicken')
+        recipe1.ingredients.add(ingredient1)
+        recipe2.ingredients.add(ingredient1, ingredient2)
+        tag = sample_tag(user=self.user)
+        recipe2.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL, {
+            'ingredients': f'{ingredient1.id},{ingredient2.id}',
+            'tags': str(tag.id),
+            'match': 'all',
+        })
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [recipe2.id]
+        )
+
+    def test_filter_recipes_without_distinct(self):
+        """Test filters are semi-joins that never duplicate recipes"""
+        recipe = sample_recipe(user=self.user)
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+        recipe.tags.add(*tags)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                RECIPE_URL, {'tags': ','.join(str(tag.id) for tag in tags)}
+            )
+
+        self.assertEqual(len(res.data['results']), 1)
+        sql = next(
+            query['sql'] for query in queries
+            if 'FROM "core_recipe"' in query['sql']
+        )
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_filter_recipes_invalid(self):
+        """Test malformed ids and match values are rejected"""
+        for params in ({'tags': '1,x'}, {'tags': '1', 'match': 'some'}):
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_sparse_fields(self):
+        """Test only the requested fields and columns are loaded"""
+        recipe = sample_recipe(user=self.user, title='Curry')
+        recipe.tags.add(sample_tag(user=self.user))
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'], [{'id': recipe.id, 'title': 'Curry'}]
+        )
+        sql = '\n'.join(query['sql'] for query in queries)
+        self.assertNotIn('"core_recipe"."link"', sql)
+        self.assertNotIn('core_recipe_tags', sql)
+
+    def test_list_expand_relations(self):
+        """Test expanded relations are nested objects, others are ids"""
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user, name='Vegan')
+        ingredient = sample_ingredient(user=self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPE_URL, {'expand': 'tags'})
+
+        result = res.data['results'][0]
+        self.assertEqual(result['tags'], [{'id': tag.id, 'name': 'Vegan'}])
+        self.assertEqual(result['ingredients'], [ingredient.id])
+
+    def test_retrieve_sparse_fields(self):
+        """Test sparse fieldsets apply to the recipe detail"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        res = self.client.get(detail_url(recipe.id), {'fields': 'tags'})
+
+        self.assertEqual(list(res.data), ['tags'])
+        self.assertEqual(res.data['tags'][0]['name'], 'Main course')
+
+    def test_unknown_fields_rejected(self):
+        """Test unknown fields or expansions are reported"""
+        sample_recipe(user=self.user)
+
+        for params in ({'fields': 'id,secret'}, {'expand': 'price'}):
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as newline delimited JSON"""
+        recipe = sample_recipe(user=self.user, title='Curry')
+        recipe.tags.add(sample_tag(user=self.user, name='Spicy'))
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+        sample_recipe(
+            user=get_user_model().objects.create_user('o@jmits.com', 'pw')
+        )
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), {
+            'id': recipe.id,
+            'title': 'Curry',
+            'time_minutes': 10,
+            'price': '5.00',
+            'link': '',
+            'tags': ['Spicy'],
+            'ingredients': ['Cinnamon'],
+        })
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV in batches"""
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+        recipes[0].tags.add(sample_tag(user=self.user, name='A'),
+                            sample_tag(user=self.user, name='B'))
+
+        with patch.object(RecipeViewSet, 'export_batch_size', 2):
+            res = self.client.get(EXPORT_URL, {'format': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(
+            b''.join(res.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual(
+            [int(row['id']) for row in rows],
+            [recipe.id for recipe in recipes]
+        )
+        self.assertEqual(rows[0]['tags'], 'A|B')
+
+    def test_export_filtered_by_relations(self):
+        """Test the export applies the tags and ingredients filters"""
+        spicy = sample_tag(user=self.user, name='Spicy')
+        curry = sample_recipe(user=self.user, title='Curry')
+        curry.tags.add(spicy)
+        sample_recipe(user=self.user, title='Porridge')
+
+        res = self.client.get(EXPORT_URL, {'tags': spicy.id})
+
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines],
+                         [curry.id])
+
 
 class RecipeImageUploadTest(TransactionTestCase):
 
@@ -230,6 +567,9 @@ class RecipeImageUploadTest(TransactionTestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        for path in self.recipe.renditions.values():
+            default_storage.delete(path)
         self.recipe.image.delete()
 
     def test_upload_image_to_recipe(self):
@@ -246,9 +586,106 @@ class RecipeImageUploadTest(TransactionTestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_creates_renditions(self):
+        """Test uploading an image queues the resizing of its renditions"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (1000, 800)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['renditions'], {})
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'recipe.generate_renditions')
+        self.assertEqual(job.payload, {'recipe_id': self.recipe.id})
+
+        self.assertEqual(run_pending(), 1)
+
+        self.recipe.refresh_from_db()
+        detail = self.client.get(detail_url(self.recipe.id))
+        renditions = detail.data['renditions']
+        self.assertEqual(set(renditions), {'thumbnail', 'medium', 'webp'})
+        self.assertTrue(renditions['thumbnail'].startswith('http://'))
+        with default_storage.open(self.recipe.renditions['thumbnail']) as f:
+            thumbnail = Image.open(f)
+            self.assertEqual(thumbnail.size, (150, 120))
+        with default_storage.open(self.recipe.renditions['webp']) as f:
+            self.assertEqual(Image.open(f).format, 'WEBP')
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image"""
         url = image_upload_url(self.recipe.id)
         res = self.client.post(url, {'image': 'noImage'}, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def upload(self, recipe, color='red', size=(10, 10)):
+        """Upload a plain JPEG image to a recipe"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', size, color).save(ntf, format='JPEG')
+            ntf.seek(0)
+            digest = hashlib.sha256(ntf.read()).hexdigest()
+            ntf.seek(0)
+            res = self.client.post(
+                image_upload_url(recipe.id), {'image': ntf},
+                format='multipart'
+            )
+        return res, digest
+
+    def test_upload_image_stored_by_digest(self):
+        """Test identical uploads are stored once and shared"""
+        other = sample_recipe(user=self.user)
+
+        res, digest = self.upload(self.recipe)
+        self.upload(other)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image.name,
+                         f'uploads/recipe/{digest}.jpg')
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        stored = StoredImage.objects.get()
+        self.assertEqual(stored.ref_count, 2)
+        self.assertEqual((stored.width, stored.height), (10, 10))
+
+    def test_replaced_image_released(self):
+        """Test an image is deleted once no recipe uses it any more"""
+        other = sample_recipe(user=self.user)
+        self.upload(self.recipe, color='blue')
+        self.upload(other, color='blue')
+        self.recipe.refresh_from_db()
+        blue = self.recipe.image.name
+
+        self.upload(self.recipe, color='green')
+        self.assertEqual(StoredImage.objects.get(name=blue).ref_count, 1)
+        self.assertTrue(default_storage.exists(blue))
+
+        other.refresh_from_db()
+        other.delete()
+        self.assertFalse(StoredImage.objects.filter(name=blue).exists())
+        self.assertFalse(default_storage.exists(blue))
+
+    def test_upload_image_too_large(self):
+        """Test uploads above the size limit are rejected"""
+        with self.settings(MAX_UPLOAD_SIZE=1000):
+            res, _ = self.upload(self.recipe, size=(400, 400))
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_upload_image_invalid_header(self):
+        """Test files that are not images are rejected"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(b'not an image')
+            ntf.seek(0)
+            res = self.client.post(
+                image_upload_url(self.recipe.id), {'image': ntf},
+                format='multipart'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.rows import RowSerializer
+from recipe.serializers import TagSerializer
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class RowSerializationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@jmits.com', 'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ('Vegan', 'Dessert', 'Épicé')]
+        ingredients = [Ingredient.objects.create(user=self.user, name=name)
+                       for name in ('Salt', 'Kale')]
+        for index in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe "{index}"',
+                time_minutes=5 * index,
+                price=f'{index}.5',
+                link='https://example.com/recipe' if index % 2 else '',
+                renditions={'thumbnail': f'uploads/recipe/{index}.jpg'}
+                if index % 3 else {},
+            )
+            recipe.tags.set(tags[index % 3:])
+            recipe.ingredients.set(ingredients[:index % 3])
+
+    def get_both(self, url, params=None):
+        """Return the responses of the row and the serializer paths"""
+        responses = []
+        for enabled in (True, False):
+            cache.clear()
+            with override_settings(RECIPE_ROW_SERIALIZATION=enabled):
+                responses.append(self.client.get(url, params or {}))
+        return responses
+
+    def test_recipe_list_parity(self):
+        """Test recipe lists render the same bytes on both paths"""
+        for params in (
+            {},
+            {'page_size': 2},
+            {'fields': 'id,price,renditions'},
+            {'fields': 'title,tags'},
+            {'expand': 'tags,ingredients'},
+            {'fields': 'ingredients', 'expand': 'ingredients'},
+            {'tags': str(Tag.objects.first().pk)},
+            {'q': 'recipe'},
+        ):
+            rows, objects = self.get_both(RECIPE_URL, params)
+
+            self.assertEqual(rows.status_code, status.HTTP_200_OK)
+            self.assertEqual(rows.content, objects.content, params)
+
+    def test_attribute_list_parity(self):
+        """Test tag and ingredient lists render the same bytes"""
+        for url, params in (
+            (TAGS_URL, {}),
+            (TAGS_URL, {'page_size': 1}),
+            (INGREDIENTS_URL, {'assigned_only': '1'}),
+        ):
+            rows, objects = self.get_both(url, params)
+
+            self.assertEqual(rows.status_code, status.HTTP_200_OK)
+            self.assertEqual(rows.content, objects.content, params)
+
+    def test_next_page_parity(self):
+        """Test cursors built from rows seek to the same next page"""
+        rows, objects = self.get_both(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(rows.data['next'], objects.data['next'])
+        rows, objects = self.get_both(rows.data['next'])
+        self.assertEqual(rows.content, objects.content)
+
+    def test_list_reads_rows(self):
+        """Test the list only selects the columns it returns"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        sql = '\n'.join(query['sql'] for query in queries)
+        self.assertNotIn('"core_recipe"."image"', sql)
+        self.assertNotIn('"core_recipe"."user_id", ', sql)
+
+    def test_unsupported_serializer(self):
+        """Test serializers with fields rows cannot hold are refused"""
+        serializer = TagSerializer()
+        serializer.fields['user'] = \
+            serializers.PrimaryKeyRelatedField(read_only=True)
+
+        with self.assertRaises(TypeError):
+            RowSerializer(serializer)
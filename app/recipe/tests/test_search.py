@@ -0,0 +1,163 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.search import DatabaseSearchBackend, search_recipes
+
+RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {'title': 'Sample recipe', 'time_minutes': 10, 'price': 5}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@jmits.com', 'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        res = self.client.get(RECIPE_URL, {'q': query})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_search_ranks_title_matches_first(self):
+        """Test recipes matching in their title rank above the others"""
+        by_tag = sample_recipe(self.user, title='Stew')
+        by_tag.tags.add(Tag.objects.create(user=self.user, name='Curry'))
+        by_title = sample_recipe(self.user, title='Thai curry')
+        sample_recipe(self.user, title='Pancakes')
+
+        res = self.client.get(RECIPE_URL, {'q': 'curry'})
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [by_title.id, by_tag.id]
+        )
+        self.assertIsNone(res.data['next'])
+
+    def test_search_ranks_newest_candidates_only(self):
+        """Test only the newest matches are ranked"""
+        by_title = sample_recipe(self.user, title='Thai curry')
+        by_tag = sample_recipe(self.user, title='Stew')
+        by_tag.tags.add(Tag.objects.create(user=self.user, name='Curry'))
+
+        with patch('recipe.search.MAX_CANDIDATES', 1):
+            self.assertEqual(search_recipes(self.user.pk, 'curry', 10),
+                             [by_tag.id])
+        self.assertEqual(search_recipes(self.user.pk, 'curry', 10),
+                         [by_title.id, by_tag.id])
+
+    def test_search_requires_every_word(self):
+        """Test all query words must match, by prefix, in any field"""
+        recipe = sample_recipe(self.user, title='Chicken curry')
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Coconut milk')
+        )
+        sample_recipe(self.user, title='Chicken soup')
+
+        self.assertEqual(self.search('chick coconut'), [recipe.id])
+        self.assertEqual(self.search('chicken beef'), [])
+
+    def test_search_with_relation_filters(self):
+        """Test tag filters narrow the matches before the top are taken"""
+        spicy = Tag.objects.create(user=self.user, name='Spicy')
+        curry = sample_recipe(self.user, title='Chicken curry')
+        curry.tags.add(spicy)
+        for number in range(60):
+            sample_recipe(self.user, title=f'Chicken {number}')
+
+        res = self.client.get(RECIPE_URL, {'q': 'chicken', 'tags': spicy.id})
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [curry.id]
+        )
+
+    def test_database_backend_within(self):
+        """Test the unindexed fallback also searches within a queryset"""
+        kept = sample_recipe(self.user, title='Chicken curry')
+        sample_recipe(self.user, title='Chicken soup')
+
+        ids = DatabaseSearchBackend().search(
+            self.user.pk, ['chicken'], 10,
+            within=Recipe.objects.filter(pk=kept.pk),
+        )
+
+        self.assertEqual(ids, [kept.id])
+
+    def test_search_only_own_recipes(self):
+        """Test recipes of other users are never returned"""
+        other = get_user_model().objects.create_user('o@jmits.com', 'pw')
+        sample_recipe(other, title='Curry')
+
+        self.assertEqual(self.search('curry'), [])
+
+    def test_search_blank_query(self):
+        """Test a query without words matches nothing"""
+        sample_recipe(self.user)
+
+        self.assertEqual(self.search(' "*" '), [])
+
+    def test_index_follows_changes(self):
+        """Test the index is updated when recipes and names change"""
+        recipe = sample_recipe(self.user, title='Stew')
+        tag = Tag.objects.create(user=self.user, name='Winter')
+        recipe.tags.add(tag)
+        self.assertEqual(search_recipes(self.user.pk, 'winter', 10),
+                         [recipe.id])
+
+        tag.name = 'Autumn'
+        tag.save()
+        self.assertEqual(search_recipes(self.user.pk, 'winter', 10), [])
+        self.assertEqual(search_recipes(self.user.pk, 'autumn', 10),
+                         [recipe.id])
+
+        tag.recipe_set.clear()
+        self.assertEqual(search_recipes(self.user.pk, 'autumn', 10), [])
+
+        recipe.title = 'Goulash'
+        recipe.save()
+        self.assertEqual(search_recipes(self.user.pk, 'goulash', 10),
+                         [recipe.id])
+
+        recipe.delete()
+        self.assertEqual(search_recipes(self.user.pk, 'goulash', 10), [])
+
+    def test_deleted_ingredient_is_unindexed(self):
+        """Test deleting an ingredient removes it from recipe documents"""
+        recipe = sample_recipe(self.user)
+        ingredient = Ingredient.objects.create(user=self.user, name='Kale')
+        recipe.ingredients.add(ingredient)
+
+        ingredient.delete()
+
+        self.assertEqual(search_recipes(self.user.pk, 'kale', 10), [])
+
+    def test_bulk_created_recipes_are_indexed(self):
+        """Test recipes created in bulk are searchable with their tags"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        payload = [
+            {'title': f'Salad {n}', 'time_minutes': 5, 'price': '2.00',
+             'tags': [tag.id], 'ingredients': []}
+            for n in range(3)
+        ]
+        self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(len(self.search('vegan salad')), 3)
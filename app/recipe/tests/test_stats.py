@@ -0,0 +1,182 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.bulk import bulk_create_recipes, get_or_create_by_names
+from core.models import Recipe, RecipeStats, Tag, Ingredient
+from core.signals import bulk_created
+
+from recipe.stats import compute_stats, rebuild_stats
+
+STATS_URL = reverse('recipe:stats')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {'title': 'Sample recipe', 'time_minutes': 10, 'price': 5}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeStatsAPITests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@jmits.com', 'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertStatsCurrent(self):
+        stored = RecipeStats.objects.get(user=self.user)
+        expected = compute_stats(self.user.pk)
+        for field in ('recipe_count', 'tag_count', 'ingredient_count',
+                      'time_histogram', 'price_histogram'):
+            self.assertEqual(
+                getattr(stored, field), getattr(expected, field), field
+            )
+
+    def test_login_required(self):
+        """Test the stats require authentication"""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_retrieve_stats(self):
+        """Test counts, time percentiles and price histogram"""
+        for minutes, price in ((5, '2.00'), (10, '7.50'), (10, '12'),
+                               (60, '150')):
+            sample_recipe(self.user, time_minutes=minutes, price=price)
+        Tag.objects.create(user=self.user, name='Vegan')
+        Ingredient.objects.create(user=self.user, name='Salt')
+        other = get_user_model().objects.create_user('o@jmits.com', 'pw')
+        sample_recipe(other, time_minutes=999)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 4)
+        self.assertEqual(res.data['tags'], 1)
+        self.assertEqual(res.data['ingredients'], 1)
+        self.assertEqual(res.data['time_minutes'], {
+            'average': 21.25, 'p50': 10, 'p90': 60, 'p99': 60,
+        })
+        self.assertEqual(
+            [bucket['count'] for bucket in res.data['price_histogram']],
+            [1, 1, 1, 0, 0, 1]
+        )
+        self.assertEqual(res.data['price_histogram'][-1],
+                         {'min': '100', 'max': None, 'count': 1})
+
+    def test_stats_without_recipes(self):
+        """Test the stats of a user without any recipe"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipes'], 0)
+        self.assertIsNone(res.data['time_minutes']['average'])
+
+    def test_stats_updated_incrementally(self):
+        """Test saves and deletes keep the stored stats current"""
+        self.client.get(STATS_URL)
+        recipe = sample_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        self.assertStatsCurrent()
+
+        recipe.time_minutes = 45
+        recipe.price = '30.00'
+        recipe.save()
+        self.assertStatsCurrent()
+
+        recipe.title = 'Renamed'
+        recipe.save(update_fields=['title'])
+        tag.delete()
+        sample_recipe(self.user, time_minutes=45).delete()
+        self.assertStatsCurrent()
+
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipes'], 1)
+        self.assertEqual(res.data['tags'], 0)
+        self.assertEqual(res.data['time_minutes']['p50'], 45)
+
+    def test_rebuild_updates_stored_stats(self):
+        """Test rebuilding corrects the stored row in place"""
+        sample_recipe(self.user)
+        RecipeStats.objects.create(user=self.user, recipe_count=7)
+
+        stats = rebuild_stats(self.user.pk)
+
+        self.assertEqual(stats.recipe_count, 1)
+        self.assertStatsCurrent()
+
+    def test_bulk_created_counted_incrementally(self):
+        """Test bulk creation adds to the stats without recounting"""
+        self.client.get(STATS_URL)
+        sample_recipe(self.user, time_minutes=5)
+
+        with CaptureQueriesContext(connection) as queries:
+            tags = get_or_create_by_names(Tag, self.user, ['Quick', 'Hot'])
+            get_or_create_by_names(Ingredient, self.user, ['Salt'])
+            bulk_create_recipes([
+                (Recipe(user=self.user, title=f'Recipe {i}',
+                        time_minutes=10 * i, price=f'{i}.50'), tags, [])
+                for i in range(1, 4)
+            ])
+
+        self.assertStatsCurrent()
+        self.assertFalse([
+            query for query in queries
+            if 'COUNT(' in query['sql'] and 'core_recipe' in query['sql']
+        ])
+
+    def test_names_created_concurrently_not_counted_twice(self):
+        """Test bulk created names another caller inserted are recounted"""
+        self.client.get(STATS_URL)
+        tag = Tag.objects.create(user=self.user, name='Hot')
+
+        # Reported again by a caller whose insert of the name was ignored
+        bulk_created.send(sender=Tag, user_id=self.user.pk, objs=[
+            Tag(pk=tag.pk, user=self.user, name='Hot')
+        ])
+
+        self.assertEqual(RecipeStats.objects.get(user=self.user).tag_count, 1)
+        self.assertStatsCurrent()
+
+
+class RebuildRecipeStatsCommandTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@jmits.com', 'testpass'
+        )
+        sample_recipe(self.user)
+
+    def test_rebuild_stats(self):
+        """Test rebuilding the stats of every user"""
+        out = StringIO()
+        call_command('rebuild_recipe_stats', stdout=out)
+
+        self.assertEqual(RecipeStats.objects.get().recipe_count, 1)
+        self.assertIn('Rebuilt the stats of 1 users', out.getvalue())
+
+    def test_verify_stats(self):
+        """Test verification reports stale stats without fixing them"""
+        call_command('rebuild_recipe_stats', stdout=StringIO())
+        call_command('rebuild_recipe_stats', verify=True, stdout=StringIO())
+
+        RecipeStats.objects.update(recipe_count=7)
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_recipe_stats', verify=True,
+                         stdout=StringIO(), stderr=err)
+
+        self.assertIn('recipe_count differ', err.getvalue())
+        self.assertEqual(RecipeStats.objects.get().recipe_count, 7)
@@ -1,15 +1,22 @@
+import base64
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Tag
+from core.models import Tag, Recipe
 
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
+BATCH_URL = reverse('recipe:tag-batch')
 
 
 class PublicTagsAPITests(TransactionTestCase):
@@ -29,6 +36,7 @@ class PrivateTagsAPITests(TransactionTestCase):
     """Test the authorized user tags API"""
 
     def _pre_setup(self):
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             'test999_@jmitks.com',
             'password999k'
@@ -46,7 +54,7 @@ class PrivateTagsAPITests(TransactionTestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are for authenticated user"""
@@ -60,8 +68,46 @@ class PrivateTagsAPITests(TransactionTestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+
+    def test_tags_paginated_by_name(self):
+        """Test that tags are paged by descending name with a cursor"""
+        for name in ('Apple', 'Banana', 'Cherry', 'Date', 'Elderberry'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        names = [tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['Elderberry', 'Date'])
+        self.assertIsNone(res.data['previous'])
+
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            names += [tag['name'] for tag in res.data['results']]
+
+        self.assertEqual(
+            names, ['Elderberry', 'Date', 'Cherry', 'Banana', 'Apple']
+        )
+
+        res = self.client.get(res.data['previous'])
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Cherry', 'Banana']
+        )
+
+    def test_tags_tampered_cursor(self):
+        """Test that cursor values of the wrong type are rejected"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        for position in (['Vegan', 'abc'], [{'a': 1}, 1], [None, 1]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'p': position}).encode()
+            ).decode()
+
+            res = self.client.get(TAGS_URL, {'cursor': cursor})
+
+            self.assertEqual(
+                res.status_code, status.HTTP_404_NOT_FOUND, position
+            )
 
     def test_create_task_successful(self):
         """Test creating a new tag"""
@@ -74,9 +120,72 @@ class PrivateTagsAPITests(TransactionTestCase):
         ).exists()
         self.assertTrue(exists)
 
+    def test_create_tag_existing_name(self):
+        """Test creating a tag with an existing name reuses it"""
+        tag = Tag.objects.create(user=self.user, name='Lemon')
+
+        res = self.client.post(TAGS_URL, {'name': 'Lemon'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['id'], tag.id)
+        self.assertEqual(
+            Tag.objects.filter(user=self.user, name='Lemon').count(), 1
+        )
+
     def test_create_tag_invalid(self):
         """Test creating a new tag with invalid payload"""
         payload = {'name': ''}
         res = self.client.post(TAGS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_get_or_create(self):
+        """Test a batch of names returns existing and new tags"""
+        existing = Tag.objects.create(user=self.user, name='Salt')
+        payload = {'names': ['Salt', 'Pepper', ' Pepper ', 'Basil']}
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in res.data], ['Salt', 'Pepper', 'Basil']
+        )
+        self.assertEqual(res.data[0]['id'], existing.id)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+
+    def test_batch_constant_queries(self):
+        """Test a batch runs the same queries for any number of names"""
+        def batch_queries(names):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(BATCH_URL, {'names': names}, format='json')
+            return len(queries)
+
+        self.assertEqual(
+            batch_queries([f'Small {i}' for i in range(2)]),
+            batch_queries([f'Large {i}' for i in range(50)])
+        )
+
+    def test_batch_invalid(self):
+        """Test an empty batch is rejected"""
+        res = self.client.post(BATCH_URL, {'names': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_tags_assigned_only(self):
+        """Test filtering tags by those assigned to recipes"""
+        assigned = Tag.objects.create(user=self.user, name='Apples')
+        unassigned = Tag.objects.create(user=self.user, name='Turkey')
+        for title in ('Apple crumble', 'Apple pie'):
+            recipe = Recipe.objects.create(
+                title=title, time_minutes=5, price=10, user=self.user
+            )
+            recipe.tags.add(assigned)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(
+            [item['id'] for item in res.data['results']], [assigned.id]
+        )
+        self.assertNotIn(
+            unassigned.id, [item['id'] for item in res.data['results']]
+        )
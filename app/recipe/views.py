@@ -1,29 +1,86 @@
+from collections import OrderedDict
+
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
+from core.authentication import CachedTokenAuthentication
+from core.bulk import get_or_create_by_names
+from core.jobs import enqueue
 from core.models import Tag, Ingredient, Recipe
+from core.profiling import SerializerTimingMixin, timer
+from core.uploads import HashingMultiPartParser
 
-from recipe import serializers
+from recipe import serializers, export
+from recipe.cache import VersionedCacheMixin
+from recipe.pantry import get_pantry_index
+from recipe.rows import RowListMixin
+from recipe.search import search_recipes
+from recipe.stats import get_stats, summarize
+from recipe.tasks import generate_recipe_renditions
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(VersionedCacheMixin,
+                            RowListMixin,
+                            SerializerTimingMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewSet for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = Tag.objects.all()
+    ordering = ('-name', 'id')
 
     def get_queryset(self):
         """Return for the current auth user only"""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.request.query_params.get('assigned_only') in ('1', 'true'):
+            # A semi-join on the through table, so no DISTINCT is needed
+            model = self.queryset.model
+            queryset = queryset.filter(Exists(
+                model.recipe_set.through.objects.filter(**{
+                    f'{model._meta.model_name}_id': OuterRef('pk')
+                })
+            ))
+
+        return queryset.order_by(*self.ordering)
+
+    def create(self, request, *args, **kwargs):
+        """Create an attribute, answering 200 if the name already exists"""
+        response = super().create(request, *args, **kwargs)
+        if not self.created:
+            response.status_code = status.HTTP_200_OK
+
+        return response
 
     def perform_create(self, serializer):
-        """Create a new attribute (object)"""
-        serializer.save(user=self.request.user)
+        """Create a new attribute (object) or reuse the one with that name"""
+        # The (user, name) unique constraint makes this safe under races
+        serializer.instance, self.created = \
+            self.queryset.model.objects.get_or_create(
+                user=self.request.user,
+                **serializer.validated_data
+            )
+
+    @action(methods=['POST'], detail=False, url_path='batch')
+    def batch(self, request):
+        """Return the attributes named in a list, creating missing ones"""
+        serializer = serializers.NameListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        objects = get_or_create_by_names(
+            self.queryset.model,
+            self.request.user,
+            serializer.validated_data['names']
+        )
+
+        return Response(self.get_serializer(objects, many=True).data)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -38,16 +95,148 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(VersionedCacheMixin, RowListMixin,
+                    SerializerTimingMixin, viewsets.ModelViewSet):
     """Manage Recipe in DB"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    ordering = ('-id',)
+    bulk_batch_size = 1000
+    export_batch_size = 1000
+    search_query_param = 'q'
 
     def get_queryset(self):
         """Retrieve the recipe for the auth user"""
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == 'list':
+            queryset = self.filter_relations(queryset)
+
+        return self.select_columns(queryset).order_by(*self.ordering)
+
+    def _params_to_names(self, name):
+        """Return the names listed in a parameter of a list or retrieve"""
+        value = self.request.query_params.get(name)
+        if self.action not in ('list', 'retrieve') or value is None:
+            return None
+        return [item for item in value.split(',') if item]
+
+    def get_serializer(self, *args, **kwargs):
+        """Apply the `fields` and `expand` parameters to the serializer"""
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self._params_to_names('fields'))
+            kwargs.setdefault('expand', self._params_to_names('expand') or ())
+        return super().get_serializer(*args, **kwargs)
+
+    def select_columns(self, queryset):
+        """Load only the columns and relations the response needs
+
+        Relations left out of `fields` are not prefetched at all, and
+        those returned as primary keys only read the related ids.
+        """
+        fields = self._params_to_names('fields')
+        expand = self._params_to_names('expand') or ()
+        relations = ('tags', 'ingredients')
+        if fields is not None:
+            columns = {
+                field.name for field in Recipe._meta.concrete_fields
+            }
+            queryset = queryset.only(
+                'id', *(name for name in fields if name in columns)
+            )
+            relations = [name for name in relations if name in fields]
+
+        # Load relations up front so serializing N recipes costs a fixed
+        # number of queries instead of one more per recipe and relation.
+        # They are listed by id, like `recipe.rows` lists them.
+        for name in relations:
+            related = Recipe._meta.get_field(name).related_model.objects
+            if self.action != 'retrieve' and name not in expand:
+                related = related.only('id')
+            queryset = queryset.prefetch_related(
+                Prefetch(name, queryset=related.order_by('id'))
+            )
+
+        return queryset
+
+    def _params_to_ints(self, name, qs):
+        """Convert a list of string IDs to a list of integers"""
+        try:
+            return [int(str_id) for str_id in qs.split(',') if str_id]
+        except ValueError:
+            raise ValidationError(
+                {name: 'Expected a comma separated list of ids.'}
+            )
+
+    def filter_relations(self, queryset):
+        """Filter recipes by the `tags` and `ingredients` parameters
+
+        With `match=any` (the default) a recipe needs one of the given
+        ids, with `match=all` every one of them. Each condition is an
+        EXISTS probe of the through table indexed on both columns.
+        """
+        params = self.request.query_params
+        match = params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Expected any or all.'})
+
+        for name, through, column in (
+            ('tags', Recipe.tags.through, 'tag_id'),
+            ('ingredients', Recipe.ingredients.through, 'ingredient_id'),
+        ):
+            if not params.get(name):
+                continue
+            ids = self._params_to_ints(name, params[name])
+            links = through.objects.filter(recipe_id=OuterRef('pk'))
+            if match == 'all':
+                for pk in sorted(set(ids)):
+                    queryset = queryset.filter(
+                        Exists(links.filter(**{column: pk}))
+                    )
+            else:
+                queryset = queryset.filter(
+                    Exists(links.filter(**{f'{column}__in': ids}))
+                )
+
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        """Return the best matches of a search, or the requested page
+
+        Search results are ranked by relevance, which a keyset cannot
+        seek on, so only the first page of matches is returned.
+        """
+        query = self.request.query_params.get(self.search_query_param)
+        if query is None or self.action != 'list':
+            return super().paginate_queryset(queryset)
+
+        self.searching = True
+        # The relation filters must narrow the matches before the top
+        # ones are taken, or filtered out matches would empty the page
+        params = self.request.query_params
+        filtered = params.get('tags') or params.get('ingredients')
+        ids = search_recipes(
+            self.request.user.pk,
+            query,
+            self.paginator.get_page_size(self.request),
+            within=queryset if filtered else None,
+        )
+        recipes = {
+            item['id'] if isinstance(item, dict) else item.pk: item
+            for item in queryset.filter(pk__in=ids)
+        }
+
+        return [recipes[pk] for pk in ids if pk in recipes]
+
+    def get_paginated_response(self, data):
+        if getattr(self, 'searching', False):
+            return Response(OrderedDict([
+                ('next', None),
+                ('previous', None),
+                ('results', data),
+            ]))
+        return super().get_paginated_response(data)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -63,7 +252,95 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='image')
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """Create a list of recipes in one transaction"""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save(user=self.request.user)
+
+        # Reload in batches so the response also costs a fixed number of
+        # queries per batch instead of two per recipe
+        ids = [recipe.pk for recipe in recipes]
+        rows = self.get_row_serializer()
+        data = []
+        for start in range(0, len(ids), self.bulk_batch_size):
+            queryset = self.get_queryset().filter(
+                pk__in=ids[start:start + self.bulk_batch_size]
+            ).order_by('id')
+            if rows is None:
+                data.extend(self.get_serializer(queryset, many=True).data)
+                continue
+            with timer('serialize'):
+                data.extend(rows.to_representation(
+                    queryset.prefetch_related(None).values(*rows.columns)
+                ))
+
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['GET'], detail=False, url_path='export',
+            url_name='export',
+            renderer_classes=[export.NDJSONRenderer, export.CSVRenderer])
+    def export_catalog(self, request):
+        """Stream the recipes of the user as NDJSON or CSV
+
+        The `tags`, `ingredients` and `match` parameters filter the
+        recipes like they filter the list.
+        """
+        rows = export.iter_recipes(
+            self.filter_relations(
+                Recipe.objects.filter(user=self.request.user)
+            ),
+            batch_size=self.export_batch_size
+        )
+        renderer = request.accepted_renderer
+        if renderer.format == 'csv':
+            content = export.csv_lines(rows)
+        else:
+            content = export.ndjson_lines(rows)
+
+        response = StreamingHttpResponse(
+            content,
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{renderer.format}"'
+
+        return response
+
+    @action(methods=['GET'], detail=False, url_path='pantry')
+    def pantry(self, request):
+        """Rank recipes by how well the given ingredients cover them"""
+        if not request.query_params.get('ingredients'):
+            raise ValidationError(
+                {'ingredients': 'This parameter is required.'}
+            )
+        ingredient_ids = self._params_to_ints(
+            'ingredients', request.query_params['ingredients']
+        )
+
+        matches = get_pantry_index().get(request.user.pk).match(
+            ingredient_ids, self.paginator.get_page_size(request)
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in matches]
+        )
+        results = []
+        for recipe_id, missing in matches:
+            if recipe_id not in recipes:
+                continue
+            data = self.get_serializer(recipes[recipe_id]).data
+            data['missing_ingredients'] = sorted(missing)
+            results.append(data)
+
+        return Response(OrderedDict([
+            ('next', None),
+            ('previous', None),
+            ('results', results),
+        ]))
+
+    @action(methods=['POST'], detail=True, url_path='image',
+            parser_classes=[HashingMultiPartParser])
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe"""
         recipe = self.get_object()
@@ -73,7 +350,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save()
+            # Resizing is left to the background worker
+            enqueue(generate_recipe_renditions, recipe_id=recipe.id)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -85,3 +364,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
 
+class RecipeStatsView(APIView):
+    """Summarize the recipes of the authenticated user"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Return counts, time percentiles and a price histogram"""
+        return Response(summarize(get_stats(request.user.pk)))
@@ -1,7 +1,10 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
+from core.profiling import SerializerTimingMixin
+
 from .serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -16,10 +19,11 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
+class ManageUserView(SerializerTimingMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):